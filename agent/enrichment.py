@@ -0,0 +1,150 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from agent.metrics import metrics
+from tools.metadata_tool import fetch_metadata, needs_metadata
+
+logger = logging.getLogger(__name__)
+
+# Tracks looked up per batch, and how long to wait for more cart changes before starting one
+ENRICH_BATCH_SIZE = int(os.getenv("ENRICH_BATCH_SIZE", "50"))
+ENRICH_BATCH_WINDOW = float(os.getenv("ENRICH_BATCH_WINDOW_MS", "100")) / 1000
+# Cap on queued tracks (a huge imported cart is enriched as the user scrolls/adds, not all at once)
+ENRICH_MAX_PENDING = int(os.getenv("ENRICH_MAX_PENDING", "500"))
+
+class Enricher:
+    """
+    Fills in thumbnails, album art and numeric durations for cart songs in the
+    background, so a chat turn never waits on them.
+
+    schedule() queues the songs that lack metadata; a worker thread collects
+    them into batches (across sessions, deduplicated), fetches each batch via
+    tools/metadata_tool.fetch_metadata (cached), and hands the results to
+    `apply(session_id, {videoId: metadata})`, which writes them into that
+    session's cart. Clients follow progress with wait().
+    """
+    def __init__(self, apply, fetch=fetch_metadata, batch_size: int = ENRICH_BATCH_SIZE,
+                 batch_window: float = ENRICH_BATCH_WINDOW, max_pending: int = ENRICH_MAX_PENDING):
+        self.apply = apply
+        self.fetch = fetch
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._queue = OrderedDict()  # videoId -> set of session ids waiting for it
+        self._pending = {}  # session id -> set of videoIds not applied yet
+        self._versions = {}  # session id -> number of batches applied (for wait())
+        self._thread = None
+        self._stopped = False
+
+    def schedule(self, session_id: str, songs: list[dict]) -> int:
+        """
+        Queues the songs without metadata. Returns how many of this session's
+        songs are still waiting (0 = nothing to follow).
+        """
+        wanted = [s['videoId'] for s in songs if needs_metadata(s)]
+        with self._cond:
+            pending = self._pending.setdefault(session_id, set())
+            for vid in wanted:
+                if vid in pending:
+                    continue
+                if vid not in self._queue and len(self._queue) >= self.max_pending:
+                    metrics.incr("enrich.dropped")
+                    continue
+                self._queue.setdefault(vid, set()).add(session_id)
+                pending.add(vid)
+            if self._queue:
+                self._ensure_worker()
+                self._cond.notify_all()
+            return len(pending)
+
+    def pending(self, session_id: str) -> int:
+        with self._cond:
+            return len(self._pending.get(session_id, ()))
+
+    def wait(self, session_id: str, version: int = 0, timeout: float = 15.0) -> tuple[int, int]:
+        """
+        Blocks until a batch newer than `version` was applied to this session
+        (or nothing is pending / the timeout passes).
+
+        Returns:
+            (current version, songs still pending)
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._versions.get(session_id, 0) > version or not self._pending.get(session_id),
+                timeout=timeout
+            )
+            return self._versions.get(session_id, 0), len(self._pending.get(session_id, ()))
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="enricher", daemon=True)
+            self._thread.start()
+
+    def _next_batch(self) -> dict:
+        with self._cond:
+            self._cond.wait_for(lambda: self._queue or self._stopped)
+        if self._stopped:
+            return {}
+        # Give the rest of a burst (e.g. several adds in one turn) a moment to arrive
+        time.sleep(self.batch_window)
+        with self._cond:
+            ids = list(self._queue)[:self.batch_size]
+            return {vid: self._queue.pop(vid) for vid in ids}
+
+    def _run(self):
+        while not self._stopped:
+            batch = self._next_batch()
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch: dict):
+        start = time.perf_counter()
+        try:
+            metadata = self.fetch(list(batch))
+        except Exception as e:
+            logger.warning(f"Metadata batch of {len(batch)} failed: {e}")
+            metadata = {}
+        metrics.incr("enrich.batches")
+        metrics.incr("enrich.tracks", len(batch))
+        metrics.incr("enrich.resolved", len(metadata))
+        metrics.observe("enrich.batch", time.perf_counter() - start)
+
+        sessions = set().union(*batch.values())
+        for session_id in sessions:
+            found = {vid: metadata[vid] for vid, waiting in batch.items() if session_id in waiting and vid in metadata}
+            if not found:
+                continue
+            try:
+                updated = self.apply(session_id, found)
+                logger.info(f"Enriched {updated} cart songs", extra={"session": session_id})
+            except Exception as e:
+                logger.error(f"Could not apply metadata to session {session_id}: {e}")
+
+        with self._cond:
+            for session_id in sessions:
+                self._pending.get(session_id, set()).difference_update(batch)
+                self._versions[session_id] = self._versions.get(session_id, 0) + 1
+            self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            "queued": queued,
+            "batches": metrics.get("enrich.batches"),
+            "tracks": metrics.get("enrich.tracks"),
+            "resolved": metrics.get("enrich.resolved"),
+            "dropped": metrics.get("enrich.dropped"),
+            "avg_batch_ms": round(metrics.mean("enrich.batch") * 1000, 1)
+        }
@@ -0,0 +1,283 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from agent.store import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# How long a succeeded job still answers a retry with the same key (seconds);
+# after that the same request is new work (e.g. the playlist was deleted and rebuilt)
+JOB_DEDUPE_SECONDS = float(os.getenv("JOB_DEDUPE_SECONDS", "300"))
+
+class JobCancelled(Exception):
+    """Raised inside a job function when cancellation was requested."""
+
+class Job:
+    """
+    A unit of background work with a progress log that can be streamed.
+    The job function receives the Job and calls `report()` / `check_cancelled()`.
+    """
+    def __init__(self, name: str, key: str = None, session_id: str = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.key = key
+        self.session_id = session_id
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.events = []  # [{"type": "log"|"answer"|"error", "content": str}]
+        self._cancel = threading.Event()
+        self._cond = threading.Condition()
+        self._queue = None  # owning JobQueue (for persisting snapshots)
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Read-only copy of a job owned by another worker (from the state store)."""
+        job = cls(data["name"], key=data.get("key"), session_id=data.get("session_id"))
+        job.id = data["id"]
+        for field in ("status", "result", "error", "created_at", "finished_at", "events"):
+            setattr(job, field, data.get(field, getattr(job, field)))
+        return job
+
+    def report(self, message: str, type: str = "log"):
+        with self._cond:
+            self.events.append({"type": type, "content": message})
+            self._cond.notify_all()
+        self._persist()
+
+    def _persist(self):
+        if self._queue:
+            self._queue._persist(self)
+
+    def cancel_requested(self) -> bool:
+        if not self._cancel.is_set() and self._queue and self._queue._remote_cancel_requested(self.id):
+            self._cancel.set()
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self.cancel_requested():
+            raise JobCancelled()
+
+    def _finish(self, status: str, result=None, error: str = None):
+        with self._cond:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            if status == SUCCEEDED:
+                self.events.append({"type": "answer", "content": str(result)})
+            elif status == FAILED:
+                self.events.append({"type": "error", "content": error})
+            else:
+                self.events.append({"type": "answer", "content": f"'{self.name}' was cancelled."})
+            self._cond.notify_all()
+        self._persist()
+
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def wait_events(self, since: int = 0, timeout: float = 15.0) -> list[dict]:
+        """
+        Blocks until there are events after index `since` (or the job is done /
+        the timeout passes) and returns them.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.events) > since or self.done(), timeout=timeout)
+            return self.events[since:]
+
+    def stream_events(self):
+        """Yields every event (past and future) until the job finishes."""
+        seen = 0
+        while True:
+            batch = self.wait_events(seen)
+            seen += len(batch)
+            yield from batch
+            if self.done() and seen >= len(self.events):
+                return
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "session_id": self.session_id,
+            "status": self.status,
+            "progress": self.events[-1]["content"] if self.events else None,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+class JobQueue:
+    """
+    Bounded background worker pool with idempotency keys and cancellation.
+    Keeps the most recent `max_jobs` jobs around for status lookups.
+
+    With a StateStore, job snapshots, idempotency keys and cancel requests are
+    shared too, so any server worker can report on (or cancel) any job.
+    """
+    def __init__(self, max_workers: int = 2, max_jobs: int = 100, store=None, dedupe_seconds: float = JOB_DEDUPE_SECONDS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # id -> Job (insertion ordered)
+        self._futures = {}
+        self._by_key = {}
+        self.max_jobs = max_jobs
+        self.store = store
+        self.dedupe_seconds = dedupe_seconds
+
+    def _persist(self, job: Job):
+        if self.store:
+            self.store.set(f"job:{job.id}", dumps({**job.to_dict(), "key": job.key, "events": job.events}))
+
+    def _snapshot(self, job_id: str):
+        if not self.store:
+            return None
+        data = loads(self.store.get(f"job:{job_id}"))
+        return Job.from_dict(data) if data else None
+
+    def _remote_cancel_requested(self, job_id: str) -> bool:
+        return bool(self.store and self.store.get(f"job:{job_id}:cancel"))
+
+    def submit(self, name: str, fn, *args, key: str = None, session_id: str = None, **kwargs) -> tuple[Job, bool]:
+        """
+        Queues fn(job, *args, **kwargs).
+
+        Args:
+            name: Human readable job name.
+            fn: Callable doing the work. Its return value becomes the job result.
+            key: Optional idempotency key. If a queued or running job with the
+                 same key exists, or one that succeeded less than `dedupe_seconds`
+                 ago (a retried request), that job is returned instead.
+            session_id: Session the job belongs to.
+
+        Returns:
+            (job, created) - created is False when an existing job was reused.
+        """
+        with self._lock:
+            if key:
+                existing = None
+                if key in self._by_key:
+                    existing = self._jobs.get(self._by_key[key])
+                elif self.store:
+                    job_id = self.store.get(f"jobkey:{key}")
+                    existing = self._snapshot(job_id.decode()) if job_id else None
+                if existing and self._reusable(existing):
+                    return existing, False
+
+            job = Job(name, key=key, session_id=session_id)
+            job._queue = self
+            self._jobs[job.id] = job
+            if key:
+                self._by_key[key] = job.id
+                if self.store:
+                    self.store.set(f"jobkey:{key}", job.id.encode())
+            self._prune()
+            self._persist(job)
+            self._futures[job.id] = self._pool.submit(self._run, job, fn, args, kwargs)
+            return job, True
+
+    def _reusable(self, job: Job) -> bool:
+        if job.status in (QUEUED, RUNNING):
+            return True
+        return job.status == SUCCEEDED and time.time() - job.created_at < self.dedupe_seconds
+
+    def _run(self, job: Job, fn, args, kwargs):
+        if job.cancel_requested():
+            job._finish(CANCELLED)
+            return
+        job.status = RUNNING
+        self._persist(job)
+        try:
+            result = fn(job, *args, **kwargs)
+            job._finish(SUCCEEDED, result=result)
+        except JobCancelled:
+            job._finish(CANCELLED)
+        except Exception as e:
+            logger.error(f"Job '{job.name}' ({job.id}) failed: {e}")
+            job._finish(FAILED, error=str(e))
+        finally:
+            with self._lock:
+                self._futures.pop(job.id, None)
+
+    def _prune(self):
+        # Drop the oldest finished jobs once we're over capacity
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            job = self._jobs[job_id]
+            if job.done():
+                del self._jobs[job_id]
+                if job.key and self._by_key.get(job.key) == job_id:
+                    del self._by_key[job.key]
+                if self.store:
+                    self.store.delete(f"job:{job_id}")
+                    self.store.delete(f"job:{job_id}:cancel")
+                    if job.key and self.store.get(f"jobkey:{job.key}") == job_id.encode():
+                        self.store.delete(f"jobkey:{job.key}")
+
+    def get(self, job_id: str):
+        """The local Job, or a read-only snapshot if another worker owns it."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job or self._snapshot(job_id)
+
+    def stream(self, job_id: str):
+        """
+        Yields a job's events until it finishes. Local jobs are followed live;
+        jobs owned by another worker are polled from the store.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job:
+            yield from job.stream_events()
+            return
+
+        seen = 0
+        while True:
+            snapshot = self._snapshot(job_id)
+            if not snapshot:
+                return
+            yield from snapshot.events[seen:]
+            seen = len(snapshot.events)
+            if snapshot.done():
+                return
+            time.sleep(0.5)
+
+    def recent(self, since: float = None, session_id: str = None) -> list[Job]:
+        """Jobs created at or after `since` (all jobs if None), oldest first; only `session_id`'s if given."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [j for j in jobs if (since is None or j.created_at >= since)
+                and (session_id is None or j.session_id == session_id)]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Requests cancellation. Queued jobs never start; running jobs stop at
+        their next `check_cancelled()` checkpoint.
+        Returns False if the job doesn't exist or has already finished.
+        """
+        job = self.get(job_id)
+        if not job or job.done():
+            return False
+        if job._queue is not self:
+            # Owned by another worker - it picks this up at its next checkpoint
+            self.store.set(f"job:{job_id}:cancel", b"1")
+            return True
+        job._cancel.set()
+        with self._lock:
+            future = self._futures.get(job_id)
+            if future and future.cancel():
+                self._futures.pop(job_id, None)
+                job._finish(CANCELLED)
+        return True
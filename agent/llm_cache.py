@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+from agent.metrics import metrics
+from tools.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: serve repeated LLM completions from a cache (see CompletionCache)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "").lower() in ("1", "true", "yes", "on")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+# Disk tier (survives restarts, shared by workers on one machine); empty = memory only
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "llm_cache")
+LLM_CACHE_DISK_SIZE = int(os.getenv("LLM_CACHE_DISK_SIZE", "5000"))
+_PRUNE_EVERY = 50
+
+# Per-call ids the provider makes up; they don't change what the model sees
+_VOLATILE_FIELDS = ("id", "tool_call_id")
+
+def _normalize(value, role: str = None):
+    if isinstance(value, dict):
+        role = value.get("role", role)
+        return {k: _normalize(v, role) for k, v in value.items() if k not in _VOLATILE_FIELDS and v is not None}
+    if isinstance(value, list):
+        return [_normalize(v, role) for v in value]
+    if isinstance(value, str) and role == "user":
+        # What the user typed: case and spacing don't change the request
+        return " ".join(value.casefold().split())
+    return value
+
+def completion_key(model: str, messages: list, tools=None) -> str:
+    """
+    Cache key for one completion: the model, the normalized message list
+    (user text case/whitespace-folded, provider call ids dropped) and the tool schema.
+    """
+    payload = json.dumps(
+        {"model": model, "messages": _normalize(messages), "tools": tools},
+        sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class CompletionCache:
+    """
+    Two-tier (memory LRU + disk) cache of LLM completions with a TTL.
+
+    Callers decide what is safe to cache: a completion that follows a tool
+    result which could differ next time (cart state, radio, side effects)
+    must bypass() instead of get()/set().
+
+    Args:
+        enabled: When False, get() always misses and set() does nothing.
+        maxsize: Entries kept in memory (least recently used evicted first).
+        ttl: Seconds an entry stays valid (both tiers).
+        disk_dir: Directory for the disk tier ("" / None = memory only).
+        disk_size: Entries kept on disk (least recently used pruned).
+    """
+    def __init__(self, enabled: bool = LLM_CACHE_ENABLED, maxsize: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL,
+                 disk_dir: Optional[str] = LLM_CACHE_DIR, disk_size: int = LLM_CACHE_DISK_SIZE):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.disk_dir = disk_dir or None
+        self.disk_size = disk_size
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key: str):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires_at", 0) < time.time():
+            return None
+        try:
+            os.utime(self._path(key))  # mtime = last use, for pruning
+        except OSError:
+            pass
+        return entry
+
+    def _write_disk(self, key: str, entry: dict):
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            tmp = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f, separators=(",", ":"))
+            os.replace(tmp, self._path(key))
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write LLM cache entry: {e}")
+            return
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % _PRUNE_EVERY == 0
+        if prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        try:
+            files = [os.path.join(self.disk_dir, name) for name in os.listdir(self.disk_dir) if name.endswith(".json")]
+            if len(files) <= self.disk_size:
+                return
+            files.sort(key=os.path.getmtime)
+            for path in files[:len(files) - self.disk_size]:
+                os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not prune the LLM cache: {e}")
+
+    def get(self, key: str):
+        """The cached completion for `key` (counted as a hit or miss), or None."""
+        if not self.enabled:
+            return None
+        entry = self._memory.get(key)
+        if entry is None and self.disk_dir:
+            entry = self._read_disk(key)
+            if entry is not None:
+                self._memory.set(key, entry, ttl=max(0.0, entry["expires_at"] - time.time()))
+        if entry is None:
+            metrics.incr("llm_cache.miss")
+            return None
+        metrics.incr("llm_cache.hit")
+        metrics.observe("llm_cache.saved", entry.get("seconds", 0.0))
+        return entry["value"]
+
+    def set(self, key: str, value, seconds: float = 0.0):
+        """
+        Stores a completion (JSON-serializable) that took `seconds` to
+        produce; that time is counted as saved on every hit.
+        """
+        if not self.enabled:
+            return
+        entry = {"value": value, "seconds": round(seconds, 3), "expires_at": time.time() + self.ttl}
+        self._memory.set(key, entry)
+        if self.disk_dir:
+            self._write_disk(key, entry)
+
+    def bypass(self):
+        """Counts a completion that wasn't cacheable."""
+        if self.enabled:
+            metrics.incr("llm_cache.bypass")
+
+    def clear(self):
+        self._memory.invalidate()
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def stats(self) -> dict:
+        hits = metrics.get("llm_cache.hit")
+        misses = metrics.get("llm_cache.miss")
+        total = hits + misses
+        snap = metrics.snapshot()["timers"]
+        return {
+            "hits": hits,
+            "misses": misses,
+            "bypassed": metrics.get("llm_cache.bypass"),
+            "stale": metrics.get("llm_cache.stale"),
+            "hit_rate": hits / total if total else 0.0,
+            "saved_seconds": snap.get("llm_cache.saved", {}).get("total", 0.0),
+            "memory_entries": len(self._memory),
+        }
+
+# Process-wide completion cache used by the agents
+completions = CompletionCache()
@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+# Structured fields attached to every record logged inside a log_context()
+FIELDS = ("session", "turn", "tool", "duration_ms")
+_context = contextvars.ContextVar("log_context", default={})
+
+@contextmanager
+def log_context(**fields):
+    """Adds fields (session, turn, tool, ...) to every record logged in this context."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+class ContextFilter(logging.Filter):
+    """Copies the current log_context() onto the record (runs in the logging thread's caller)."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of INFO/DEBUG records per logger category
+    (longest matching prefix, e.g. {"tools": 0.1, "tools.library_tool": 1.0}).
+    WARNING and above are never sampled.
+    """
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = sorted(rates.items(), key=lambda kv: -len(kv[0]))
+        self._random = random.Random()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + "."):
+                return rate >= 1.0 or self._random.random() < rate
+        return True
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `burst` records per call site (logger + line) through every
+    `window` seconds, e.g. the same parse warning for every item of a bad
+    response. The next record let through reports how many were suppressed.
+    """
+    def __init__(self, burst: int = 5, window: float = 60.0, level: int = logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.level = level
+        self._lock = threading.Lock()
+        self._sites = {}  # (name, lineno) -> [window_start, count, suppressed]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.level or record.levelno >= logging.ERROR:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.setdefault((record.name, record.lineno), [now, 0, 0])
+            if now - site[0] >= self.window:
+                site[0], site[1] = now, 0
+            site[1] += 1
+            if site[1] > self.burst:
+                site[2] += 1
+                return False
+            suppressed, site[2] = site[2], 0
+        if suppressed:
+            record.msg = f"{record.getMessage()} (+{suppressed} similar suppressed)"
+            record.args = None
+        return True
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full."""
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            type(self).dropped += 1
+
+class _Formatter(logging.Formatter):
+    """Text format with the structured fields appended as key=value (or one JSON object per line)."""
+    def __init__(self, as_json: bool = False):
+        super().__init__("%(asctime)s - %(levelname)s - %(message)s")
+        self.as_json = as_json
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {k: getattr(record, k) for k in FIELDS if getattr(record, k, None) is not None}
+        if self.as_json:
+            entry = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name,
+                     "msg": record.getMessage(), **fields}
+            if record.exc_info:
+                entry["exc"] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        line = super().format(record)
+        if fields:
+            line += " [" + " ".join(f"{k}={v}" for k, v in fields.items()) + "]"
+        return line
+
+def _parse_rates(spec: str) -> dict:
+    rates = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, rate = part.split("=", 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+def build_pipeline(stream, sample: str = "", fmt: str = "text", burst: int = 5,
+                   queue_size: int = 10000) -> tuple[QueueHandler, QueueListener]:
+    """
+    A QueueHandler (attach it to a logger) plus the listener that drains it into
+    `stream`. Callers only enqueue; formatting and writing happen on the
+    listener's thread. The listener still needs .start().
+    """
+    sink = logging.StreamHandler(stream)
+    sink.setFormatter(_Formatter(as_json=fmt == "json"))
+
+    handler = _DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    # Filters run on the caller's thread (where the log_context() is visible),
+    # cheapest rejections first
+    if sample:
+        handler.addFilter(SamplingFilter(_parse_rates(sample)))
+    handler.addFilter(RateLimitFilter(burst=burst))
+    handler.addFilter(ContextFilter())
+    return handler, QueueListener(handler.queue, sink, respect_handler_level=True)
+
+_listener = None
+
+def setup_logging(level: str = None, stream=None) -> QueueListener:
+    """
+    Routes all logging through a queue so slow stdout/stderr never blocks a
+    request (see build_pipeline). Safe to call more than once (later calls are no-ops).
+
+    Env:
+        LOG_LEVEL: Root level (default INFO).
+        LOG_SAMPLE: Per-category INFO sampling, e.g. "tools=0.1,agent.router=0.5".
+        LOG_FORMAT: "text" (default) or "json".
+        LOG_RATE_LIMIT: Repeated warnings allowed per call site per minute (default 5).
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    handler, _listener = build_pipeline(
+        stream or sys.stderr,
+        sample=os.getenv("LOG_SAMPLE", ""),
+        fmt=os.getenv("LOG_FORMAT", "text"),
+        burst=int(os.getenv("LOG_RATE_LIMIT", "5"))
+    )
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level or os.getenv("LOG_LEVEL", "INFO"))
+
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+def stop_logging():
+    """Flushes queued records and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def dropped_records() -> int:
+    return _DroppingQueueHandler.dropped
@@ -0,0 +1,49 @@
+import threading
+
+class Metrics:
+    """
+    Tiny thread-safe counter/timer registry shared by the agent, tools and server.
+    Counters are plain integers; timers keep a running count/total/max in seconds.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timers = {}
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            t = self._timers.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            t["count"] += 1
+            t["total"] += seconds
+            t["max"] = max(t["max"], seconds)
+
+    def get(self, name: str) -> int:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def mean(self, name: str) -> float:
+        """Average of a timer in seconds (0.0 if never observed)."""
+        with self._lock:
+            t = self._timers.get(name)
+            return t["total"] / t["count"] if t and t["count"] else 0.0
+
+    def snapshot(self) -> dict:
+        """Copy of all counters and timers, suitable for JSON."""
+        with self._lock:
+            timers = {
+                name: {**t, "mean": t["total"] / t["count"] if t["count"] else 0.0}
+                for name, t in self._timers.items()
+            }
+            return {"counters": dict(self._counters), "timers": timers}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+# Process-wide registry
+metrics = Metrics()
@@ -0,0 +1,130 @@
+import os
+import sys
+import time
+import uuid
+import marshal
+import cProfile
+import logging
+import threading
+from collections import Counter, deque
+
+logger = logging.getLogger(__name__)
+
+def resolve_mode(value: str) -> str:
+    """Normalizes an env/header value to "cprofile", "sample" or "" (off)."""
+    value = (value or "").strip().lower()
+    if value in ("1", "true", "yes", "on", "cprofile", "deterministic"):
+        return "cprofile"
+    if value in ("sample", "sampled", "sampling"):
+        return "sample"
+    return ""
+
+# Profile every turn: "" (off), "cprofile" (deterministic) or "sample" (statistical)
+PROFILE_MODE = resolve_mode(os.getenv("PROFILE_TURNS", ""))
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+
+class _Sampler:
+    """
+    Statistical profiler: a background thread snapshots the profiled thread's
+    stack every SAMPLE_INTERVAL and counts identical stacks (collapsed-stack
+    format, as consumed by flamegraph.pl / speedscope).
+    """
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = Counter()
+        self.target = None  # thread id currently running the turn (None between steps)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="turn-sampler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            tid = self.target
+            frame = sys._current_frames().get(tid) if tid else None
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self) -> bytes:
+        self._stop.set()
+        self._thread.join()
+        lines = [f"{stack} {count}" for stack, count in self.counts.most_common()]
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+class ProfileStore:
+    """Ring buffer of the most recent turn profiles."""
+    def __init__(self, maxlen: int = 20):
+        self._items = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, record: dict):
+        with self._lock:
+            self._items.append(record)
+
+    def list(self) -> list[dict]:
+        with self._lock:
+            return [{k: v for k, v in r.items() if k != "data"} for r in reversed(self._items)]
+
+    def get(self, profile_id: str):
+        with self._lock:
+            return next((r for r in self._items if r["id"] == profile_id), None)
+
+profiles = ProfileStore(maxlen=int(os.getenv("PROFILE_BUFFER", "20")))
+
+def profile_turn(events, mode: str, label: str = ""):
+    """
+    Wraps an agent event generator and profiles the work done inside it.
+
+    The server may resume the generator on a different worker thread for each
+    event, so profiling is switched on/off around every step rather than once
+    for the whole turn. The finished profile goes into the `profiles` ring buffer:
+    cprofile -> pstats file (.prof, open with pstats/snakeviz),
+    sample   -> collapsed stacks (.folded, open with speedscope/flamegraph.pl).
+
+    Yields the original events unchanged.
+    """
+    profiler = cProfile.Profile() if mode == "cprofile" else None
+    sampler = _Sampler() if mode == "sample" else None
+    start = time.perf_counter()
+    busy = 0.0
+    try:
+        while True:
+            step = time.perf_counter()
+            if profiler:
+                profiler.enable()
+            elif sampler:
+                sampler.target = threading.get_ident()
+            try:
+                event = next(events)
+            except StopIteration:
+                return
+            finally:
+                if profiler:
+                    profiler.disable()
+                elif sampler:
+                    sampler.target = None
+                busy += time.perf_counter() - step
+            yield event
+    finally:
+        if profiler:
+            profiler.create_stats()
+            data, ext = marshal.dumps(profiler.stats), "prof"
+        else:
+            data, ext = sampler.stop(), "folded"
+        profile_id = uuid.uuid4().hex[:12]
+        record = {
+            "id": profile_id,
+            "label": label,
+            "mode": mode,
+            "created_at": time.time(),
+            "wall_seconds": round(time.perf_counter() - start, 4),
+            "busy_seconds": round(busy, 4),
+            "filename": f"turn-{profile_id}.{ext}",
+            "data": data,
+        }
+        profiles.add(record)
+        logger.info(f"Profiled turn '{label}' ({mode}, {record['busy_seconds']}s busy) -> profile {record['id']}")
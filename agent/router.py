@@ -0,0 +1,122 @@
+import re
+import time
+import logging
+
+from agent.metrics import metrics
+from agent.state import current_session
+
+logger = logging.getLogger(__name__)
+
+# Words users tack on that don't change the intent
+_FILLER = re.compile(r"^(please|pls|can you|could you|hey)\s+|\s+(please|pls|now|thanks)$")
+
+_CART = r"(?:my |the )?cart"
+
+# Each pattern must match the WHOLE (normalized) message, so anything with
+# extra context ("remove song 3 and add something like it") goes to the LLM.
+_PATTERNS = [
+    ("review_cart", re.compile(rf"^(?:(?:show|view|see|review|display|list|check)(?: me)? {_CART}|what'?s in {_CART}|{_CART})$")),
+    ("clear_cart", re.compile(rf"^(?:clear|empty|reset|wipe)(?: out)? {_CART}$")),
+    ("remove_at", re.compile(rf"^(?:remove|delete|drop)(?: song| track| number| no\.?)? #?(\d+)(?: from {_CART})?$")),
+    ("add_result", re.compile(rf"^add(?: song| track| number| no\.?)? #?(\d+)(?: to {_CART})?$")),
+]
+
+class IntentRouter:
+    """
+    Local fast path for unambiguous cart commands ("show my cart", "remove song 3",
+    "clear cart", "add #2"). Executes them directly against the session instead of
+    paying for an LLM round trip. Anything it isn't sure about returns None so the
+    caller can fall back to the LLM.
+
+    Args:
+        session: SessionState to work on; by default the current request's
+            (see agent/state.py current_session).
+    """
+    def __init__(self, session=None):
+        self._session = session
+
+    @property
+    def session(self):
+        return self._session if self._session is not None else current_session()
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        text = message.lower().strip().rstrip(".!?")
+        text = re.sub(r"\s+", " ", text)
+        # Strip fillers from both ends (may be stacked, e.g. "please ... now thanks")
+        prev = None
+        while prev != text:
+            prev = text
+            text = _FILLER.sub("", text).strip()
+        return text
+
+    def match(self, message: str):
+        """
+        Returns (intent, arg) for an unambiguous command, or None.
+        """
+        text = self.normalize(message)
+        for intent, pattern in _PATTERNS:
+            m = pattern.match(text)
+            if m:
+                return intent, (int(m.group(1)) if m.groups() else None)
+        return None
+
+    def route(self, message: str):
+        """
+        Tries to handle the message locally.
+
+        Returns:
+            (intent, reply) if handled, otherwise None.
+        """
+        matched = self.match(message)
+        if not matched:
+            metrics.incr("router.miss")
+            return None
+
+        intent, arg = matched
+        start = time.perf_counter()
+        reply = self._execute(intent, arg)
+        if reply is None:
+            # Matched the shape but can't resolve it (e.g. "add #7" with 3 results shown)
+            metrics.incr("router.miss")
+            metrics.incr("router.unresolved")
+            return None
+
+        elapsed = time.perf_counter() - start
+        metrics.incr("router.hit")
+        metrics.incr(f"router.hit.{intent}")
+        metrics.observe("router.fast_path", elapsed)
+        saved = max(metrics.mean("agent.llm_turn") - elapsed, 0.0)
+        if saved:
+            metrics.observe("router.saved", saved)
+        logger.info(f"Fast path '{intent}' handled in {elapsed * 1000:.1f}ms (saved ~{saved * 1000:.0f}ms)")
+        return intent, reply
+
+    def _execute(self, intent: str, arg):
+        if intent == "review_cart":
+            return self.session.get_cart_display()
+        if intent == "clear_cart":
+            self.session.clear()
+            return "Cart cleared."
+        if intent == "remove_at":
+            if not 1 <= arg <= len(self.session.get_cart()):
+                return None
+            return self.session.remove_at(arg)
+        if intent == "add_result":
+            results = self.session.get_last_results()
+            if not 1 <= arg <= len(results):
+                return None
+            return self.session.add_song(results[arg - 1])
+        return None
+
+    def stats(self) -> dict:
+        hits = metrics.get("router.hit")
+        misses = metrics.get("router.miss")
+        total = hits + misses
+        snap = metrics.snapshot()["timers"]
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "saved_seconds": snap.get("router.saved", {}).get("total", 0.0),
+        }
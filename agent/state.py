@@ -1,10 +1,100 @@
 import logging
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+from agent.store import dumps, loads
+from agent.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# Attempts to write a session back when other requests keep writing it too
+SAVE_ATTEMPTS = 5
+
 class SessionState:
-    def __init__(self):
+    def __init__(self, store=None, session_id: str = "default"):
         self.cart = []  # List of dictionaries: {videoId, title, artist}
+        self.last_results = []  # Songs from the last numbered listing shown to the user
+        # Optional StateStore (agent/store.py). When set, load()/save() bracket each
+        # request so every worker process sees the same cart.
+        self.store = store
+        self.session_id = session_id
+        self._loaded = None  # serialized state as last read/written, to skip no-op saves
+        self._version = 0  # store version of _loaded (see StateStore.compare_and_set)
+
+    @contextmanager
+    def active(self):
+        """Makes this the session tools work on (see current_session) in this context."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def _key(self) -> str:
+        return f"session:{self.session_id}"
+
+    def load(self, session_id: str = None):
+        """
+        Reads this session from the store into local memory. Tools then work on
+        the local copy for the rest of the request (one store read per request).
+        """
+        if session_id:
+            self.session_id = session_id
+        if not self.store:
+            return
+        data, self._version = self.store.get_versioned(self._key())
+        if data is not None and data == self._loaded:
+            return  # local copy is already current
+        state = loads(data) or {}
+        self.cart = state.get("cart", [])
+        self.last_results = state.get("last_results", [])
+        self._loaded = data
+
+    def save(self):
+        """
+        Writes the local copy back to the store if anything changed. If another
+        request or worker wrote the session since load(), this request's changes
+        are merged onto theirs (see _merge) and the write is retried.
+        """
+        if not self.store:
+            return
+        for _ in range(SAVE_ATTEMPTS):
+            data = dumps({"cart": self.cart, "last_results": self.last_results})
+            if data == self._loaded:
+                return
+            if self.store.compare_and_set(self._key(), data, self._version):
+                self._loaded, self._version = data, self._version + 1
+                return
+            metrics.incr("state.save_conflict")
+            theirs, version = self.store.get_versioned(self._key())
+            self._merge(loads(self._loaded) or {}, loads(theirs) or {})
+            self._loaded, self._version = theirs, version
+        logger.warning(f"Gave up saving session {self.session_id} after {SAVE_ATTEMPTS} conflicting writes")
+
+    def _merge(self, base: dict, theirs: dict):
+        """
+        Replays this request's changes since `base` onto `theirs` (the state
+        another writer saved meanwhile): songs it removed stay removed, songs
+        it added are appended, fields it changed on a song win, and everything
+        else is theirs.
+        """
+        base_cart = {s['videoId']: s for s in base.get("cart", [])}
+        mine = {s['videoId']: s for s in self.cart}
+        merged = []
+        for song in theirs.get("cart", []):
+            vid = song['videoId']
+            if vid in base_cart and vid not in mine:
+                continue  # removed here
+            if vid in mine:
+                before = base_cart.get(vid, {})
+                song = {**song, **{k: v for k, v in mine[vid].items() if before.get(k) != v}}
+            merged.append(song)
+        present = {s['videoId'] for s in merged}
+        merged += [s for s in self.cart if s['videoId'] not in base_cart and s['videoId'] not in present]
+        self.cart = merged
+        if self.last_results == base.get("last_results", []):
+            self.last_results = theirs.get("last_results", [])
         
     def add_song(self, song: dict) -> str:
         """
@@ -22,6 +112,20 @@ class SessionState:
         logger.info(f"Added to cart: {song['title']} ({song['videoId']})")
         return f"Added '{song['title']}' by {song['artist']} to your cart. (Total: {len(self.cart)})"
 
+    def add_songs(self, songs: list[dict]) -> int:
+        """
+        Bulk version of add_song for imports: appends every song not already in
+        the cart (or earlier in `songs`). Returns how many were added.
+        """
+        present = {s['videoId'] for s in self.cart}
+        added = 0
+        for song in songs:
+            if song['videoId'] not in present:
+                present.add(song['videoId'])
+                self.cart.append(song)
+                added += 1
+        return added
+
     def remove_song(self, identifier: str) -> str:
         """
         Removes a song by title (fuzzy match) or videoId.
@@ -38,18 +142,68 @@ class SessionState:
                 
         return f"Could not find a song matching '{identifier}' in your cart."
 
+    def remove_at(self, position: int) -> str:
+        """
+        Removes a song by its 1-based position in the cart display.
+        """
+        if not 1 <= position <= len(self.cart):
+            return f"There is no song #{position} in your cart."
+        removed = self.cart.pop(position - 1)
+        return f"Removed '{removed['title']}' from cart."
+
+    def remove_ids(self, video_ids: list[str]) -> int:
+        """
+        Removes every song whose videoId is in `video_ids` (e.g. after checkout).
+        Returns how many were removed.
+        """
+        ids = set(video_ids)
+        before = len(self.cart)
+        self.cart = [s for s in self.cart if s['videoId'] not in ids]
+        return before - len(self.cart)
+
+    def apply_metadata(self, metadata: dict) -> int:
+        """
+        Fills in display metadata ({videoId: {thumbnails, album_art, ...}}, see
+        tools/metadata_tool.py) for cart songs that are still there, without
+        overwriting what a song already has. Returns how many songs changed.
+        """
+        updated = 0
+        for song in self.cart:
+            meta = metadata.get(song['videoId'])
+            missing = {k: v for k, v in (meta or {}).items() if song.get(k) in (None, [], "")}
+            if missing:
+                song.update(missing)
+                updated += 1
+        return updated
+
     def get_cart(self) -> list[dict]:
         return self.cart
 
-    def get_cart_display(self) -> str:
-        """String representation for the LLM/User."""
+    def get_cart_display(self, limit: int = 50) -> str:
+        """String representation for the LLM/User (first `limit` songs; imports can make carts huge)."""
         if not self.cart:
             return "Your cart is empty."
             
         output = "Current Cart:\n"
-        for i, song in enumerate(self.cart, 1):
+        for i, song in enumerate(self.cart[:limit], 1):
             output += f"{i}. {song['title']} - {song['artist']}\n"
+        if len(self.cart) > limit:
+            output += f"...and {len(self.cart) - limit} more ({len(self.cart)} songs total)\n"
         return output
 
+    def set_last_results(self, songs: list[dict]):
+        """Remembers a numbered listing so "add #2" can refer to it."""
+        self.last_results = list(songs)
+
+    def get_last_results(self) -> list[dict]:
+        return self.last_results
+
     def clear(self):
         self.cart = []
+
+# Context-local so concurrent requests (server threadpool) each work on their own copy
+_current = contextvars.ContextVar("session_state", default=None)
+
+def current_session() -> Optional[SessionState]:
+    """The SessionState of the request being served (see SessionState.active), or None."""
+    return _current.get()
@@ -0,0 +1,295 @@
+import os
+import json
+import zlib
+import socket
+import sqlite3
+import logging
+import threading
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Payloads bigger than this get zlib-compressed (agent histories grow quickly)
+COMPRESS_THRESHOLD = 512
+
+def dumps(obj) -> bytes:
+    """
+    Compact serialization for the state store: minified JSON, zlib-compressed
+    when large. The first byte tags the encoding so loads() can tell them apart.
+    """
+    raw = json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(raw) > COMPRESS_THRESHOLD:
+        return b"z" + zlib.compress(raw, 6)
+    return b"j" + raw
+
+def loads(data: bytes):
+    if data is None:
+        return None
+    tag, body = data[:1], data[1:]
+    if tag == b"z":
+        body = zlib.decompress(body)
+    elif tag != b"j":
+        raise ValueError(f"Unknown state encoding {tag!r}")
+    return json.loads(body.decode("utf-8"))
+
+class StateStore:
+    """
+    Minimal key/value interface for state shared between server workers.
+    Values are opaque bytes (see dumps/loads).
+
+    Every key also has a version (0 = missing) that each write bumps, so a
+    read-modify-write can detect that another request or worker wrote the
+    key in between (get_versioned + compare_and_set).
+    """
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def get_versioned(self, key: str) -> tuple:
+        """(value, version) of `key`; value is None (and version usually 0) if it doesn't exist."""
+        raise NotImplementedError
+
+    def compare_and_set(self, key: str, value: bytes, version: int) -> bool:
+        """
+        Writes `value` only if `key` is still at `version` (nobody wrote it since
+        it was read). Returns False, writing nothing, on a conflict.
+        """
+        raise NotImplementedError
+
+class MemoryStore(StateStore):
+    """Per-process store (the default) - fine for a single worker."""
+    def __init__(self):
+        self._data = {}  # key -> (value, version)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        return self.get_versioned(key)[0]
+
+    def set(self, key: str, value: bytes):
+        with self._lock:
+            self._data[key] = (value, self._data.get(key, (None, 0))[1] + 1)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def get_versioned(self, key: str) -> tuple:
+        with self._lock:
+            return self._data.get(key, (None, 0))
+
+    def compare_and_set(self, key: str, value: bytes, version: int) -> bool:
+        with self._lock:
+            if self._data.get(key, (None, 0))[1] != version:
+                return False
+            self._data[key] = (value, version + 1)
+            return True
+
+class SQLiteStore(StateStore):
+    """
+    File-backed store shared by every worker on one machine.
+    Uses WAL mode so readers don't block the writer.
+    """
+    def __init__(self, path: str = "state.db"):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+        try:
+            conn.execute("ALTER TABLE kv ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        except sqlite3.OperationalError:
+            pass  # already there
+        conn.commit()
+
+    def _conn(self):
+        # sqlite connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._conn().execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def set(self, key: str, value: bytes):
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO kv (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, version = version + 1",
+            (key, sqlite3.Binary(value))
+        )
+        conn.commit()
+
+    def delete(self, key: str):
+        conn = self._conn()
+        conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+        conn.commit()
+
+    def get_versioned(self, key: str) -> tuple:
+        row = self._conn().execute("SELECT value, version FROM kv WHERE key = ?", (key,)).fetchone()
+        return (bytes(row[0]), row[1]) if row else (None, 0)
+
+    def compare_and_set(self, key: str, value: bytes, version: int) -> bool:
+        conn = self._conn()
+        if version == 0:
+            cur = conn.execute("INSERT OR IGNORE INTO kv (key, value) VALUES (?, ?)", (key, sqlite3.Binary(value)))
+        else:
+            cur = conn.execute("UPDATE kv SET value = ?, version = version + 1 WHERE key = ? AND version = ?",
+                               (sqlite3.Binary(value), key, version))
+        conn.commit()
+        return cur.rowcount == 1
+
+class RedisStore(StateStore):
+    """
+    Talks the Redis wire protocol (RESP) directly over a socket, so it works
+    against Redis, Valkey, KeyDB or any local stand-in without a client library.
+    Only GET/SET/DEL/MGET, INCR/EXPIRE, WATCH/MULTI/EXEC (+ SELECT/AUTH on
+    connect) are used. A key's version lives next to it in "<key>:version".
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, db: int = 0,
+                 password: str = None, timeout: float = 5.0, ttl: int = None):
+        self.host, self.port, self.db = host, port, db
+        self.password = password
+        self.timeout = timeout
+        self.ttl = ttl  # optional expiry (seconds) for every key
+        self._local = threading.local()
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs):
+        u = urlparse(url)
+        db = int(u.path.lstrip("/") or 0)
+        return cls(host=u.hostname or "127.0.0.1", port=u.port or 6379, db=db, password=u.password, **kwargs)
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+        if self.password:
+            self._command("AUTH", self.password)
+        if self.db:
+            self._command("SELECT", str(self.db))
+
+    def _command(self, *args):
+        if getattr(self._local, "sock", None) is None:
+            self._connect()
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._local.sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        reader = self._local.reader
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(f"Redis error: {rest.decode()}")
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length == -1:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(rest)
+            return None if count == -1 else [self._read_reply() for _ in range(count)]
+        raise RuntimeError(f"Unexpected Redis reply: {line!r}")
+
+    def _call(self, *args):
+        # One reconnect attempt on a dropped connection (e.g. server restart)
+        try:
+            return self._command(*args)
+        except (ConnectionError, OSError):
+            self._close()
+            return self._command(*args)
+
+    def _retry(self, fn):
+        # Like _call: one reconnect attempt for a multi-command exchange
+        try:
+            return fn()
+        except (ConnectionError, OSError):
+            self._close()
+            return fn()
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def _expiry(self) -> tuple:
+        return ("EX", str(self.ttl)) if self.ttl else ()
+
+    def _transaction(self, *commands):
+        """Runs commands in MULTI/EXEC; None if a WATCHed key changed (nothing applied)."""
+        self._command("MULTI")
+        for command in commands:
+            self._command(*command)
+        return self._command("EXEC")
+
+    def get(self, key: str):
+        return self._call("GET", key)
+
+    def set(self, key: str, value: bytes):
+        def write():
+            commands = [("SET", key, value, *self._expiry()), ("INCR", f"{key}:version")]
+            if self.ttl:
+                commands.append(("EXPIRE", f"{key}:version", str(self.ttl)))
+            return self._transaction(*commands)
+        self._retry(write)
+
+    def delete(self, key: str):
+        self._call("DEL", key, f"{key}:version")
+
+    def get_versioned(self, key: str) -> tuple:
+        value, version = self._call("MGET", key, f"{key}:version")
+        return value, int(version or 0)
+
+    def compare_and_set(self, key: str, value: bytes, version: int) -> bool:
+        def write():
+            self._command("WATCH", f"{key}:version")
+            current = self._command("GET", f"{key}:version")
+            if int(current or 0) != version:
+                self._command("UNWATCH")
+                return False
+            return self._transaction(
+                ("SET", key, value, *self._expiry()),
+                ("SET", f"{key}:version", str(version + 1), *self._expiry())
+            ) is not None
+        return self._retry(write)
+
+def get_store(url: str = None) -> StateStore:
+    """
+    Builds the store configured by STATE_STORE:
+        memory (default) | sqlite:///path/to/state.db | redis://[:password@]host:port/db
+    """
+    url = url or os.getenv("STATE_STORE", "memory")
+    if url == "memory":
+        return MemoryStore()
+    if url.startswith("sqlite://"):
+        path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else "state.db"
+        logger.info(f"Using SQLite state store at {path}")
+        return SQLiteStore(path or "state.db")
+    if url.startswith("redis://"):
+        logger.info(f"Using Redis-protocol state store at {url.split('@')[-1]}")
+        return RedisStore.from_url(url)
+    raise ValueError(f"Unsupported STATE_STORE '{url}'")
@@ -0,0 +1,99 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.client import get_guest_client
+from tools.search_tool import search_song, BEST_MATCH_LIMIT
+from tools.mood_tool import mood_index
+from tools.library_tool import warm_library_cache
+
+logger = logging.getLogger(__name__)
+
+# Popular searches to run at startup so they're cached (comma separated)
+WARMUP_QUERIES = [q.strip() for q in os.getenv("WARMUP_QUERIES", "").split(",") if q.strip()]
+
+class Readiness:
+    """
+    Outcome of each startup warm-up step, for /readyz.
+    The process is ready once warm-up has finished and every required step
+    (the agent) succeeded; optional steps only make it "degraded".
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.steps = {}
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def run(self, name: str, fn, *args, required: bool = False):
+        """Runs one warm-up step, recording its duration and error. Returns fn's result (None on failure)."""
+        start = time.perf_counter()
+        try:
+            result, error = fn(*args), None
+        except Exception as e:
+            result, error = None, str(e)
+            logger.warning(f"Warm-up step '{name}' failed: {e}")
+        with self._lock:
+            self.steps[name] = {
+                "ok": error is None,
+                "required": required,
+                "seconds": round(time.perf_counter() - start, 3),
+                "error": error
+            }
+        return result
+
+    def finish(self):
+        self.finished_at = time.time()
+        logger.info(f"Warm-up finished in {self.finished_at - self.started_at:.1f}s")
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            required_ok = all(s["ok"] for s in self.steps.values() if s["required"])
+        return self.finished_at is not None and required_ok
+
+    def report(self) -> dict:
+        with self._lock:
+            steps = {name: dict(s) for name, s in self.steps.items()}
+        if self.finished_at is None:
+            status = "warming"
+        elif not self.ready:
+            status = "failed"
+        else:
+            status = "ready" if all(s["ok"] for s in steps.values()) else "degraded"
+        return {"status": status, "ready": self.ready, "steps": steps}
+
+def _warm_ytmusic(queries: list[str]) -> int:
+    """Creates the shared client, opens connections and caches the popular queries (as the tools search them)."""
+    if not queries:
+        get_guest_client().get_search_suggestions("music")
+        return 0
+    # Concurrent, so several pooled connections get opened
+    with ThreadPoolExecutor(max_workers=min(4, len(queries)), thread_name_prefix="warmup") as pool:
+        found = list(pool.map(lambda q: search_song(q, limit=BEST_MATCH_LIMIT), queries))
+    if not any(found):
+        raise RuntimeError("No results for any warm-up query")
+    return len(queries)
+
+def _warm_moods():
+    mood_index.ensure_loaded()
+    if mood_index.built_at is None:
+        raise RuntimeError("Moods & Genres index could not be built")
+
+def _has_auth() -> bool:
+    return os.path.exists("browser.json") or os.path.exists("curl.txt")
+
+def warm_up(readiness: Readiness, agent=None, queries: list[str] = WARMUP_QUERIES):
+    """
+    Pays the first-request costs up front: LLM client connection, YouTube Music
+    client + connections, cached popular searches, the Moods & Genres index and
+    (when auth is configured) the parsed auth headers and library index.
+    """
+    if agent is not None:
+        readiness.run("llm", agent.warm_up)
+    readiness.run("ytmusic", _warm_ytmusic, queries)
+    if _has_auth():
+        readiness.run("library", warm_library_cache)
+    readiness.run("moods", _warm_moods)
+    readiness.finish()
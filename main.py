@@ -1,108 +1,367 @@
 import os
+import time
 import logging
 import json
+import math
+import uuid
+import hashlib
+import copy
+import functools
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 # --- CONFIGURATION & IMPORTS ---
 load_dotenv()
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from agent.logs import setup_logging, log_context
+# Queue-based: request threads only enqueue records (see agent/logs.py)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 LLM_PROVIDER = os.getenv("LLM_name", "GEMINI").upper() # GEMINI or OPENAI
+# Max LLM <-> tool round trips in one turn
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "6"))
+# Per-call cap for LLM requests (the turn deadline may cut it shorter)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+# Conversations kept in memory per process (older ones are reloaded from the store)
+AGENT_SESSIONS = int(os.getenv("AGENT_SESSIONS", "256"))
+# Related artists whose top songs are prefetched after an artist lookup
+PREFETCH_RELATED_ARTISTS = int(os.getenv("PREFETCH_RELATED_ARTISTS", "2"))
 
 # Import our modular tools
-from tools.search_tool import search_song
-from tools.artist_tool import get_artist_top_songs
+from tools.search_tool import search_song, BEST_MATCH_LIMIT
+from tools.artist_tool import get_artist_top_songs, get_artist_discography, get_related_artists, prefetch_artist
 from tools.playlist_tool import create_playlist_from_ids
-from tools.recommendation_tool import get_recommendations
+from tools.recommendation_tool import get_recommendations, prefetch_recommendations
+from tools.library_tool import sync_playlist
+from tools.import_tool import resolve_playlist, iter_playlist_pages
+from tools.mood_tool import get_mood_playlists, get_playlist_songs
+from tools.deadline import Deadline, current_deadline
+from tools.prefetch import prefetcher
 # Import State
-from agent.state import SessionState
+from agent.state import SessionState, current_session
+from agent.router import IntentRouter
+from agent.metrics import metrics
+from agent.jobs import JobQueue
+from agent.store import get_store, dumps, loads, MemoryStore
+from agent.profiling import PROFILE_MODE, profile_turn, profiles
+from agent.warmup import Readiness, warm_up
+from agent.llm_cache import completions, completion_key
 
 # Global State
-session = SessionState()
+# The store (STATE_STORE env var) holds carts and agent histories so several
+# server workers can share them; each request works on its own copy of its
+# session (see session_scope), which tools find via current_session().
+store = get_store()
+DEFAULT_SESSION = "default"
+# Background playlist jobs: checkout, import (bounded so a burst can't exhaust threads)
+# (job snapshots only need the store when it is shared between processes)
+checkout_jobs = JobQueue(
+    max_workers=int(os.getenv("CHECKOUT_WORKERS", "2")),
+    store=None if isinstance(store, MemoryStore) else store
+)
 
 # --- TOOL WRAPPERS ---
 def get_artist_songs(artist_name: str) -> str:
     """Gets the top songs for a specific artist."""
-    print(f"\n🤖 Agent: Getting top songs for {artist_name}...")
+    logger.info(f"Getting top songs for {artist_name}")
     songs = get_artist_top_songs(artist_name, limit=5)
     if not songs: return f"Could not find top songs for {artist_name}."
+    current_session().set_last_results(songs)
     output = f"Top songs by {artist_name} (NOT in cart yet):\n"
-    for s in songs:
-        output += f"- {s['title']} (Album: {s['album']})\n"
+    for i, s in enumerate(songs, 1):
+        output += f"{i}. {s['title']} (Album: {s['album']})\n"
+    return output + "\nAsk to add any of these to your cart!"
+
+def get_artist_deep_cuts(artist_name: str) -> str:
+    """Gets lesser-known songs from across an artist's whole discography (albums + singles)."""
+    logger.info(f"Digging through {artist_name}'s discography")
+    catalog = get_artist_discography(artist_name)
+    if not catalog: return f"Could not load the discography for {artist_name}."
+
+    # Skip the hits, then take one song per album in turn so we cover many releases
+    top_ids = {s['videoId'] for s in get_artist_top_songs(artist_name, limit=20)}
+    by_album = {}
+    for song in catalog:
+        if song['videoId'] not in top_ids:
+            by_album.setdefault(song['album'], []).append(song)
+    picks = []
+    while len(picks) < 10 and any(by_album.values()):
+        for album_songs in by_album.values():
+            if album_songs and len(picks) < 10:
+                picks.append(album_songs.pop(0))
+    if not picks: return f"{artist_name}'s catalog only has their top songs."
+
+    current_session().set_last_results(picks)
+    output = f"Deep cuts by {artist_name} from {len(catalog)} songs across their discography (NOT in cart yet):\n"
+    for i, s in enumerate(picks, 1):
+        output += f"{i}. {s['title']} (Album: {s['album']})\n"
     return output + "\nAsk to add any of these to your cart!"
 
 def get_song_recommendations(seed_song: str) -> str:
     """Gets recommendations based on a seed song."""
-    print(f"\n🤖 Agent: Finding recommendations similar to '{seed_song}'...")
-    found = search_song(seed_song, limit=1)
+    logger.info(f"Finding recommendations similar to '{seed_song}'")
+    found = search_song(seed_song, limit=BEST_MATCH_LIMIT)
     if not found: return f"Could not find seed song '{seed_song}'."
     seed = found[0]
     recs = get_recommendations(seed['videoId'], limit=5)
+    current_session().set_last_results(recs)
     output = f"Recommendations based on '{seed['title']}' (NOT in cart yet):\n"
-    for r in recs:
-        output += f"- {r['title']} by {r['artist']}\n"
+    for i, r in enumerate(recs, 1):
+        output += f"{i}. {r['title']} by {r['artist']}\n"
+    return output + "\nAsk to add any of these to your cart!"
+
+def browse_mood_playlists(mood: str) -> str:
+    """Finds curated YouTube Music playlists for a mood or genre (e.g. "chill", "workout", "jazz")."""
+    logger.info(f"Browsing '{mood}' playlists")
+    category, playlists = get_mood_playlists(mood, limit=5)
+    if not playlists: return f"No playlists found for mood/genre '{mood}'."
+    output = f"Playlists for '{category or mood}':\n"
+    for p in playlists:
+        output += f"- {p['title']} (ID: {p['playlistId']})\n"
+    return output + "\nUse get_mood_playlist_songs with an ID to see the songs."
+
+def get_mood_playlist_songs(playlist_id: str) -> str:
+    """Lists songs from a playlist found via browse_mood_playlists."""
+    logger.info(f"Opening playlist {playlist_id}")
+    songs = get_playlist_songs(playlist_id, limit=10)
+    if not songs: return f"Could not load songs for playlist {playlist_id}."
+    current_session().set_last_results(songs)
+    output = "Songs in this playlist (NOT in cart yet):\n"
+    for i, s in enumerate(songs, 1):
+        output += f"{i}. {s['title']} by {s['artist']}\n"
     return output + "\nAsk to add any of these to your cart!"
 
 def add_song_to_cart(song_query: str) -> str:
     """Searches for a song and adds it to the Cart."""
-    print(f"\n🤖 Agent: Adding '{song_query}' to cart...")
-    results = search_song(song_query, limit=1)
+    results = search_song(song_query, limit=BEST_MATCH_LIMIT)
     if not results: return f"Could not find song '{song_query}'."
     song = results[0]
-    msg = session.add_song(song)
-    print(f"   ✅ {msg}")
+    msg = current_session().add_song(song)
+    logger.info(msg)
     return msg
 
 def remove_song_from_cart(song_name_or_id: str) -> str:
     """Removes a song from the cart."""
-    return session.remove_song(song_name_or_id)
+    return current_session().remove_song(song_name_or_id)
 
 def review_cart() -> str:
     """Returns the current list of songs in the cart."""
-    return session.get_cart_display()
+    return current_session().get_cart_display()
+
+def clear_cart() -> str:
+    """Removes every song from the cart."""
+    current_session().clear()
+    return "Cart cleared."
+
+def _run_checkout(job, playlist_name: str, songs: list[dict], description: str) -> str:
+    """Background half of checkout_playlist (runs on the checkout job queue)."""
+    from tools.playlist_tool import get_authenticated_client
+
+    # get_authenticated_client refreshes browser.json from curl.txt first
+    job.report("🔄 Refreshing auth...")
+    yt = get_authenticated_client()
+    job.check_cancelled()
+
+    job.report(f"🎶 Building playlist '{playlist_name}' with {len(songs)} songs...")
+    ids = [s['videoId'] for s in songs]
+    pid = create_playlist_from_ids(playlist_name, ids, description, yt=yt)
+
+    # Only drop what we actually checked out - the user may have kept adding songs meanwhile
+    with session_scope(job.session_id) as session:
+        session.remove_ids(ids)
+    return f"Success! Playlist '{playlist_name}' created. ID: {pid}. Checked-out songs removed from cart."
+
+def checkout_playlist(playlist_name: str, description: str = "Created by AI Agent") -> str:
+    """Finalizes the cart into a real YouTube Music Playlist (runs in the background)."""
+    session = current_session()
+    cart = list(session.get_cart())
+    if not cart: return "Cart is empty! add some songs first."
+
+    # Same name + same songs => same key, so a retried turn reuses the existing job
+    # instead of creating a duplicate playlist.
+    ids = [s['videoId'] for s in cart]
+    key = hashlib.sha1(json.dumps([session.session_id, playlist_name.strip().lower(), ids]).encode()).hexdigest()
+    job, created = checkout_jobs.submit(
+        f"Checkout '{playlist_name}'", _run_checkout, playlist_name, cart, description,
+        key=key, session_id=session.session_id
+    )
+    if not created:
+        return f"Checkout of '{playlist_name}' is already {job.status} (Job ID: {job.id}). Not creating a duplicate."
+
+    logger.info(f"Queued checkout job {job.id} for '{playlist_name}' ({len(cart)} songs)")
+    return (f"Checkout started for '{playlist_name}' with {len(cart)} songs (Job ID: {job.id}). "
+            "Progress will appear shortly; the songs leave the cart once the playlist is created.")
 
-def checkout_playlist(playlist_name: str) -> str:
-    """Finalizes the cart into a real YouTube Music Playlist."""
-    cart = session.get_cart()
+def add_cart_to_playlist(playlist_name: str, mirror: bool = False) -> str:
+    """Adds the cart to an EXISTING library playlist (found by name). With mirror=True (exact playlist name only), songs not in the cart are removed from it."""
+    session = current_session()
+    cart = list(session.get_cart())
     if not cart: return "Cart is empty! add some songs first."
-    
-    # Refresh Auth immediately before creation
+    logger.info(f"Syncing {len(cart)} songs into '{playlist_name}'")
+    ids = [s['videoId'] for s in cart]
     try:
-        from scripts.setup_browser_auth import parse_curl_and_save
-        print(f"🔄 optimizing auth...")
-        parse_curl_and_save() # Updates browser.json
+        result = sync_playlist(playlist_name, ids, remove_missing=mirror)
+    except LookupError as e:
+        return f"{e} Use checkout_playlist to create a new one."
     except Exception as e:
-        print(f"⚠️ Auth refresh warning: {e}")
+        return f"Error updating playlist: {e}"
+    # Songs YouTube Music rejected stay in the cart so the user can retry
+    session.remove_ids(result['synced'])
+    msg = f"Updated '{result['title']}': added {result['added']} new songs"
+    if mirror:
+        msg += f", removed {result['removed']}"
+    msg += " (songs already there were skipped). Synced songs removed from cart."
+    if result['failed']:
+        msg += f" {len(result['failed'])} songs could not be added and are still in the cart."
+    return msg
 
-    print(f"\n🤖 Agent: Building playlist '{playlist_name}' with {len(cart)} songs...")
-    ids = [s['videoId'] for s in cart]
+def _run_import(job, playlist_id: str, title: str) -> str:
+    """Background half of import_playlist_to_cart: adds the playlist page by page."""
+    job.report(f"📥 Importing '{title}'...")
+    seen = added = 0
+    for songs in iter_playlist_pages(playlist_id):
+        job.check_cancelled()
+        # Short scope per page, so chat turns can interleave with a long import
+        with session_scope(job.session_id) as session:
+            added += session.add_songs(songs)
+            total = len(session.get_cart())
+        seen += len(songs)
+        job.report(f"📥 {seen} songs read, {added} new in cart (cart: {total})")
+    if not seen:
+        return f"'{title}' has no playable songs to import."
+    return f"Imported '{title}': {added} new songs added to the cart ({seen - added} were already there)."
+
+def import_playlist_to_cart(playlist: str) -> str:
+    """Imports an existing playlist into the cart (runs in the background). Accepts "liked songs", a playlist URL/ID or a library playlist name."""
+    logger.info(f"Importing '{playlist}' into the cart")
     try:
-        pid = create_playlist_from_ids(playlist_name, ids, "Created by AI Agent")
-        session.clear()
-        return f"Success! Playlist '{playlist_name}' created. ID: {pid}. Cart cleared."
+        playlist_id, title = resolve_playlist(playlist)
+    except LookupError as e:
+        return str(e)
     except Exception as e:
-        return f"Error creating playlist: {e}"
+        return f"Error finding playlist: {e}"
+
+    # Repeats while the cart is unchanged reuse the job; after edits it can run again
+    session = current_session()
+    cart_ids = [s['videoId'] for s in session.get_cart()]
+    key = hashlib.sha1(json.dumps([session.session_id, "import", playlist_id, cart_ids]).encode()).hexdigest()
+    job, created = checkout_jobs.submit(
+        f"Import '{title}'", _run_import, playlist_id, title, key=key, session_id=session.session_id
+    )
+    if not created:
+        return f"Import of '{title}' is already {job.status} (Job ID: {job.id})."
+    return (f"Import of '{title}' started (Job ID: {job.id}). "
+            "Songs are added to the cart as they load; large playlists take a moment.")
+
+@contextmanager
+def session_scope(session_id: str = DEFAULT_SESSION, agent=None):
+    """
+    Loads the cart (and optionally the agent's history) for one request and
+    writes back whatever changed when the request ends. Yields the request's
+    own SessionState; code running tools makes it current with .active().
+
+    Requests don't wait for each other: cart changes made meanwhile by other
+    requests or workers are merged when saving (SessionState.save). Only turns
+    of one conversation run one at a time (the agent's turn_lock; pass the
+    session's agent from ChatAgent.for_session).
+    """
+    session = SessionState(store, session_id)
+    session.load()
+    if not agent:
+        try:
+            yield session
+        finally:
+            session.save()
+        return
+    with agent.turn_lock:
+        agent.load_state(store, session_id)
+        agent.session = session
+        try:
+            yield session
+        finally:
+            session.save()
+            agent.save_state(store, session_id)
+            agent.session = None
+
+def _prefetch_follow_ups(name: str, args: tuple, kwargs: dict, result):
+    """
+    Guesses the next request from the tool that just ran and warms the
+    caches it would hit (tools/prefetch.py): radio for a song just added,
+    top songs of artists related to one just looked up.
+    """
+    session = current_session()
+    session_id = session.session_id
+    if name == "add_song_to_cart" and str(result).startswith("Added") and session.cart:
+        prefetch_recommendations(session_id, session.cart[-1]['videoId'])
+    elif name == "get_artist_songs" and not str(result).startswith("Could not"):
+        artist_name = kwargs.get("artist_name") or (args[0] if args else "")
+        for related in get_related_artists(artist_name, limit=PREFETCH_RELATED_ARTISTS):
+            prefetch_artist(session_id, related)
+
+def _instrument_tool(func):
+    """
+    Runs a tool under the current turn's deadline (once it has passed the tool
+    is skipped, otherwise its output is kept for a partial answer), tagging its
+    log records with the tool name and timing it.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        deadline = current_deadline()
+        if deadline and deadline.expired():
+            deadline.missed = True
+            return "Error: out of time for this request. Answer with the results you already have."
+        start = time.perf_counter()
+        with log_context(tool=name), prefetcher.foreground():
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            logger.info(f"Tool {name} finished", extra={"duration_ms": round(elapsed * 1000, 1)})
+        metrics.observe(f"tool.{name}", elapsed)
+        if deadline:
+            deadline.results.append((name, result))
+        if prefetcher.enabled:
+            try:
+                _prefetch_follow_ups(name, args, kwargs, result)
+            except Exception as e:
+                logger.warning(f"Prefetch after {name} failed: {e}")
+        return result
+    return wrapper
 
 # Map of function objects for execution handling
 AVAILABLE_TOOLS = {
     "get_artist_songs": get_artist_songs,
+    "get_artist_deep_cuts": get_artist_deep_cuts,
     "get_song_recommendations": get_song_recommendations,
+    "browse_mood_playlists": browse_mood_playlists,
+    "get_mood_playlist_songs": get_mood_playlist_songs,
     "add_song_to_cart": add_song_to_cart,
     "remove_song_from_cart": remove_song_from_cart,
     "review_cart": review_cart,
-    "checkout_playlist": checkout_playlist
+    "clear_cart": clear_cart,
+    "checkout_playlist": checkout_playlist,
+    "add_cart_to_playlist": add_cart_to_playlist,
+    "import_playlist_to_cart": import_playlist_to_cart
 }
+AVAILABLE_TOOLS = {name: _instrument_tool(func) for name, func in AVAILABLE_TOOLS.items()}
+
+# Tools whose output depends only on their arguments (cached lookups). An LLM
+# completion that follows any other tool's result (cart state, radio picks,
+# side effects) is never served from or stored in the completion cache.
+DETERMINISTIC_TOOLS = {"get_artist_songs", "browse_mood_playlists", "get_mood_playlist_songs"}
 
 SYSTEM_INSTRUCTION = """
 You are an intelligent Music Curator Agent for YouTube Music.
 **Your Goal**: Help the user build a perfect playlist through conversation.
 **Your Memory**: You have a "Shopping Cart" where you store songs the user likes.
 **Workflow**:
-1. **Discovery**: Use `get_artist_songs` or `get_song_recommendations`.
+1. **Discovery**: Use `get_artist_songs` or `get_song_recommendations` (`get_artist_deep_cuts` for lesser-known songs). For a mood or genre ("chill", "workout"), use `browse_mood_playlists`, then `get_mood_playlist_songs`.
 2. **Curation**: When the user likes a song, use `add_song_to_cart`. (NEVER add without user intent).
-3. **Review**: Use `review_cart`.
-4. **Checkout**: When the user says "Build playlist", use `checkout_playlist`.
+   To start from a playlist they already have (or their liked songs), use `import_playlist_to_cart`.
+3. **Review**: Use `review_cart` (or `clear_cart` to start over).
+4. **Checkout**: When the user says "Build playlist", use `checkout_playlist`. To add to a playlist they ALREADY have (e.g. "add these to my Gym playlist"), use `add_cart_to_playlist`.
 **Tone**: Enthusiastic, knowledgeable, helper.
 """
 
@@ -111,12 +370,120 @@ You are an intelligent Music Curator Agent for YouTube Music.
 class ChatAgent:
     def __init__(self):
         self.history = []
+        self.router = IntentRouter()
+        # SessionState of the turn in progress, set by session_scope
+        self.session = None
+        # A plain Lock, not RLock - the server may release it from another thread
+        self.turn_lock = threading.Lock()
+        # What was last loaded/saved via the state store (see load_state)
+        self._session_id = None
+        self._history_blob = None
+        self._sessions = OrderedDict()  # session id -> agent copy (see for_session)
+        self._sessions_lock = threading.Lock()
+
+    def for_session(self, session_id: str) -> "ChatAgent":
+        """
+        This agent's conversation with one session: a copy sharing the LLM
+        client, with its own history and turn lock, so turns of different
+        sessions run in parallel. The most recently used AGENT_SESSIONS copies
+        are kept, so a session's next turn needn't rebuild its history.
+        """
+        with self._sessions_lock:
+            agent = self._sessions.pop(session_id, None)
+            if agent is None:
+                agent = copy.copy(self)
+                agent.session = None
+                agent.turn_lock = threading.Lock()
+                agent._session_id = agent._history_blob = None
+            self._sessions[session_id] = agent
+            # Drop the least recently used idle copies (their history is in the store)
+            for idle_id in list(self._sessions):
+                if len(self._sessions) <= AGENT_SESSIONS:
+                    break
+                if not self._sessions[idle_id].turn_lock.locked():
+                    del self._sessions[idle_id]
+        return agent
         
     # from typing import Generator
     # def send_message(self, message: str) -> Generator[dict, None, None]:
     def send_message(self, message: str):
+        """
+        Handles simple cart commands locally (see agent/router.py) and
+        falls back to the LLM for everything else.
+        """
+        session = self.session
+        # Keeps this session's speculative prefetches alive
+        prefetcher.touch(session.session_id)
+        with session.active():
+            routed = self.router.route(message)
+        if routed:
+            intent, reply = routed
+            yield {"type": "log", "content": f"⚡ Fast path: {intent}"}
+            self.record_exchange(message, reply)
+            yield {"type": "answer", "content": reply}
+            return
+
+        # The deadline and log fields are made current around each step rather than
+        # once, because the server may resume this generator on a different thread per event.
+        start = time.perf_counter()
+        deadline = Deadline()
+        turn = uuid.uuid4().hex[:8]
+        steps = self._send_to_llm(message)
+        while True:
+            with session.active(), deadline.active(), log_context(session=session.session_id, turn=turn):
+                try:
+                    event = next(steps)
+                except StopIteration:
+                    break
+            yield event
+        elapsed = time.perf_counter() - start
+        metrics.observe("agent.llm_turn", elapsed)
+        with log_context(session=session.session_id, turn=turn):
+            logger.info("LLM turn finished", extra={"duration_ms": round(elapsed * 1000, 1)})
+            if deadline.missed:
+                metrics.incr("agent.deadline_miss")
+                logger.warning(f"Turn missed its {deadline.seconds:g}s deadline")
+
+    def warm_up(self):
+        """Opens the LLM client's connection (and checks the credentials) before the first turn."""
+
+    def _send_to_llm(self, message: str):
+        """Yields log/answer events. Runs with the turn's Deadline current (see current_deadline)."""
         raise NotImplementedError
 
+    @staticmethod
+    def _partial_answer(deadline: Deadline) -> str:
+        """Reply for a turn cut short: whatever the tools found so far."""
+        if not deadline.results:
+            return "⏱️ Sorry, I couldn't finish that in time. Please try again."
+        found = "\n\n".join(dict.fromkeys(str(output) for _, output in deadline.results))
+        return f"⏱️ I couldn't finish everything, but here's what I found so far:\n\n{found}"
+
+    def record_exchange(self, message: str, reply: str):
+        """Keeps the LLM's view of the conversation in sync with fast-path turns."""
+        self.history.append({"user": message, "reply": reply})
+
+    def export_history(self) -> list:
+        """JSON-serializable conversation history (for the state store)."""
+        return self.history
+
+    def import_history(self, history: list):
+        """Replaces the conversation with one from export_history() ([] = fresh)."""
+        self.history = history
+
+    def load_state(self, store, session_id: str):
+        data = store.get(f"history:{session_id}")
+        if session_id == self._session_id and data == self._history_blob:
+            return  # this process served the last turn; local history is current
+        self.import_history(loads(data) or [])
+        self._session_id, self._history_blob = session_id, data
+
+    def save_state(self, store, session_id: str):
+        data = dumps(self.export_history())
+        if data != self._history_blob:
+            store.set(f"history:{session_id}", data)
+        self._session_id, self._history_blob = session_id, data
+
 class GeminiAgent(ChatAgent):
     def __init__(self):
         super().__init__()
@@ -125,6 +492,7 @@ class GeminiAgent(ChatAgent):
         
         api_key = os.getenv("GEMINI_API_KEY")
         model_name = os.getenv("GEMINI_MODEL_NAME", "gemini-2.0-flash")
+        self.model_name = model_name
         print(f"Initializing GEMINI Agent ({model_name})...")
         
         self.client = genai.Client(api_key=api_key)
@@ -132,33 +500,142 @@ class GeminiAgent(ChatAgent):
         self.config = types.GenerateContentConfig(
             system_instruction=SYSTEM_INSTRUCTION,
             tools=self.tools_list,
-            automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=False)
+            automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True)
         )
         self.chat = self.client.chats.create(model=model_name, config=self.config)
+        # Tools as the model sees them, for completion cache keys
+        self.tools_key = [[f.__name__, f.__doc__] for f in self.tools_list]
 
-    def send_message(self, message: str):
+    def warm_up(self):
+        self.client.models.get(model=self.model_name)
+
+    def record_exchange(self, message: str, reply: str):
+        from google.genai import types
+        super().record_exchange(message, reply)
+        self.chat.record_history(
+            user_input=types.Content(role="user", parts=[types.Part(text=message)]),
+            model_output=[types.Content(role="model", parts=[types.Part(text=reply)])],
+            is_valid=True
+        )
+
+    def export_history(self) -> list:
+        return [c.model_dump(mode="json", exclude_none=True) for c in self.chat.get_history(curated=True)]
+
+    def import_history(self, history: list):
+        from google.genai import types
+        contents = [types.Content.model_validate(c) for c in history]
+        self.chat = self.client.chats.create(model=self.model_name, config=self.config, history=contents)
+
+    def _replay_cached_turn(self, history: list, cached: dict) -> bool:
+        """
+        Applies a cached turn: its tool calls are run again (cheap, cached
+        lookups that also restore side state like the numbered results) and
+        must give the recorded results; then its contents join the history.
+        Returns False (nothing applied) if any result changed.
+        """
+        from google.genai import types
+        contents = [types.Content.model_validate(c) for c in cached["contents"]]
+        parts = [p for c in contents for p in c.parts or []]
+        calls = [p.function_call for p in parts if p.function_call]
+        responses = [p.function_response for p in parts if p.function_response]
+        for call, recorded in zip(calls, responses):
+            result = AVAILABLE_TOOLS[call.name](**(call.args or {}))
+            if str(result) != str((recorded.response or {}).get("result")):
+                metrics.incr("llm_cache.stale")
+                return False
+        self.chat = self.client.chats.create(model=self.model_name, config=self.config, history=history + contents)
+        return True
+
+    def _send_to_llm(self, message: str):
+        from google.genai import types
+        deadline = current_deadline()
+        # (a copy: the SDK returns its live list, which this turn appends to)
+        history = list(self.chat.get_history(curated=True))
+        key = None
+        if completions.enabled:
+            turn = [c.model_dump(mode="json", exclude_none=True) for c in history]
+            turn.append({"role": "user", "parts": [{"text": message}]})
+            key = completion_key(self.model_name, turn, self.tools_key)
         try:
-            # Gemini auto-execution is synchronous in this SDK version
-            # So we can't easily stream logs unless we implement manual tool loop.
-            # Use a dummy log to show activity.
+            cached = completions.get(key) if key else None
+            if cached and self._replay_cached_turn(history, cached):
+                yield {"type": "log", "content": "⚡ Cached reply"}
+                yield {"type": "answer", "content": cached["text"]}
+                return
+
             yield {"type": "log", "content": "Processing with Gemini..."}
-            
-            response = self.chat.send_message(message)
-            text_resp = ""
-            if response.text:
-                text_resp = response.text
-            elif response.candidates and response.candidates[0].content.parts:
-                text_resp = response.candidates[0].content.parts[0].text
-            else:
-                text_resp = "(No text response)"
+
+            # Tools are run here rather than by the SDK's automatic function calling,
+            # so each model request gets a timeout from the time left in the turn
+            pending = message
+            text_resp = None
+            elapsed = 0.0
+            for _ in range(MAX_TOOL_ROUNDS):
+                # (rounded up, so a request cut off by the deadline finds it expired)
+                timeout_ms = math.ceil(deadline.timeout(LLM_TIMEOUT, "Gemini call") * 1000)
+                config = self.config.model_copy(update={"http_options": types.HttpOptions(timeout=timeout_ms)})
+                start = time.perf_counter()
+                response = self.chat.send_message(pending, config=config)
+                elapsed += time.perf_counter() - start
+                if not response.function_calls:
+                    text_resp = self._response_text(response)
+                    break
+                pending = []
+                for call in response.function_calls:
+                    args = dict(call.args or {})
+                    yield {"type": "log", "content": f"🛠️ Executing: {call.name}({args})"}
+                    func = AVAILABLE_TOOLS.get(call.name)
+                    result = f"Error: unknown tool {call.name}"
+                    if func:
+                        try:
+                            result = func(**args)
+                        except Exception as e:
+                            result = f"Error: {e}"
+                    pending.append(types.Part.from_function_response(name=call.name, response={"result": result}))
+
+            if text_resp is None:
+                metrics.incr("agent.tool_rounds_exhausted")
+                logger.warning(f"Stopped after {MAX_TOOL_ROUNDS} tool rounds")
+                yield {"type": "answer", "content": self._cut_short(message, history, deadline)}
+                return
+
+            if key:
+                contents = self.chat.get_history(curated=True)[len(history):]
+                tools_used = {p.function_call.name for c in contents for p in c.parts or [] if p.function_call}
+                if tools_used <= DETERMINISTIC_TOOLS:
+                    completions.set(key, {
+                        "contents": [c.model_dump(mode="json", exclude_none=True) for c in contents],
+                        "text": text_resp
+                    }, elapsed)
+                else:
+                    completions.bypass()
             
             yield {"type": "answer", "content": text_resp}
 
         except Exception as e:
+            if deadline.expired():
+                deadline.missed = True
+                yield {"type": "answer", "content": self._cut_short(message, history, deadline)}
+                return
             err_msg = f"Error: {e}"
             if "429" in str(e): err_msg = "⚠️ Quota Exceeded (429)."
             yield {"type": "answer", "content": err_msg}
 
+    @staticmethod
+    def _response_text(response) -> str:
+        if response.text:
+            return response.text
+        if response.candidates and response.candidates[0].content.parts:
+            return response.candidates[0].content.parts[0].text
+        return "(No text response)"
+
+    def _cut_short(self, message: str, history: list, deadline: Deadline) -> str:
+        """Drops the half-finished tool exchange of this turn and records a partial answer instead."""
+        self.chat = self.client.chats.create(model=self.model_name, config=self.config, history=history)
+        reply = self._partial_answer(deadline)
+        self.record_exchange(message, reply)
+        return reply
+
 class OpenAIAgent(ChatAgent):
     def __init__(self):
         super().__init__()
@@ -185,6 +662,18 @@ class OpenAIAgent(ChatAgent):
                     }
                 }
             },
+            {
+                "type": "function",
+                "function": {
+                    "name": "get_artist_deep_cuts",
+                    "description": "Gets lesser-known songs from across an artist's full discography",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {"artist_name": {"type": "string"}},
+                        "required": ["artist_name"]
+                    }
+                }
+            },
             {
                 "type": "function",
                 "function": {
@@ -197,6 +686,30 @@ class OpenAIAgent(ChatAgent):
                     }
                 }
             },
+            {
+                "type": "function",
+                "function": {
+                    "name": "browse_mood_playlists",
+                    "description": "Finds curated playlists for a mood or genre (e.g. chill, workout, jazz)",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {"mood": {"type": "string"}},
+                        "required": ["mood"]
+                    }
+                }
+            },
+            {
+                "type": "function",
+                "function": {
+                    "name": "get_mood_playlist_songs",
+                    "description": "Lists songs from a playlist ID returned by browse_mood_playlists",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {"playlist_id": {"type": "string"}},
+                        "required": ["playlist_id"]
+                    }
+                }
+            },
             {
                 "type": "function",
                 "function": {
@@ -229,6 +742,14 @@ class OpenAIAgent(ChatAgent):
                     "parameters": {"type": "object", "properties": {}}
                 }
             },
+            {
+                "type": "function",
+                "function": {
+                    "name": "clear_cart",
+                    "description": "Removes every song from the cart",
+                    "parameters": {"type": "object", "properties": {}}
+                }
+            },
             {
                 "type": "function",
                 "function": {
@@ -243,51 +764,148 @@ class OpenAIAgent(ChatAgent):
                         "required": ["playlist_name"]
                     }
                 }
+            },
+            {
+                "type": "function",
+                "function": {
+                    "name": "add_cart_to_playlist",
+                    "description": "Adds the cart songs to an existing playlist in the user's library, found by name. Only missing songs are added.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "playlist_name": {"type": "string"},
+                            "mirror": {"type": "boolean", "description": "Also remove playlist songs that are not in the cart (needs the exact playlist name)"}
+                        },
+                        "required": ["playlist_name"]
+                    }
+                }
+            },
+            {
+                "type": "function",
+                "function": {
+                    "name": "import_playlist_to_cart",
+                    "description": "Imports an existing playlist into the cart in the background: 'liked songs', a playlist URL/ID, or a library playlist name.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {"playlist": {"type": "string"}},
+                        "required": ["playlist"]
+                    }
+                }
             }
         ]
 
-    def send_message(self, message: str):
+    def warm_up(self):
+        self.client.models.retrieve(self.model_name)
+
+    def record_exchange(self, message: str, reply: str):
+        super().record_exchange(message, reply)
+        self.messages.append({"role": "user", "content": message})
+        self.messages.append({"role": "assistant", "content": reply})
+
+    def export_history(self) -> list:
+        return self.messages
+
+    def import_history(self, history: list):
+        self.messages = history or [{"role": "system", "content": SYSTEM_INSTRUCTION}]
+
+    @staticmethod
+    def _assistant_message(msg) -> dict:
+        """Plain-dict copy of an assistant message so history stays serializable."""
+        out = {"role": "assistant", "content": msg.content}
+        if msg.tool_calls:
+            out["tool_calls"] = [
+                {
+                    "id": tc.id,
+                    "type": "function",
+                    "function": {"name": tc.function.name, "arguments": tc.function.arguments}
+                }
+                for tc in msg.tool_calls
+            ]
+        return out
+
+    def _complete(self, deadline: Deadline, cacheable: bool) -> dict:
+        """
+        Next assistant message (plain dict) for self.messages: from the
+        completion cache when `cacheable`, otherwise (or on a miss) from the API.
+        """
+        key = completion_key(self.model_name, self.messages, self.tools_schema) if cacheable and completions.enabled else None
+        if not cacheable:
+            completions.bypass()
+        cached = completions.get(key) if key else None
+        if cached:
+            reply = json.loads(json.dumps(cached))
+            # Tool call ids must stay unique within a conversation
+            for tool_call in reply.get("tool_calls") or []:
+                tool_call["id"] = f"call_{uuid.uuid4().hex[:24]}"
+            return reply
+
+        start = time.perf_counter()
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=self.messages,
+            tools=self.tools_schema,
+            timeout=deadline.timeout(LLM_TIMEOUT, "OpenAI call")
+        )
+        reply = self._assistant_message(response.choices[0].message)
+        if key:
+            completions.set(key, reply, time.perf_counter() - start)
+        return reply
+
+    def _send_to_llm(self, message: str):
         self.messages.append({"role": "user", "content": message})
+        deadline = current_deadline()
+        # Until a tool with a non-deterministic result has run this turn
+        cacheable = True
         
-        while True:
+        for _ in range(MAX_TOOL_ROUNDS):
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=self.messages,
-                    tools=self.tools_schema
-                )
-                msg = response.choices[0].message
+                reply = self._complete(deadline, cacheable)
                 
-                if msg.tool_calls:
-                    self.messages.append(msg)
-                    for tool_call in msg.tool_calls:
-                        fname = tool_call.function.name
-                        args = json.loads(tool_call.function.arguments)
+                if reply.get("tool_calls"):
+                    self.messages.append(reply)
+                    for tool_call in reply["tool_calls"]:
+                        fname = tool_call["function"]["name"]
+                        args = json.loads(tool_call["function"]["arguments"])
                         func = AVAILABLE_TOOLS.get(fname)
+                        cacheable = cacheable and fname in DETERMINISTIC_TOOLS
                         
                         log_msg = f"🛠️ Executing: {fname}({args})"
                         yield {"type": "log", "content": log_msg}
                         
+                        # Every tool call needs a reply, even when it isn't run
+                        result = f"Error: unknown tool {fname}"
                         if func:
                             try:
                                 result = func(**args)
                             except Exception as e:
                                 result = f"Error: {e}"
                             
-                            self.messages.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call.id,
-                                "content": str(result)
-                            })
+                        self.messages.append({
+                            "role": "tool",
+                            "tool_call_id": tool_call["id"],
+                            "content": str(result)
+                        })
                 else:
-                    self.messages.append(msg)
-                    yield {"type": "answer", "content": msg.content}
+                    self.messages.append(reply)
+                    yield {"type": "answer", "content": reply["content"]}
                     return
                     
             except Exception as e:
+                if deadline.expired():
+                    break
                 yield {"type": "answer", "content": f"Error: {e}"}
                 return
 
+        # Out of time or tool rounds: answer with what the tools found so far
+        if deadline.expired():
+            deadline.missed = True
+        else:
+            metrics.incr("agent.tool_rounds_exhausted")
+            logger.warning(f"Stopped after {MAX_TOOL_ROUNDS} tool rounds")
+        reply = self._partial_answer(deadline)
+        self.messages.append({"role": "assistant", "content": reply})
+        yield {"type": "answer", "content": reply}
+
 # --- FACTORY ---
 def get_agent():
     if LLM_PROVIDER == "OPENAI":
@@ -296,6 +914,19 @@ def get_agent():
         return GeminiAgent()
 
 # --- CLI ENTRY POINT ---
+def _save_cli_profile(profile_id: str):
+    """Writes a turn profile to PROFILE_DIR and prints the hottest functions."""
+    record = profiles.get(profile_id)
+    out_dir = os.getenv("PROFILE_DIR", "profiles")
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, record["filename"])
+    with open(path, "wb") as f:
+        f.write(record["data"])
+    print(f"\n   📊 Profile ({record['mode']}, {record['busy_seconds']}s) saved to {path}")
+    if record["mode"] == "cprofile":
+        import pstats
+        pstats.Stats(path).sort_stats("cumulative").print_stats(10)
+
 def main():
     # 1. Refresh Browser Auth from curl.txt
     try:
@@ -307,6 +938,8 @@ def main():
 
     try:
         agent = get_agent()
+        # Warm clients and caches while the user types their first message
+        threading.Thread(target=warm_up, args=(Readiness(), agent), name="warmup", daemon=True).start()
         print("\n🎧 Ultimate YT Music Agent is Ready!")
         print("----------------------------------------------------------")
         
@@ -317,11 +950,25 @@ def main():
 
             # Consuming the generator
             print("\n", end="")
-            for event in agent.send_message(user_input):
-                if event["type"] == "log":
-                    print(f"   {event['content']}")
-                elif event["type"] == "answer":
-                    print(f"\nAgent: {event['content']}")
+            turn_start = time.time()
+            events = agent.send_message(user_input)
+            if PROFILE_MODE:
+                events = profile_turn(events, PROFILE_MODE, label=user_input[:60])
+            with session_scope(agent=agent):
+                for event in events:
+                    if event["type"] == "log":
+                        print(f"   {event['content']}")
+                    elif event["type"] == "answer":
+                        print(f"\nAgent: {event['content']}")
+
+            if PROFILE_MODE:
+                _save_cli_profile(profiles.list()[0]["id"])
+
+            # The CLI has nothing else to do, so follow any checkout started this turn
+            for job in checkout_jobs.recent(since=turn_start, session_id=DEFAULT_SESSION):
+                for event in job.stream_events():
+                    prefix = "   " if event["type"] == "log" else "\nAgent: "
+                    print(f"{prefix}{event['content']}")
             
     except Exception as e:
         print(f"Critical Error: {e}")
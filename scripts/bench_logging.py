@@ -0,0 +1,130 @@
+"""
+Request-path cost of logging, before and after the queue pipeline (agent/logs.py).
+
+Simulated requests run on a thread pool; each waits on a fake upstream call
+and does the logging a typical tool call does (a progress line, a few per-item parse
+warnings, a finish line with fields). Output goes to a sink that takes
+--sink-latency-us per write, like a terminal or a pipe under backpressure.
+
+    python scripts/bench_logging.py --threads 16 --requests 4000
+"""
+import os
+import sys
+import time
+import math
+import random
+import logging
+import argparse
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.logs import build_pipeline, log_context, dropped_records
+
+class SlowSink:
+    """
+    File-like object where each write blocks for `latency` seconds (serialized
+    and releasing the GIL, like a write() syscall to a slow terminal or pipe).
+    """
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.lines = 0
+        self._lock = threading.Lock()
+
+    def write(self, text: str):
+        with self._lock:
+            time.sleep(self.latency)
+            self.lines += text.count("\n")
+
+    def flush(self):
+        pass
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def fake_request(logger, mode: str, i: int, work: float, warnings: int) -> float:
+    start = time.perf_counter()
+    with log_context(session="bench", turn=f"t{i}", tool="search_song"):
+        if mode == "print":
+            print(f"\n🤖 Agent: Searching for 'query {i}'...")
+        else:
+            logger.info(f"Searching for 'query {i}'...")
+        time.sleep(work)  # the upstream call the tool is waiting on
+        for j in range(warnings):
+            if mode == "print":
+                print(f"Error parsing a search result: item {j}")
+            else:
+                logger.warning(f"Error parsing a search result: item {j}")
+        if mode == "print":
+            print(f"   ✅ Found results for 'query {i}'")
+        else:
+            logger.info(f"Found results for 'query {i}'", extra={"duration_ms": round(work * 1000, 1)})
+    return time.perf_counter() - start
+
+def run(mode: str, args) -> dict:
+    sink = SlowSink(args.sink_latency_us / 1e6)
+    dropped_before = dropped_records()
+    logger = logging.getLogger(f"bench.{mode}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.disabled = mode == "none"
+    listener = None
+
+    if mode == "sync":
+        # What logging.basicConfig gives you: format + write on the caller's thread
+        handler = logging.StreamHandler(sink)
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        logger.addHandler(handler)
+    elif mode in ("queue", "queue-raw"):
+        # queue-raw: the queue alone, without rate limiting/sampling
+        burst, sample = (10**9, "") if mode == "queue-raw" else (5, args.sample)
+        handler, listener = build_pipeline(sink, sample=sample, burst=burst, queue_size=args.queue_size)
+        logger.addHandler(handler)
+        listener.start()
+
+    redirect = contextlib.redirect_stdout(sink) if mode == "print" else contextlib.nullcontext()
+    work = args.work_us / 1e6
+    with redirect, ThreadPoolExecutor(max_workers=args.threads) as pool:
+        start = time.perf_counter()
+        durations = list(pool.map(lambda i: fake_request(logger, mode, i, work, args.warnings),
+                                  range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    if listener:
+        listener.stop()
+    logger.handlers.clear()
+    dropped = dropped_records() - dropped_before
+    overhead = [max(0.0, d - work) * 1e6 for d in durations]
+    return {
+        "mode": mode,
+        "throughput": args.requests / elapsed,
+        "p50": percentile(overhead, 50),
+        "p99": percentile(overhead, 99),
+        "lines": sink.lines,
+        "dropped": dropped,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Logging overhead on the request path")
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent request threads")
+    parser.add_argument("--requests", type=int, default=4000, help="Simulated requests per mode")
+    parser.add_argument("--work-us", type=float, default=2000, help="Upstream wait per request")
+    parser.add_argument("--warnings", type=int, default=5, help="Repeated parse warnings per request")
+    parser.add_argument("--sink-latency-us", type=float, default=100, help="Cost of one write to the output")
+    parser.add_argument("--sample", default="", help='Sampling for the queue mode, e.g. "bench=0.1"')
+    parser.add_argument("--queue-size", type=int, default=10000)
+    args = parser.parse_args()
+    random.seed(0)
+
+    print(f"{args.threads} threads x {args.requests} requests, {args.work_us:g}µs upstream wait, "
+          f"{args.warnings} warnings/request, {args.sink_latency_us:g}µs per write\n")
+    print(f"{'mode':<10}{'req/s':>10}{'p50 overhead':>16}{'p99 overhead':>16}{'lines written':>16}{'dropped':>10}")
+    for mode in ("none", "print", "sync", "queue-raw", "queue"):
+        r = run(mode, args)
+        print(f"{r['mode']:<10}{r['throughput']:>10.0f}{r['p50']:>14.0f}µs{r['p99']:>14.0f}µs{r['lines']:>16}{r['dropped']:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Offline load test for server.py.
+
+Starts the FastAPI app in-process with a scripted (fake) LLM agent and a fake
+YTMusic client with configurable latency, then drives /api/chat and /api/cart
+with N concurrent simulated users running scripted conversations.
+
+    python scripts/load_test.py --users 20 --rounds 3 --yt-latency-ms 150 --llm-latency-ms 400
+
+Reports throughput, p50/p95/p99 turn latency, time-to-first-event and error
+rates. Nothing touches the network except localhost.
+
+With --cassette, the real YTMusic client answers from recorded payloads
+instead (tools/transport.py); record the cassette once with --record:
+
+    python scripts/load_test.py --users 1 --rounds 1 --cassette cassettes/load --record
+    python scripts/load_test.py --users 20 --cassette cassettes/load --replay-latency recorded
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import zlib
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import threading
+import contextlib
+
+# Run from the project root regardless of where we're invoked
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+os.chdir(ROOT)
+
+# Scripted conversations. "#N" commands exercise the local fast path.
+CONVERSATIONS = [
+    ["top songs by The Weeknd", "add #1", "songs like Blinding Lights", "add #2", "show my cart"],
+    ["chill playlists", "add Bohemian Rhapsody", "remove song 1", "what's in my cart?"],
+    ["deep cuts from Radiohead", "add #3", "songs like Karma Police", "add #1", "clear cart"],
+    ["add Levitating", "add Starboy", "show my cart", "remove song 2", "top songs by Dua Lipa"],
+]
+
+class FakeYTMusic:
+    """
+    Stand-in for ytmusicapi.YTMusic returning small, well-formed payloads after
+    a simulated network delay (latency +- jitter, seeded so runs are repeatable).
+    """
+    latency = 0.1
+    jitter = 0.05
+    error_rate = 0.0
+    _rng = random.Random(42)
+    _rng_lock = threading.Lock()
+
+    def __init__(self, auth=None, **kwargs):
+        self.auth = auth
+
+    def _wait(self):
+        with self._rng_lock:
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            fail = self._rng.random() < self.error_rate
+        time.sleep(delay)
+        if fail:
+            raise ConnectionError("Simulated upstream failure")
+
+    @staticmethod
+    def _song(seed: str, i: int) -> dict:
+        vid = f"{zlib.crc32(seed.encode()) % 10**8:08d}{i:03d}"
+        return {
+            "videoId": vid,
+            "title": f"{seed.title()} #{i}",
+            "artists": [{"name": f"Artist {seed[:8]}", "id": "UC" + vid}],
+            "album": {"name": f"Album {i % 3}", "id": "MPRE" + vid},
+            "duration": "3:30",
+            "length": "3:30",
+            "thumbnails": [{"url": f"https://lh3.googleusercontent.com/{vid}=w60-h60", "width": 60, "height": 60}],
+        }
+
+    def search(self, query, filter=None, limit=20, **kwargs):
+        self._wait()
+        if filter == "artists":
+            return [{"browseId": f"UC{zlib.crc32(query.encode()) % 10**6}", "artist": query.title()}]
+        return [self._song(query, i) for i in range(limit)]
+
+    def get_artist(self, channelId):
+        self._wait()
+        return {
+            "songs": {"results": [self._song(channelId, i) for i in range(10)]},
+            "albums": {"results": [{"browseId": f"{channelId}-A{i}", "title": f"Album {i}"} for i in range(4)]},
+            "singles": {"results": [{"browseId": f"{channelId}-S{i}", "title": f"Single {i}"} for i in range(3)]},
+            "related": {"results": [{"browseId": f"{channelId}-R{i}", "title": f"Related {i}"} for i in range(3)]},
+        }
+
+    def get_artist_albums(self, channelId, params, limit=100, **kwargs):
+        self._wait()
+        return []
+
+    def get_album(self, browseId):
+        self._wait()
+        return {"title": browseId, "tracks": [self._song(browseId, i) for i in range(8)]}
+
+    def get_watch_playlist(self, videoId=None, limit=25, **kwargs):
+        self._wait()
+        # Like the real endpoint, the requested video comes first
+        return {"tracks": [{**self._song(videoId, 0), "videoId": videoId}] +
+                          [self._song(videoId, i) for i in range(1, limit)]}
+
+    def get_song(self, videoId, **kwargs):
+        self._wait()
+        song = self._song(videoId, 0)
+        return {"videoDetails": {"videoId": videoId, "title": song["title"], "lengthSeconds": "210",
+                                 "thumbnail": {"thumbnails": song["thumbnails"]}}}
+
+    def get_search_suggestions(self, query, **kwargs):
+        self._wait()
+        return [f"{query} {i}" for i in range(3)]
+
+    def get_mood_categories(self):
+        self._wait()
+        return {"Moods & moments": [{"title": t, "params": t.lower()} for t in ("Chill", "Workout", "Focus", "Party")]}
+
+    def get_mood_playlists(self, params):
+        self._wait()
+        return [{"playlistId": f"PL{params}{i}", "title": f"{params.title()} Mix {i}"} for i in range(5)]
+
+    def get_playlist(self, playlistId, limit=100, **kwargs):
+        self._wait()
+        return {"id": playlistId, "trackCount": 20, "tracks": [self._song(playlistId, i) for i in range(20)]}
+
+    def get_library_playlists(self, limit=25):
+        self._wait()
+        return [{"playlistId": "PLgym", "title": "Gym", "count": "20"}]
+
+    def create_playlist(self, title, description="", privacy_status="PRIVATE", video_ids=None, **kwargs):
+        self._wait()
+        return f"PL{zlib.crc32(title.encode()) % 10**8}"
+
+    def add_playlist_items(self, playlistId, videoIds=None, **kwargs):
+        self._wait()
+        return {"status": "STATUS_SUCCEEDED"}
+
+def build_scripted_agent(llm_latency: float):
+    """
+    A ChatAgent whose "LLM" maps messages to tool calls with regexes, sleeping
+    llm_latency per completion (one to pick the tool, one to answer) like a
+    real tool-calling round trip.
+    """
+    import main
+
+    rules = [
+        (re.compile(r"^top songs by (.+)$", re.I), "get_artist_songs", "artist_name"),
+        (re.compile(r"^deep cuts from (.+)$", re.I), "get_artist_deep_cuts", "artist_name"),
+        (re.compile(r"^songs like (.+)$", re.I), "get_song_recommendations", "seed_song"),
+        (re.compile(r"^(.+) playlists$", re.I), "browse_mood_playlists", "mood"),
+        (re.compile(r"^add (.+)$", re.I), "add_song_to_cart", "song_query"),
+        (re.compile(r"^remove (.+)$", re.I), "remove_song_from_cart", "song_name_or_id"),
+    ]
+
+    class ScriptedAgent(main.ChatAgent):
+        def _send_to_llm(self, message: str):
+            time.sleep(llm_latency)
+            for pattern, tool, arg in rules:
+                m = pattern.match(message.strip())
+                if m:
+                    args = {arg: m.group(1)}
+                    yield {"type": "log", "content": f"🛠️ Executing: {tool}({args})"}
+                    result = main.AVAILABLE_TOOLS[tool](**args)
+                    time.sleep(llm_latency)
+                    reply = f"Done. {str(result)[:200]}"
+                    break
+            else:
+                reply = "I can help you find music!"
+            self.history.append({"user": message, "reply": reply})
+            yield {"type": "answer", "content": reply}
+
+    return ScriptedAgent()
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(agent, port: int):
+    import uvicorn
+    import server
+
+    server.agent = agent
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning")
+    srv = uvicorn.Server(config)
+    thread = threading.Thread(target=srv.run, daemon=True)
+    thread.start()
+    while not srv.started:
+        time.sleep(0.05)
+    return srv, thread
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Nearest-rank percentile
+    k = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+async def run_user(client, user_id: int, rounds: int, results: dict):
+    script = CONVERSATIONS[user_id % len(CONVERSATIONS)]
+    headers = {"X-Session-Id": f"load-user-{user_id}"}
+    for _ in range(rounds):
+        for message in script:
+            start = time.perf_counter()
+            first = None
+            error = False
+            try:
+                async with client.stream("POST", "/api/chat", json={"message": message}, headers=headers) as res:
+                    if res.status_code != 200:
+                        error = True
+                    async for line in res.aiter_lines():
+                        if not line.strip():
+                            continue
+                        if first is None:
+                            first = time.perf_counter() - start
+                        if json.loads(line).get("type") == "error":
+                            error = True
+            except Exception:
+                error = True
+            results["turns"].append(time.perf_counter() - start)
+            results["ttfe"].append(first if first is not None else time.perf_counter() - start)
+            results["turn_errors"] += error
+
+            start = time.perf_counter()
+            try:
+                res = await client.get("/api/cart", headers=headers)
+                results["cart_errors"] += res.status_code != 200
+            except Exception:
+                results["cart_errors"] += 1
+            results["cart"].append(time.perf_counter() - start)
+
+async def drive(port: int, users: int, rounds: int) -> dict:
+    import httpx
+
+    results = {"turns": [], "ttfe": [], "cart": [], "turn_errors": 0, "cart_errors": 0}
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+        # Like a load balancer, only send traffic once the server reports ready
+        for _ in range(600):
+            if (await client.get("/readyz")).status_code == 200:
+                break
+            await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        await asyncio.gather(*(run_user(client, i, rounds, results) for i in range(users)))
+        results["elapsed"] = time.perf_counter() - start
+    return results
+
+def summarize(results: dict, args) -> dict:
+    turns, cart = results["turns"], results["cart"]
+    ms = lambda v: round(v * 1000, 1)
+    return {
+        "users": args.users,
+        "turns": len(turns),
+        "elapsed_s": round(results["elapsed"], 2),
+        "throughput_turns_per_s": round(len(turns) / results["elapsed"], 2) if results["elapsed"] else 0,
+        "turn_latency_ms": {p: ms(percentile(turns, int(p[1:]))) for p in ("p50", "p95", "p99")},
+        "time_to_first_event_ms": {p: ms(percentile(results["ttfe"], int(p[1:]))) for p in ("p50", "p95", "p99")},
+        "cart_latency_ms": {p: ms(percentile(cart, int(p[1:]))) for p in ("p50", "p95", "p99")},
+        "turn_error_rate": round(results["turn_errors"] / len(turns), 4) if turns else 0,
+        "cart_error_rate": round(results["cart_errors"] / len(cart), 4) if cart else 0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline concurrent-user load test for server.py")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated users")
+    parser.add_argument("--rounds", type=int, default=2, help="Times each user repeats their conversation")
+    parser.add_argument("--yt-latency-ms", type=float, default=100, help="Mean fake YTMusic latency")
+    parser.add_argument("--yt-jitter-ms", type=float, default=50, help="+- jitter on fake YTMusic latency")
+    parser.add_argument("--yt-error-rate", type=float, default=0.0, help="Fraction of fake YTMusic calls that fail")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="Fake LLM latency per completion")
+    parser.add_argument("--cassette", help="Use the real client on recorded payloads from this cassette")
+    parser.add_argument("--record", action="store_true", help="Record --cassette from the live service")
+    parser.add_argument("--replay-latency", default="0", help='Replay delay per request: ms or "recorded"')
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    FakeYTMusic.latency = args.yt_latency_ms / 1000
+    FakeYTMusic.jitter = args.yt_jitter_ms / 1000
+    FakeYTMusic.error_rate = args.yt_error_rate
+
+    # Keep the server's per-call logging/prints out of the report
+    logging.disable(logging.CRITICAL)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        os.environ["STATE_STORE"] = os.environ.get("LOAD_TEST_STATE_STORE", "memory")
+        from tools.client import set_client_factory, set_transport
+        if args.cassette:
+            transport = set_transport("record" if args.record else "replay", args.cassette, args.replay_latency)
+        else:
+            set_client_factory(FakeYTMusic)
+
+        agent = build_scripted_agent(args.llm_latency_ms / 1000)
+        port = free_port()
+        srv, thread = start_server(agent, port)
+        try:
+            results = asyncio.run(drive(port, args.users, args.rounds))
+        finally:
+            srv.should_exit = True
+            thread.join(timeout=10)
+            if args.cassette:
+                set_transport("passthrough")  # flushes a recording
+
+    report = summarize(results, args)
+    if args.cassette and not args.record:
+        report["cassette"] = {"hits": transport.hits, "misses": transport.misses}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"👥 {report['users']} users, {report['turns']} turns in {report['elapsed_s']}s "
+          f"-> {report['throughput_turns_per_s']} turns/s")
+    for label, key in (("Turn latency", "turn_latency_ms"), ("First event", "time_to_first_event_ms"),
+                       ("GET /api/cart", "cart_latency_ms")):
+        p = report[key]
+        print(f"   {label:<14} p50 {p['p50']:>8}ms   p95 {p['p95']:>8}ms   p99 {p['p99']:>8}ms")
+    print(f"   Errors: chat {report['turn_error_rate']:.2%}, cart {report['cart_error_rate']:.2%}")
+    if "cassette" in report:
+        print(f"   Cassette: {report['cassette']['hits']} replayed, {report['cassette']['misses']} not recorded")
+
+if __name__ == "__main__":
+    main()
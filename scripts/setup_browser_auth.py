@@ -1,15 +1,19 @@
 from ytmusicapi import YTMusic
 import json
 import re
+import logging
+
+# Called on every authenticated request path, so it logs instead of printing
+logger = logging.getLogger(__name__)
 
 def parse_curl_and_save(curl_file_path='curl.txt', output_path='browser.json'):
-    print(f"Reading {curl_file_path}...")
+    logger.info(f"Reading {curl_file_path}...")
     
     try:
         with open(curl_file_path, 'r', encoding='utf-8') as f:
             curl_content = f.read()
     except FileNotFoundError:
-        print(f"Error: {curl_file_path} not found.")
+        logger.error(f"{curl_file_path} not found.")
         return
 
     headers = {}
@@ -31,7 +35,7 @@ def parse_curl_and_save(curl_file_path='curl.txt', output_path='browser.json'):
     cookie_matches = re.findall(r"(?:-b|--cookie)\s+['\"]([^'\"]+)['\"]", curl_content)
     if cookie_matches and 'cookie' not in headers:
         headers['cookie'] = cookie_matches[0]
-        print("Found cookie via -b/--cookie flag.")
+        logger.info("Found cookie via -b/--cookie flag.")
         
     # 3. Clean up compression headers that might break python requests
     # (ytmusicapi usually handles this via requests, but good to be safe)
@@ -43,17 +47,18 @@ def parse_curl_and_save(curl_file_path='curl.txt', output_path='browser.json'):
     
     # Check for critical headers
     if 'cookie' not in headers:
-        print("❌ Error: 'cookie' header not found. Please ensure you copied the full curl command including cookies.")
+        logger.error("❌ 'cookie' header not found. Please ensure you copied the full curl command including cookies.")
         return
     if 'authorization' not in headers:
-        print("⚠️ Warning: 'authorization' header (SAPISIDHASH) not found. Some actions might fail.")
+        logger.warning("⚠️ 'authorization' header (SAPISIDHASH) not found. Some actions might fail.")
 
-    print(f"Found {len(headers)} headers.")
+    logger.info(f"Found {len(headers)} headers.")
     
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(headers, f, indent=4)
         
-    print(f"✅ Success! Saved to {output_path}")
+    logger.info(f"✅ Success! Saved to {output_path}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     parse_curl_and_save()
@@ -1,24 +1,65 @@
 import os
+import hmac
+import time
+import threading
 import logging
 from typing import Optional
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Header
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, Response, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 # Import the Agent from main.py
 # (We need to make sure main.py is importable without running main())
-from main import get_agent, session
+from main import get_agent, session_scope, checkout_jobs, DEFAULT_SESSION
+from agent.metrics import metrics
+from agent.logs import dropped_records
+from agent.profiling import PROFILE_MODE, resolve_mode, profile_turn, profiles
+from agent.warmup import Readiness, warm_up
+from agent.enrichment import Enricher
+from tools.mood_tool import mood_index
+from tools.hedging import hedger
+from tools.prefetch import prefetcher
+from agent.llm_cache import completions
 from scripts.setup_browser_auth import parse_curl_and_save
 
 # Load env
 load_dotenv()
-logging.basicConfig(level=logging.INFO)
+# (logging is configured by main.py's setup_logging on import)
 logger = logging.getLogger("server")
 
-app = FastAPI()
+# The configured agent; each session chats with its own copy (agent.for_session).
+# It is created by the warm-up below (unless already set, e.g. by scripts/load_test.py).
+agent = None
+readiness = Readiness()
+
+def _apply_metadata(session_id: str, metadata: dict) -> int:
+    with session_scope(session_id) as session:
+        return session.apply_metadata(metadata)
+
+# Thumbnails/durations for cart songs, fetched in background batches (see agent/enrichment.py)
+enricher = Enricher(apply=_apply_metadata)
+
+def _warm_up():
+    global agent
+    agent = readiness.run("agent", lambda: agent or get_agent(), required=True)
+    if agent:
+        logger.info("Agent initialized successfully.")
+    warm_up(readiness, agent)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background: /healthz answers right away, /readyz once warm
+    threading.Thread(target=_warm_up, name="warmup", daemon=True).start()
+    yield
+    mood_index.stop()
+    enricher.stop()
+    prefetcher.cancel()
+
+app = FastAPI(lifespan=lifespan)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -32,16 +73,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Agent once
-# NOTE: In a real multi-user app, we'd need a manager to create agents per session.
-# For this single-user local tool, a global agent instance is acceptable.
-try:
-    agent = get_agent()
-    logger.info("Agent initialized successfully.")
-except Exception as e:
-    logger.error(f"Failed to init agent: {e}")
-    agent = None
-
 # --- DATA MODELS ---
 class ChatRequest(BaseModel):
     message: str
@@ -59,24 +90,60 @@ class ChatResponse(BaseModel):
 async def get_index():
     return FileResponse("static/index.html")
 
+def _agent_unavailable():
+    if readiness.finished_at is None:
+        raise HTTPException(status_code=503, detail="Server is warming up, try again shortly.")
+    error = readiness.steps.get("agent", {}).get("error")
+    raise HTTPException(status_code=500, detail=f"Agent not initialized: {error}")
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok", "uptime_seconds": round(time.time() - readiness.started_at, 1)}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once warm-up has finished and the agent is available, 503 until then."""
+    report = readiness.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
 import json
 from fastapi.responses import StreamingResponse
 
 @app.post("/api/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, x_session_id: Optional[str] = Header(default=None),
+               x_profile: Optional[str] = Header(default=None)):
     if not agent:
-        raise HTTPException(status_code=500, detail="Agent not initialized. Check server logs.")
+        _agent_unavailable()
+    # Opt-in per request ("X-Profile: 1" / "sample") or for every turn via PROFILE_TURNS
+    profile_mode = resolve_mode(x_profile) if x_profile else PROFILE_MODE
+    session_id = x_session_id or DEFAULT_SESSION
+    session_agent = agent.for_session(session_id)
     
     def event_stream():
+        turn_start = time.time()
         try:
-            # Iterate over the agent's generator
-            for event in agent.send_message(request.message):
-                # event is {"type": "log"|"answer", "content": ...}
-                # We yield it as NDJSON
-                yield json.dumps(event) + "\n"
+            # Cart + history come from the shared state store for the whole turn
+            with session_scope(session_id, agent=session_agent) as session:
+                events = session_agent.send_message(request.message)
+                if profile_mode:
+                    events = profile_turn(events, profile_mode, label=request.message[:60])
+                # Iterate over the agent's generator
+                for event in events:
+                    # event is {"type": "log"|"answer", "content": ...}
+                    # We yield it as NDJSON
+                    yield json.dumps(event) + "\n"
+            # (after the scope: saving may have merged in changes made meanwhile)
+            cart = list(session.get_cart())
             
+            # Announce background jobs (e.g. checkout) started this turn;
+            # the client follows them via /api/jobs/{id}/events
+            for job in checkout_jobs.recent(since=turn_start, session_id=session_id):
+                yield json.dumps({"type": "job", "content": job.to_dict()}) + "\n"
+
             # After the loop finishes, we can send the updated cart as a separate event
-            yield json.dumps({"type": "cart", "content": session.get_cart()}) + "\n"
+            yield json.dumps({"type": "cart", "content": cart}) + "\n"
+            yield from _enrichment_events(session_id, cart)
             
         except Exception as e:
             logger.error(f"Stream Error: {e}")
@@ -84,10 +151,132 @@ async def chat(request: ChatRequest):
 
     return StreamingResponse(event_stream(), media_type="application/x-ndjson")
 
+# Plain `def` so the (blocking) state-store read runs in the threadpool
 @app.get("/api/cart")
-async def get_cart():
-    print("GETTING CART")
-    return {"cart": session.get_cart()}
+def get_cart(x_session_id: Optional[str] = Header(default=None)):
+    session_id = x_session_id or DEFAULT_SESSION
+    with session_scope(session_id) as session:
+        cart = list(session.get_cart())
+    # `enriching` > 0: follow /api/cart/events for thumbnails as they arrive
+    return {"cart": cart, "enriching": enricher.schedule(session_id, cart)}
+
+def _enrichment_events(session_id: str, cart: list):
+    """Queues metadata for the cart's bare songs; tells the client to follow /api/cart/events."""
+    pending = enricher.schedule(session_id, cart)
+    if pending:
+        yield json.dumps({"type": "enrichment", "content": {"pending": pending}}) + "\n"
+
+@app.get("/api/cart/events")
+def stream_cart_events(x_session_id: Optional[str] = Header(default=None)):
+    """
+    NDJSON stream of cart updates ({"type": "cart"}) as background metadata
+    batches land, ending once nothing is pending for this session.
+    """
+    session_id = x_session_id or DEFAULT_SESSION
+
+    def event_stream():
+        version, pending = enricher.wait(session_id, timeout=0)
+        give_up = time.monotonic() + 60
+        while pending and time.monotonic() < give_up:
+            new_version, pending = enricher.wait(session_id, version)
+            if new_version == version:
+                continue
+            version = new_version
+            with session_scope(session_id) as session:
+                cart = list(session.get_cart())
+            yield json.dumps({"type": "cart", "content": cart}) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+def _session_job(job_id: str, x_session_id: Optional[str]):
+    """The job, if it belongs to the caller's session (jobs of other sessions are 404s)."""
+    job = checkout_jobs.get(job_id)
+    if not job or job.session_id != (x_session_id or DEFAULT_SESSION):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, x_session_id: Optional[str] = Header(default=None)):
+    return _session_job(job_id, x_session_id).to_dict()
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, x_session_id: Optional[str] = Header(default=None)):
+    """
+    NDJSON stream of a job's progress ({"type": "log"|"answer"|"error"}),
+    ending with the final job status and the updated cart.
+    """
+    job = _session_job(job_id, x_session_id)
+
+    def event_stream():
+        for event in checkout_jobs.stream(job_id):
+            yield json.dumps(event) + "\n"
+        final = checkout_jobs.get(job_id) or job
+        yield json.dumps({"type": "job", "content": final.to_dict()}) + "\n"
+        with session_scope(job.session_id) as session:
+            cart = list(session.get_cart())
+        yield json.dumps({"type": "cart", "content": cart}) + "\n"
+        yield from _enrichment_events(job.session_id, cart)
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, x_session_id: Optional[str] = Header(default=None)):
+    job = _session_job(job_id, x_session_id)
+    if not checkout_jobs.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return job.to_dict()
+
+@app.get("/api/stats")
+async def get_stats():
+    """
+    Runtime counters/timers (fast-path router hit rate, LLM turn latency, ...).
+    """
+    stats = metrics.snapshot()
+    if agent:
+        stats["router"] = agent.router.stats()
+    if hedger.enabled:
+        stats["hedging"] = hedger.stats()
+    if completions.enabled:
+        stats["llm_cache"] = completions.stats()
+    if prefetcher.enabled:
+        stats["prefetch"] = prefetcher.stats()
+    stats["enrichment"] = enricher.stats()
+    stats["logging"] = {"dropped_records": dropped_records()}
+    return stats
+
+# --- ADMIN ---
+
+def _check_admin(token: Optional[str]):
+    # Profiles carry user messages in their labels, so the admin routes stay
+    # off unless a token is configured.
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token, expected):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/admin/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(default=None)):
+    """Most recent turn profiles (newest first), without the profile data."""
+    _check_admin(x_admin_token)
+    return {"profiles": profiles.list()}
+
+@app.get("/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Downloads one profile: .prof (pstats, e.g. `snakeviz turn.prof`) or
+    .folded (collapsed stacks, e.g. speedscope / flamegraph.pl).
+    """
+    _check_admin(x_admin_token)
+    record = profiles.get(profile_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Profile not found (it may have rotated out)")
+    media_type = "application/octet-stream" if record["mode"] == "cprofile" else "text/plain"
+    return Response(
+        content=record["data"],
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{record["filename"]}"'}
+    )
 
 @app.post("/api/auth")
 async def update_auth(request: AuthRequest):
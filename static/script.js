@@ -83,7 +83,6 @@ function addMessage(text, sender) {
 
 async function sendMessageToAgent(message) {
     const thinkingId = showTypingIndicator();
-    let lastLogId = null; // Track the current log bubble to remove it later
 
     try {
         const res = await fetch('/api/chat', {
@@ -92,58 +91,100 @@ async function sendMessageToAgent(message) {
             body: JSON.stringify({ message: message })
         });
 
-        const reader = res.body.getReader();
-        const decoder = new TextDecoder();
-        let buffer = '';
-
         // Remove initial thinking bubble once stream starts
         removeElement(thinkingId);
 
-        while (true) {
-            const { done, value } = await reader.read();
-            if (done) break;
+        await readEventStream(res);
 
-            buffer += decoder.decode(value, { stream: true });
-            const lines = buffer.split('\n');
-            buffer = lines.pop(); // Keep incomplete line
+    } catch (error) {
+        console.error(error);
+        removeElement(thinkingId);
+        addMessage("Error: Failed to reach the server. Is it running?", 'agent');
+    }
+}
 
-            for (const line of lines) {
-                if (!line.trim()) continue;
+// Reads an NDJSON event stream (chat turn or background job) and renders each event
+async function readEventStream(res) {
+    let lastLogId = null; // Track the current log bubble to remove it later
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
 
-                try {
-                    const event = JSON.parse(line);
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
 
-                    // If we had a previous log bubble, remove it now because we moved to next step
-                    if (lastLogId) {
-                        removeElement(lastLogId);
-                        lastLogId = null;
-                    }
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop(); // Keep incomplete line
 
-                    if (event.type === 'log') {
-                        // Create new log bubble
-                        lastLogId = 'log-' + Date.now();
-                        addLogMessage(event.content, lastLogId);
-                    }
-                    else if (event.type === 'answer') {
-                        addMessage(event.content, 'agent');
-                    }
-                    else if (event.type === 'cart') {
-                        updateCartUI(event.content);
-                    }
-                    else if (event.type === 'error') {
-                        addMessage(`Error: ${event.content}`, 'agent');
-                    }
+        for (const line of lines) {
+            if (!line.trim()) continue;
+
+            try {
+                const event = JSON.parse(line);
+
+                // If we had a previous log bubble, remove it now because we moved to next step
+                if (lastLogId) {
+                    removeElement(lastLogId);
+                    lastLogId = null;
+                }
 
-                } catch (e) {
-                    console.error("JSON Parse Error", e);
+                if (event.type === 'log') {
+                    // Create new log bubble
+                    lastLogId = 'log-' + Date.now();
+                    addLogMessage(event.content, lastLogId);
+                }
+                else if (event.type === 'answer') {
+                    addMessage(event.content, 'agent');
+                }
+                else if (event.type === 'cart') {
+                    updateCartUI(event.content);
+                }
+                else if (event.type === 'enrichment') {
+                    // Thumbnails/durations are being fetched in the background
+                    followCartUpdates();
+                }
+                else if (event.type === 'job') {
+                    // Background job (e.g. checkout) - follow it without blocking the chat
+                    if (event.content.status === 'queued' || event.content.status === 'running') {
+                        followJob(event.content.id);
+                    }
+                }
+                else if (event.type === 'error') {
+                    addMessage(`Error: ${event.content}`, 'agent');
                 }
+
+            } catch (e) {
+                console.error("JSON Parse Error", e);
             }
         }
+    }
 
-    } catch (error) {
-        console.error(error);
-        removeElement(thinkingId);
-        addMessage("Error: Failed to reach the server. Is it running?", 'agent');
+    if (lastLogId) removeElement(lastLogId);
+}
+
+async function followJob(jobId) {
+    try {
+        const res = await fetch(`/api/jobs/${jobId}/events`);
+        if (res.ok) await readEventStream(res);
+    } catch (err) {
+        console.error("Failed to follow job", err);
+    }
+}
+
+let followingCart = false;
+
+async function followCartUpdates() {
+    if (followingCart) return; // one stream covers every pending song
+    followingCart = true;
+    try {
+        const res = await fetch('/api/cart/events');
+        if (res.ok) await readEventStream(res);
+    } catch (err) {
+        console.error("Failed to follow cart updates", err);
+    } finally {
+        followingCart = false;
     }
 }
 
@@ -191,6 +232,7 @@ async function fetchCart() {
         if (data.cart) {
             updateCartUI(data.cart);
         }
+        if (data.enriching) followCartUpdates();
     } catch (err) {
         console.error("Failed to fetch cart", err);
     }
@@ -209,18 +251,28 @@ function updateCartUI(cart) {
         const div = document.createElement('div');
         div.classList.add('cart-item');
 
+        // thumbnails are normalized server-side: [60px, 120px] squares
         let thumb = "https://via.placeholder.com/40";
+        let srcset = "";
         if (item.thumbnails && item.thumbnails.length > 0) {
             thumb = item.thumbnails[0].url;
+            if (item.thumbnails.length > 1) srcset = `srcset="${item.thumbnails[1].url} 2x"`;
         }
+        const duration = item.duration_seconds != null ? ` · ${formatDuration(item.duration_seconds)}` : '';
 
         div.innerHTML = `
-            <img src="${thumb}" alt="Art">
+            <img src="${thumb}" ${srcset} alt="Art" loading="lazy">
             <div class="cart-item-info">
                 <div class="cart-item-title" title="${item.title}">${item.title}</div>
-                <div class="cart-item-artist">${item.artist || 'Unknown'}</div>
+                <div class="cart-item-artist">${item.artist || 'Unknown'}${duration}</div>
             </div>
         `;
         cartList.appendChild(div);
     });
 }
+
+function formatDuration(seconds) {
+    const m = Math.floor(seconds / 60);
+    const s = String(seconds % 60).padStart(2, '0');
+    return m >= 60 ? `${Math.floor(m / 60)}:${String(m % 60).padStart(2, '0')}:${s}` : `${m}:${s}`;
+}
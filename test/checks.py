@@ -0,0 +1,21 @@
+def report(checks: list, what: str, success: str) -> int:
+    """
+    Prints each check of an offline test script and a summary line.
+
+    Args:
+        checks: (description, passed) pairs.
+        what: What was checked, for the failure summary (e.g. "hedging").
+        success: Summary printed when every check passed.
+
+    Returns:
+        The number of failed checks.
+    """
+    failed = 0
+    for name, ok in checks:
+        print(f"  {'✅' if ok else '❌'} {name}")
+        failed += not ok
+    if failed:
+        print(f"❌ {failed} {what} check(s) failed.")
+    else:
+        print(f"✅ {success}")
+    return failed
@@ -4,10 +4,28 @@ import os
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from tools.artist_tool import get_artist_top_songs
+from tools.artist_tool import get_artist_top_songs, get_artist_discography, _track_key
+from tools.client import set_client_factory
+from scripts.load_test import FakeYTMusic
 
 def main():
     print("Testing tools/artist_tool.py...")
+
+    # Offline: title keys keep non-Latin/accented titles apart, and crawls stop at their limit
+    keys = [_track_key(t) for t in ("夜に駆ける", "群青", "Café (Live)", "Café")]
+    if keys[0] and keys[0] != keys[1] and keys[2] == keys[3] == "café":
+        print(f"✅ Title keys: {keys}")
+    else:
+        print(f"❌ Bad title keys: {keys}")
+    FakeYTMusic.latency, FakeYTMusic.jitter = 0.0, 0.0
+    set_client_factory(FakeYTMusic)
+    capped = get_artist_discography("Offline Artist", limit=20)
+    full = get_artist_discography("Offline Artist", limit=1000)
+    set_client_factory(None)
+    if len(capped) == 20 and len(full) == 56:
+        print(f"✅ Crawl capped at 20 songs (uncapped: {len(full)}).")
+    else:
+        print(f"❌ Crawl sizes {len(capped)} / {len(full)} (expected 20 / 56).")
     
     artist = "The Weeknd"
     print(f"Fetching top songs for: '{artist}'")
@@ -40,5 +58,13 @@ def main():
     else:
          print("\n✅ Data structure valid.")
 
+    # Discography mode: every album + single, deduplicated
+    print(f"\nCrawling full discography for: '{artist}'")
+    catalog = get_artist_discography(artist)
+    albums = {s['album'] for s in catalog}
+    print(f"✅ {len(catalog)} unique songs across {len(albums)} releases.")
+    if len({s['videoId'] for s in catalog}) != len(catalog):
+        print("❌ Duplicate songs in discography.")
+
 if __name__ == "__main__":
     main()
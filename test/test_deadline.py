@@ -0,0 +1,128 @@
+import sys
+import os
+import time
+import json
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("OPENAI_KEY", "offline-test")
+os.environ.setdefault("GEMINI_API_KEY", "offline-test")
+os.environ.setdefault("STATE_STORE", "memory")
+
+from checks import report
+from tools.deadline import Deadline, DeadlineExceeded, current_deadline, request_timeout
+
+class StubCompletions:
+    """Chat completions API that keeps asking for the same tool call; 150ms per call."""
+    def __init__(self, tool: str, args: dict):
+        self.tool, self.args = tool, args
+        self.calls = 0
+
+    def create(self, model, messages, tools, timeout=None):
+        self.calls += 1
+        time.sleep(min(0.15, timeout))
+        if timeout < 0.15:
+            raise TimeoutError("Request timed out.")
+        call = SimpleNamespace(id=f"call_{self.calls}", function=SimpleNamespace(
+            name=self.tool, arguments=json.dumps(self.args)))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=None, tool_calls=[call]))])
+
+class StubGemini:
+    """
+    generate_content that asks for `rounds` tool calls and then answers; 150ms
+    per call, failing like an HTTP timeout when given less than that.
+    """
+    def __init__(self, tool: str, args: dict, rounds: int):
+        self.tool, self.args, self.rounds = tool, args, rounds
+        self.timeouts = []
+
+    def generate_content(self, model, contents, config=None):
+        from google.genai import types
+        timeout = config.http_options.timeout / 1000
+        self.timeouts.append((timeout, current_deadline().remaining()))
+        time.sleep(min(0.15, timeout))
+        if timeout < 0.15:
+            raise TimeoutError("Request timed out.")
+        if len(self.timeouts) <= self.rounds:
+            part = types.Part(function_call=types.FunctionCall(name=self.tool, args=self.args))
+        else:
+            part = types.Part(text="Here are some chill playlists.")
+        return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))])
+
+def run_turn(agent, message: str, seconds: float):
+    import main
+    deadline = Deadline(seconds)
+    # One session per provider: their stored histories have different formats
+    with main.session_scope(f"deadline-test-{type(agent).__name__}", agent=agent) as session:
+        with session.active(), deadline.active():
+            events = list(agent._send_to_llm(message))
+    return events[-1]["content"], deadline
+
+def main():
+    print("Testing tools/deadline.py (offline)...")
+    checks = []
+
+    deadline = Deadline(0.2)
+    with deadline.active():
+        checks.append(("timeouts capped by the time left", request_timeout(30) <= 0.2))
+    checks.append(("no deadline outside a turn", current_deadline() is None and request_timeout(30) == 30))
+    time.sleep(0.25)
+    try:
+        deadline.check("lookup")
+        raised = False
+    except DeadlineExceeded:
+        raised = True
+    checks.append(("check raises once expired", raised and deadline.missed))
+
+    # Tools are skipped once the deadline has passed, and their output kept before that
+    import main
+    def browse_mood_playlists(mood: str) -> str:
+        """Stub for the mood browse tool."""
+        return f"Playlists for {mood}: Chill Mix (ID: PL1)"
+    main.AVAILABLE_TOOLS = {"browse_mood_playlists": main._instrument_tool(browse_mood_playlists)}
+    tool = main.AVAILABLE_TOOLS["browse_mood_playlists"]
+    deadline, expired = Deadline(0.2), Deadline(0)
+    with main.session_scope("deadline-test") as session, session.active():
+        with deadline.active():
+            tool(mood="chill")
+        with expired.active():
+            skipped = tool(mood="chill")
+    checks.append(("tool output kept for a partial answer", deadline.results == [("browse_mood_playlists", "Playlists for chill: Chill Mix (ID: PL1)")]))
+    checks.append(("tool skipped after the deadline", skipped.startswith("Error: out of time") and expired.missed and not expired.results))
+
+    # OpenAI: a model that keeps calling tools is cut off with what they found
+    agent = main.OpenAIAgent()
+    agent.client = SimpleNamespace(chat=SimpleNamespace(completions=StubCompletions("browse_mood_playlists", {"mood": "chill"})))
+    start = time.perf_counter()
+    reply, deadline = run_turn(agent, "chill playlists", 0.5)
+    elapsed = time.perf_counter() - start
+    print(f"  OpenAI turn with a 0.5s deadline: {elapsed * 1000:.0f}ms")
+    checks.append(("OpenAI partial answer within the deadline", elapsed < 0.6 and deadline.missed
+                   and reply.startswith("⏱️") and "Chill Mix" in reply))
+
+    # Gemini: every model request in the tool loop gets the time left, not a fixed timeout
+    main.LLM_PROVIDER = "GEMINI"
+    agent = main.GeminiAgent()
+    agent.client.models.generate_content = StubGemini("browse_mood_playlists", {"mood": "chill"}, rounds=10).generate_content
+    stub = agent.client.models.generate_content.__self__
+    start = time.perf_counter()
+    reply, deadline = run_turn(agent, "chill playlists", 0.5)
+    elapsed = time.perf_counter() - start
+    print(f"  Gemini turn with a 0.5s deadline: {elapsed * 1000:.0f}ms over {len(stub.timeouts)} model calls")
+    checks.append(("Gemini request timeouts follow the deadline", all(t <= left + 0.01 for t, left in stub.timeouts)))
+    checks.append(("Gemini partial answer within the deadline", elapsed < 0.6 and deadline.missed
+                   and reply.startswith("⏱️") and "Chill Mix" in reply))
+    checks.append(("Gemini history rolled back to the question and reply", len(agent.export_history()) == 2))
+
+    agent.import_history([])
+    agent.client.models.generate_content = StubGemini("browse_mood_playlists", {"mood": "chill"}, rounds=1).generate_content
+    reply, deadline = run_turn(agent, "chill playlists", 5)
+    roles = [c["role"] for c in agent.export_history()]
+    checks.append(("Gemini tool loop answers in time", reply == "Here are some chill playlists." and not deadline.missed
+                   and roles == ["user", "model", "user", "model"]))
+
+    report(checks, "deadline", "Turn deadlines work.")
+
+if __name__ == "__main__":
+    main()
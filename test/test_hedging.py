@@ -0,0 +1,63 @@
+import sys
+import os
+import time
+import random
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from checks import report
+from tools.hedging import Hedger
+
+def main():
+    print("Testing tools/hedging.py (offline)...")
+
+    # Simulated upstream: usually ~20ms, but 1 in 20 calls stalls for 500ms
+    rng = random.Random(7)
+    def lookup():
+        time.sleep(0.5 if rng.random() < 0.05 else 0.02)
+        return "ok"
+
+    plain = []
+    for _ in range(100):
+        start = time.perf_counter()
+        lookup()
+        plain.append(time.perf_counter() - start)
+
+    hedger = Hedger(enabled=True, percentile=90, budget=0.2)
+    for _ in range(20):
+        hedger.call("lookup", lookup)  # warm up the latency window
+
+    hedged = []
+    for _ in range(100):
+        start = time.perf_counter()
+        assert hedger.call("lookup", lookup) == "ok"
+        hedged.append(time.perf_counter() - start)
+
+    def p99(values):
+        return sorted(values)[98] * 1000
+
+    stats = hedger.stats()["lookup"]
+    print(f"  p99 without hedging: {p99(plain):.0f}ms, with hedging: {p99(hedged):.0f}ms")
+    print(f"  {stats}")
+
+    checks = [
+        ("tail latency reduced", p99(hedged) < p99(plain)),
+        ("hedges within budget", stats["hedged"] <= 0.2 * stats["calls"] + 1),
+        ("hedges won", stats["won"] > 0),
+    ]
+
+    # A first attempt that stalls and then fails is covered by the hedge
+    attempts = []
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            time.sleep(1.5)
+            raise ConnectionError("stalled")
+        return "recovered"
+    checks.append(("failed attempt covered by hedge", hedger.call("flaky", flaky) == "recovered"))
+
+    report(checks, "hedging", "Hedging works.")
+
+if __name__ == "__main__":
+    main()
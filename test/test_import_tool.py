@@ -0,0 +1,57 @@
+import sys
+import os
+import time
+import tracemalloc
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tools.client import get_guest_client
+from tools.import_tool import resolve_playlist, iter_playlist_pages
+from agent.state import SessionState
+
+def main():
+    print("Testing tools/import_tool.py...")
+
+    # A large public playlist: find one through search
+    try:
+        yt = get_guest_client()
+        found = yt.search("top 500 songs", filter="community_playlists", limit=5)
+    except Exception as e:
+        print(f"❌ Failed to search for a playlist: {e}")
+        return
+    if not found:
+        print("❌ Could not find a public playlist to import. Test Failed.")
+        return
+    playlist_id, _ = resolve_playlist(found[0]['browseId'])
+    print(f"Importing '{found[0]['title']}' ({playlist_id})...")
+
+    # Stream pages into a cart, tracking peak memory of the import itself
+    session = SessionState()
+    pages = total = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        for songs in iter_playlist_pages(playlist_id, max_songs=1000, yt=yt):
+            pages += 1
+            total += len(songs)
+            added = session.add_songs(songs)
+            print(f"  Page {pages}: {len(songs)} songs, {added} new (cart: {len(session.get_cart())})")
+    except Exception as e:
+        tracemalloc.stop()
+        print(f"❌ Import failed: {e}")
+        return
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"Read {total} songs in {pages} pages in {time.perf_counter() - start:.1f}s (peak {peak / 1e6:.1f}MB)")
+
+    # Importing again adds nothing
+    again = sum(session.add_songs(songs) for songs in iter_playlist_pages(playlist_id, max_songs=200, yt=yt))
+    cart = session.get_cart()
+    if not cart or again or len({s['videoId'] for s in cart}) != len(cart):
+        print(f"❌ Import/dedupe failed (cart {len(cart)}, re-import added {again}).")
+    else:
+        print("\n✅ Playlist import works.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tools.library_tool import find_playlist, get_playlist_tracks, diff_playlist, sync_playlist, invalidate_library_cache
+from tools.search_tool import search_song
+
+class StubLibrary:
+    """Offline client: a "Work" playlist; rejects adds containing "bad" (as a status, not an exception)."""
+    def __init__(self):
+        self.tracks = [{"videoId": "a", "setVideoId": "1"}, {"videoId": "b", "setVideoId": "2"}]
+
+    def get_library_playlists(self, limit=None):
+        return [{"playlistId": "PLwork", "title": "Work", "count": len(self.tracks)}]
+
+    def get_playlist(self, playlist_id, limit=None):
+        return {"tracks": list(self.tracks)}
+
+    def add_playlist_items(self, playlist_id, video_ids):
+        if "bad" in video_ids:
+            return {"status": "STATUS_FAILED", "actions": []}
+        self.tracks += [{"videoId": v, "setVideoId": v} for v in video_ids]
+        return {"status": "STATUS_SUCCEEDED", "playlistEditResults": []}
+
+    def remove_playlist_items(self, playlist_id, videos):
+        return "STATUS_SUCCEEDED"
+
+def main():
+    print("Testing tools/library_tool.py...")
+
+    # 1. Diffing (offline)
+    current = [{"videoId": "a", "setVideoId": "1"}, {"videoId": "b", "setVideoId": "2"}]
+    to_add, to_remove = diff_playlist(current, ["b", "c", "c"], remove_missing=True)
+    if to_add == ["c"] and [t["videoId"] for t in to_remove] == ["a"]:
+        print("✅ Diff computes minimal adds/removes.")
+    else:
+        print(f"❌ Unexpected diff: +{to_add} -{to_remove}")
+
+    # 2. Failed adds and fuzzy names in mirror mode (offline)
+    yt = StubLibrary()
+    result = sync_playlist("work", ["b", "c", "bad"], yt=yt)
+    if result["synced"] == ["b"] and result["added"] == 0 and result["failed"] == ["c", "bad"]:
+        print(f"✅ Rejected batch reported as failed, not synced (failed {result['failed']}).")
+    else:
+        print(f"❌ Rejected songs counted as synced: {result}")
+
+    invalidate_library_cache()
+    try:
+        sync_playlist("Workout", ["c"], remove_missing=True, yt=yt)
+        print("❌ Mirror mode matched 'Workout' to 'Work'.")
+    except LookupError as e:
+        print(f"✅ Mirror mode needs the exact name: {e}")
+    invalidate_library_cache()
+
+    # 3. Resolve a playlist by name (requires auth - see README)
+    name = "Agent Test"
+    print(f"\nLooking up a library playlist named like '{name}'...")
+    try:
+        playlist = find_playlist(name)
+    except Exception as e:
+        print(f"❌ Failed to read library: {e}")
+        return
+
+    if not playlist:
+        print("⚠️ No matching playlist. Run test_playlist_tool.py first to create one.")
+        return
+    print(f"✅ Found '{playlist['title']}' ({playlist['playlistId']})")
+
+    tracks = get_playlist_tracks(playlist['playlistId'])
+    print(f"  Contains {len(tracks)} songs (cached for next lookup)")
+
+    # 4. Sync a song in (a second run should add nothing)
+    songs = search_song("Never Gonna Give You Up", limit=1)
+    if not songs:
+        print("❌ Could not find a song to test with.")
+        return
+
+    for attempt in (1, 2):
+        result = sync_playlist(playlist['title'], [songs[0]['videoId']])
+        print(f"  Sync #{attempt}: added {result['added']}, removed {result['removed']}")
+
+    print("\n✅ Library sync finished.")
+
+if __name__ == "__main__":
+    main()
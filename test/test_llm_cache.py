@@ -0,0 +1,95 @@
+import sys
+import os
+import time
+import json
+import tempfile
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("OPENAI_KEY", "offline-test")
+os.environ.setdefault("STATE_STORE", "memory")
+
+from checks import report
+from agent.llm_cache import CompletionCache, completion_key
+
+class StubCompletions:
+    """Chat completions API that asks for one tool call, then answers; 100ms per call."""
+    def __init__(self, tool: str, args: dict):
+        self.tool, self.args = tool, args
+        self.calls = 0
+
+    def create(self, model, messages, tools, timeout=None):
+        self.calls += 1
+        time.sleep(0.1)
+        if messages[-1]["role"] == "user":
+            call = SimpleNamespace(id=f"call_{self.calls}", function=SimpleNamespace(
+                name=self.tool, arguments=json.dumps(self.args)))
+            message = SimpleNamespace(content=None, tool_calls=[call])
+        else:
+            message = SimpleNamespace(content=f"Here you go: {messages[-1]['content'][:40]}", tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+def run_turn(agent, message: str) -> str:
+    import main
+    with main.session_scope("llm-cache-test", agent=agent):
+        with main.Deadline().active():
+            events = list(agent._send_to_llm(message))
+    return events[-1]["content"]
+
+def main():
+    print("Testing agent/llm_cache.py (offline)...")
+    checks = []
+    disk = tempfile.mkdtemp()
+
+    # Keys ignore case/spacing of user text and provider call ids
+    a = completion_key("m", [{"role": "user", "content": "Recommend something like  Blinding Lights"}])
+    b = completion_key("m", [{"role": "user", "content": "recommend something like blinding lights"}])
+    c = completion_key("other-model", [{"role": "user", "content": "recommend something like blinding lights"}])
+    checks.append(("normalized messages share a key", a == b and a != c))
+
+    cache = CompletionCache(enabled=True, maxsize=2, ttl=60, disk_dir=disk)
+    cache.set("k1", {"content": "one"}, seconds=1.5)
+    cache.set("k2", {"content": "two"})
+    cache.set("k3", {"content": "three"})  # evicts k1 from memory
+    fresh = CompletionCache(enabled=True, maxsize=2, ttl=60, disk_dir=disk)
+    checks.append(("disk tier survives a restart", fresh.get("k1") == {"content": "one"}))
+    expiring = CompletionCache(enabled=True, ttl=0.05, disk_dir=None)
+    expiring.set("k", "v")
+    time.sleep(0.1)
+    checks.append(("entries expire", expiring.get("k") is None))
+
+    # End to end through the OpenAI agent, with a stubbed API and stubbed tools
+    import main
+    main.completions.enabled, main.completions.disk_dir = True, tempfile.mkdtemp()
+    main.AVAILABLE_TOOLS["browse_mood_playlists"] = lambda mood: f"Playlists for {mood}: Chill Mix (ID: PL1)"
+    main.AVAILABLE_TOOLS["add_song_to_cart"] = lambda song_query: f"Added '{song_query}' to your cart."
+
+    agent = main.OpenAIAgent()
+    agent.client = SimpleNamespace(chat=SimpleNamespace(completions=StubCompletions("browse_mood_playlists", {"mood": "chill"})))
+    start = time.perf_counter()
+    first = run_turn(agent, "Chill playlists please")
+    cold = time.perf_counter() - start
+    agent.import_history([])
+    start = time.perf_counter()
+    second = run_turn(agent, "chill playlists  please")
+    warm = time.perf_counter() - start
+    print(f"  deterministic turn: {cold * 1000:.0f}ms cold, {warm * 1000:.0f}ms cached")
+    checks.append(("repeated turn served from cache", first == second and agent.client.chat.completions.calls == 2))
+    checks.append(("cached turn is faster", warm < cold / 2))
+
+    # A turn that changes the cart: the completion after the tool result is never cached
+    agent.client.chat.completions = StubCompletions("add_song_to_cart", {"song_query": "Levitating"})
+    for _ in range(2):
+        agent.import_history([])
+        run_turn(agent, "add Levitating")
+    checks.append(("answer after a cart change not cached", agent.client.chat.completions.calls == 3))
+
+    stats = main.completions.stats()
+    print(f"  {stats}")
+    checks.append(("hit rate and time saved reported", stats["hits"] >= 2 and stats["saved_seconds"] > 0 and stats["bypassed"] >= 2))
+
+    report(checks, "LLM cache", "LLM completion cache works.")
+
+if __name__ == "__main__":
+    main()
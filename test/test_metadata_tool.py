@@ -0,0 +1,80 @@
+import sys
+import os
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from checks import report
+from tools.metadata_tool import normalize_thumbnails, parse_duration, fetch_metadata
+from agent.state import SessionState
+from agent.enrichment import Enricher
+
+class StubClient:
+    """Answers watch-next/album requests locally, counting them."""
+    def __init__(self):
+        self.watch_calls = 0
+        self.album_calls = 0
+
+    def get_watch_playlist(self, videoId, limit=25):
+        self.watch_calls += 1
+        time.sleep(0.05)
+        # Music videos come with a 16:9 still instead of the cover
+        return {"tracks": [{
+            "videoId": videoId,
+            "length": "3:45",
+            "thumbnail": [{"url": f"https://i.ytimg.com/vi/{videoId}/sddefault.jpg", "width": 640, "height": 480}],
+            "album": {"name": "Album", "id": "MPREalbum"}
+        }]}
+
+    def get_album(self, browseId):
+        self.album_calls += 1
+        return {"thumbnails": [{"url": "https://lh3.googleusercontent.com/cover=w120-h120-l90-rj", "width": 120}]}
+
+def main():
+    print("Testing tools/metadata_tool.py + agent/enrichment.py (offline)...")
+    checks = []
+
+    sizes = normalize_thumbnails([
+        {"url": "https://lh3.googleusercontent.com/x=w60-h60-l90-rj", "width": 60, "height": 60},
+        {"url": "https://lh3.googleusercontent.com/x=w120-h120-l90-rj", "width": 120, "height": 120},
+        {"url": "https://lh3.googleusercontent.com/x=w226-h226-l90-rj", "width": 226, "height": 226},
+    ])
+    checks.append(("thumbnails normalized to 60/120px", [t["width"] for t in sizes] == [60, 120]
+                   and sizes[0]["url"].endswith("=w60-h60-l90-rj")))
+    checks.append(("durations parsed", (parse_duration("3:45"), parse_duration("1:02:03"), parse_duration("")) == (225, 3723, None)))
+
+    # A batch costs one request per track plus one per album, and is cached afterwards
+    yt = StubClient()
+    ids = [f"vid{i}" for i in range(8)]
+    start = time.perf_counter()
+    metadata = fetch_metadata(ids, yt=yt)
+    batch_time = time.perf_counter() - start
+    print(f"  8 tracks in {batch_time * 1000:.0f}ms ({yt.watch_calls} track + {yt.album_calls} album requests)")
+    checks.append(("all tracks resolved", set(metadata) == set(ids)))
+    checks.append(("requests run concurrently", batch_time < 8 * 0.05))
+    checks.append(("one album request per album", yt.album_calls == 1))
+    checks.append(("video still replaced by square cover", metadata["vid0"]["thumbnails"][0]["url"].endswith("cover=w60-h60-l90-rj")))
+    fetch_metadata(ids, yt=yt)
+    checks.append(("second batch served from cache", yt.watch_calls == 8))
+
+    # Background enrichment of a cart, without blocking the caller
+    state = SessionState()
+    state.cart = [{"videoId": vid, "title": vid, "artist": "A"} for vid in ids + ["other"]]
+    state.cart[0]["thumbnails"] = [{"url": "keep-me", "width": 60, "height": 60}]
+    enricher = Enricher(apply=lambda session_id, found: state.apply_metadata(found),
+                        fetch=lambda batch: fetch_metadata(batch, yt=yt), batch_window=0.01)
+    start = time.perf_counter()
+    pending = enricher.schedule("s1", state.cart)
+    checks.append(("schedule() doesn't block", time.perf_counter() - start < 0.05 and pending == len(state.cart)))
+    version, left = 0, pending
+    while left:
+        version, left = enricher.wait("s1", version, timeout=5)
+    enricher.stop()
+    checks.append(("cart songs enriched", all(s.get("duration_seconds") == 225 for s in state.cart[:8])))
+    checks.append(("existing thumbnails kept", state.cart[0]["thumbnails"][0]["url"] == "keep-me"))
+
+    report(checks, "enrichment", "Metadata enrichment works.")
+
+if __name__ == "__main__":
+    main()
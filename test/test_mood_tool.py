@@ -0,0 +1,57 @@
+import sys
+import os
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tools.mood_tool import mood_index, get_mood_playlists, get_playlist_songs
+
+def main():
+    print("Testing tools/mood_tool.py...")
+
+    # 1. Build the index (the one slow step)
+    start = time.perf_counter()
+    try:
+        mood_index.build()
+    except Exception as e:
+        print(f"❌ Failed to build the mood index: {e}")
+        return
+    moods = mood_index.moods()
+    print(f"Indexed {len(moods)} moods/genres in {time.perf_counter() - start:.1f}s")
+    if not moods:
+        print("❌ No categories found. Test Failed.")
+        return
+    print(f"  e.g. {', '.join(moods[:8])}")
+
+    # 2. Lookups are served from memory
+    mood = "chill playlists"
+    start = time.perf_counter()
+    category, playlists = get_mood_playlists(mood)
+    elapsed_us = (time.perf_counter() - start) * 1e6
+    print(f"\n'{mood}' -> {category} ({len(playlists)} playlists) in {elapsed_us:.0f}µs")
+
+    if not playlists:
+        print("❌ No playlists returned.")
+        return
+    for p in playlists:
+        print(f"  - {p['title']} ({p['playlistId']})")
+
+    # 3. Contents load lazily (first call hits the network, second is cached)
+    first = playlists[0]['playlistId']
+    for attempt in (1, 2):
+        start = time.perf_counter()
+        songs = get_playlist_songs(first, limit=5)
+        print(f"  Load #{attempt}: {len(songs)} songs in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    required = ['videoId', 'title', 'artist']
+    missing = [k for k in required if songs and k not in songs[0]]
+    if not songs or missing:
+        print(f"❌ Bad playlist contents (missing: {missing})")
+    else:
+        print("\n✅ Mood browsing works.")
+
+    mood_index.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import sys
+import os
+import time
+import threading
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("STATE_STORE", "memory")
+
+from checks import report
+from tools.prefetch import Prefetcher
+from agent.metrics import metrics
+
+def main():
+    print("Testing tools/prefetch.py (offline)...")
+    checks = []
+
+    # Concurrency and budget caps
+    running, peak, lock = [0], [0], threading.Lock()
+    def lookup(i):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return [i]
+
+    p = Prefetcher(enabled=True, max_workers=2, budget=5, max_pending=10)
+    p.touch("s1")
+    queued = sum(p.schedule("s1", ("lookup", i), lookup, i) for i in range(10))
+    time.sleep(0.5)
+    checks.append(("budget caps prefetches per minute", queued == 5))
+    checks.append(("at most max_workers run at once", peak[0] <= 2))
+
+    # Low priority: nothing starts while a foreground tool call runs
+    p = Prefetcher(enabled=True, max_workers=2, budget=10)
+    p.touch("s1")
+    started = []
+    with p.foreground():
+        p.schedule("s1", ("slow",), lambda: started.append(time.monotonic()) or [1])
+        time.sleep(0.2)
+        checks.append(("waits for foreground calls", not started))
+    time.sleep(0.1)
+    checks.append(("runs once the foreground is idle", len(started) == 1))
+
+    # Idle sessions are cancelled
+    p = Prefetcher(enabled=True, max_workers=1, budget=10, idle_seconds=0.05)
+    p.touch("s1")
+    cancelled, completed = metrics.get("prefetch.cancelled"), metrics.get("prefetch.completed")
+    with p.foreground():
+        p.schedule("s1", ("a",), lookup, 1)
+        time.sleep(0.1)  # s1 goes idle while its prefetch waits
+    time.sleep(0.1)
+    checks.append(("idle session's prefetch cancelled", metrics.get("prefetch.cancelled") == cancelled + 1
+                   and metrics.get("prefetch.completed") == completed))
+
+    # End to end: adding a song prefetches its radio, so "songs like ..." is served from cache
+    import main
+    from scripts.load_test import FakeYTMusic
+    from tools.client import set_client_factory
+    from tools import prefetch
+    FakeYTMusic.latency, FakeYTMusic.jitter = 0.2, 0.0
+    set_client_factory(FakeYTMusic)
+    hits_before = metrics.get("prefetch.hit")
+    with main.session_scope("prefetch-test") as session, session.active():
+        prefetch.prefetcher.touch("prefetch-test")
+        main.AVAILABLE_TOOLS["add_song_to_cart"](song_query="Levitating")
+        time.sleep(0.5)  # user reads the reply
+        start = time.perf_counter()
+        main.AVAILABLE_TOOLS["get_song_recommendations"](seed_song="Levitating")
+        elapsed = time.perf_counter() - start
+    set_client_factory(None)
+    print(f"  'songs like Levitating' after adding it: {elapsed * 1000:.0f}ms (upstream latency 200ms)")
+    checks.append(("follow-up served from prefetched cache", elapsed < 0.1))
+    checks.append(("prefetch hit counted", metrics.get("prefetch.hit") == hits_before + 1))
+    print(f"  {prefetch.prefetcher.stats()}")
+
+    report(checks, "prefetch", "Prefetching works.")
+
+if __name__ == "__main__":
+    main()
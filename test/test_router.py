@@ -0,0 +1,47 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.state import SessionState
+from agent.router import IntentRouter
+
+def main():
+    print("Testing agent/router.py (offline)...")
+
+    session = SessionState()
+    session.add_song({"videoId": "a1", "title": "Blinding Lights", "artist": "The Weeknd"})
+    session.add_song({"videoId": "b2", "title": "Save Your Tears", "artist": "The Weeknd"})
+    session.set_last_results([{"videoId": "c3", "title": "Starboy", "artist": "The Weeknd"}])
+    router = IntentRouter(session)
+
+    # (message, expected intent or None for LLM fallback)
+    cases = [
+        ("Show my cart", "review_cart"),
+        ("what's in my cart?", "review_cart"),
+        ("add #1", "add_result"),
+        ("add #9", None),  # nothing shown at that position
+        ("remove song 3 please", "remove_at"),
+        ("remove song 1 and find something similar", None),
+        ("Clear cart", "clear_cart"),
+        ("play me some jazz", None),
+    ]
+
+    failed = 0
+    for message, expected in cases:
+        routed = router.route(message)
+        intent = routed[0] if routed else None
+        status = "✅" if intent == expected else "❌"
+        if intent != expected:
+            failed += 1
+        print(f"  {status} '{message}' -> {intent} (expected {expected})")
+
+    print(f"\nRouter stats: {router.stats()}")
+    if failed:
+        print(f"❌ {failed} case(s) routed incorrectly.")
+    else:
+        print("✅ All commands routed correctly.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import sys
+import os
+import socket
+import threading
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.store import MemoryStore, SQLiteStore, RedisStore, dumps, loads
+from agent.state import SessionState
+
+def start_resp_stand_in() -> int:
+    """
+    Tiny in-process stand-in speaking the Redis protocol (GET/SET/DEL/MGET/INCR,
+    WATCH/MULTI/EXEC and PING only), so the Redis backend can be exercised
+    without a Redis server. Returns the port it listens on.
+    """
+    data = {}
+    writes = {}  # key -> write count, for WATCH
+    lock = threading.Lock()
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+
+    def bulk(value):
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def run(args):
+        cmd = args[0].upper()
+        if cmd == b"PING":
+            return b"+PONG\r\n"
+        if cmd == b"SET":
+            data[args[1]] = args[2]
+            writes[args[1]] = writes.get(args[1], 0) + 1
+            return b"+OK\r\n"
+        if cmd == b"INCR":
+            data[args[1]] = b"%d" % (int(data.get(args[1], b"0")) + 1)
+            writes[args[1]] = writes.get(args[1], 0) + 1
+            return b":%s\r\n" % data[args[1]]
+        if cmd == b"GET":
+            return bulk(data.get(args[1]))
+        if cmd == b"MGET":
+            return b"*%d\r\n" % (len(args) - 1) + b"".join(bulk(data.get(k)) for k in args[1:])
+        if cmd == b"DEL":
+            removed = sum(data.pop(k, None) is not None for k in args[1:])
+            for k in args[1:]:
+                writes[k] = writes.get(k, 0) + 1
+            return b":%d\r\n" % removed
+        return b"-ERR unknown command\r\n"
+
+    def handle(conn):
+        reader = conn.makefile("rb")
+        watched, queued = {}, None
+        while True:
+            line = reader.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(reader.readline()[1:])
+                args.append(reader.read(length + 2)[:-2])
+            cmd = args[0].upper()
+            with lock:
+                if cmd == b"WATCH":
+                    watched.update({k: writes.get(k, 0) for k in args[1:]})
+                    reply = b"+OK\r\n"
+                elif cmd == b"UNWATCH":
+                    watched, reply = {}, b"+OK\r\n"
+                elif cmd == b"MULTI":
+                    queued, reply = [], b"+OK\r\n"
+                elif cmd == b"EXEC":
+                    if any(writes.get(k, 0) != n for k, n in watched.items()):
+                        reply = b"*-1\r\n"
+                    else:
+                        reply = b"*%d\r\n" % len(queued) + b"".join(run(q) for q in queued)
+                    watched, queued = {}, None
+                elif queued is not None:
+                    queued.append(args)
+                    reply = b"+QUEUED\r\n"
+                else:
+                    reply = run(args)
+            conn.sendall(reply)
+
+    def accept():
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    return server.getsockname()[1]
+
+def check_store(name: str, store) -> bool:
+    # Two SessionState objects on one store behave like two server workers
+    worker_a = SessionState(store)
+    worker_b = SessionState(store)
+
+    worker_a.load("user-1")
+    worker_a.add_song({"videoId": "fJ9rUzIMcZQ", "title": "Bohemian Rhapsody", "artist": "Queen"})
+    worker_a.save()
+
+    worker_b.load("user-1")
+    ok = [s["videoId"] for s in worker_b.get_cart()] == ["fJ9rUzIMcZQ"]
+
+    # Both change the cart at once (a long turn vs. an import): neither change is lost
+    worker_a.load("user-1")
+    worker_b.load("user-1")
+    worker_a.add_song({"videoId": "hTWKbfoikeg", "title": "Smells Like Teen Spirit", "artist": "Nirvana"})
+    worker_a.save()
+    worker_b.remove_ids(["fJ9rUzIMcZQ"])
+    worker_b.add_song({"videoId": "4NRXx6U8ABQ", "title": "Blinding Lights", "artist": "The Weeknd"})
+    worker_b.save()
+    worker_a.load("user-1")
+    merged = ok and [s["videoId"] for s in worker_a.get_cart()] == ["hTWKbfoikeg", "4NRXx6U8ABQ"]
+
+    store.delete("session:user-1")
+    worker_b.load("user-1")
+    ok = ok and worker_b.get_cart() == []
+
+    print(f"  {'✅' if ok else '❌'} {name}: cart shared between workers")
+    print(f"  {'✅' if merged else '❌'} {name}: concurrent changes merged")
+    return ok and merged
+
+def main():
+    print("Testing agent/store.py (offline)...")
+
+    # Compact encoding round-trips, and large payloads get compressed
+    history = [{"role": "user", "content": "recommend something like Blinding Lights"}] * 50
+    blob = dumps(history)
+    print(f"  Encoded {len(history)} messages into {len(blob)} bytes (tag {blob[:1]!r})")
+    assert loads(blob) == history
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [
+            check_store("memory", MemoryStore()),
+            check_store("sqlite", SQLiteStore(os.path.join(tmp, "state.db"))),
+            check_store("redis (stand-in)", RedisStore(port=start_resp_stand_in())),
+        ]
+
+    if all(results):
+        print("\n✅ All state store backends work.")
+    else:
+        print("\n❌ Some backends failed.")
+
+if __name__ == "__main__":
+    main()
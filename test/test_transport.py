@@ -0,0 +1,92 @@
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from checks import report
+from tools.transport import Cassette, CassetteAdapter, CassetteMiss, make_adapter, RECORD, REPLAY
+
+class SlowJSONHandler(BaseHTTPRequestHandler):
+    """Answers every POST after 100ms with a JSON echo of the body and a call counter."""
+    calls = 0
+
+    def do_POST(self):
+        type(self).calls += 1
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(0.1)
+        payload = json.dumps({"echo": body.get("query"), "call": type(self).calls, "pad": "x" * 5000}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+def session_with(adapter) -> requests.Session:
+    s = requests.Session()
+    s.mount("http://", adapter)
+    return s
+
+def main():
+    print("Testing tools/transport.py (offline)...")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowJSONHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/youtubei/v1/search?alt=json"
+    path = os.path.join(tempfile.mkdtemp(), "cassette")
+    checks = []
+
+    # Record: the volatile "context" (client version, visitor id) isn't part of the key
+    recorder = make_adapter(RECORD, path=path)
+    s = session_with(recorder)
+    live = [s.post(url, json={"query": q, "context": {"client": {"clientVersion": "1.2024"}}}).json()
+            for q in ("blinding lights", "karma police", "blinding lights")]
+    recorder.close()
+    size = os.path.getsize(path + ".ytc")
+    print(f"  recorded {len(Cassette(path))} responses in {size} bytes (~{3 * len(json.dumps(live[0]))} raw)")
+    checks.append(("cassette is compressed", size < len(json.dumps(live)) / 4))
+
+    # Replay: same payloads, in recorded order, without the server
+    server.shutdown()
+    calls_before = SlowJSONHandler.calls
+    replayer = make_adapter(REPLAY, path=path)
+    s = session_with(replayer)
+    start = time.perf_counter()
+    replayed = [s.post(url, json={"query": q, "context": {"client": {"clientVersion": "1.2099"}}}).json()
+                for q in ("blinding lights", "karma police", "blinding lights")]
+    elapsed = time.perf_counter() - start
+    print(f"  replayed 3 responses in {elapsed * 1000:.1f}ms")
+    checks.append(("replay matches recording", replayed == live))
+    checks.append(("replay doesn't touch the network", SlowJSONHandler.calls == calls_before))
+    checks.append(("replay runs at full speed", elapsed < 0.1))
+
+    try:
+        s.post(url, json={"query": "never recorded"})
+        checks.append(("unknown request is a miss", False))
+    except CassetteMiss:
+        checks.append(("unknown request is a miss", True))
+
+    # Injected latency, and a timeout shorter than it
+    slow = session_with(CassetteAdapter(Cassette(path), REPLAY, latency="recorded"))
+    start = time.perf_counter()
+    slow.post(url, json={"query": "karma police"})
+    checks.append(("recorded latency reproduced", time.perf_counter() - start >= 0.1))
+    try:
+        slow.post(url, json={"query": "blinding lights"}, timeout=0.01)
+        checks.append(("timeout shorter than latency raises", False))
+    except requests.ReadTimeout:
+        checks.append(("timeout shorter than latency raises", True))
+
+    report(checks, "transport", "Record/replay transport works.")
+
+if __name__ == "__main__":
+    main()
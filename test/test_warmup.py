@@ -0,0 +1,46 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("STATE_STORE", "memory")
+
+from checks import report
+from agent.warmup import Readiness, warm_up
+from scripts.load_test import FakeYTMusic
+from tools.client import set_client_factory
+
+class CountingYTMusic(FakeYTMusic):
+    """FakeYTMusic that counts song searches."""
+    searches = []
+
+    def search(self, query, filter=None, limit=20, **kwargs):
+        CountingYTMusic.searches.append((query, limit))
+        return super().search(query, filter=filter, limit=limit, **kwargs)
+
+def main():
+    print("Testing agent/warmup.py (offline)...")
+    checks = []
+    FakeYTMusic.latency, FakeYTMusic.jitter = 0.05, 0.0
+    set_client_factory(CountingYTMusic)
+
+    readiness = Readiness()
+    warm_up(readiness, queries=["Levitating", "Blinding Lights"])
+    print(f"  {readiness.report()}")
+    checks.append(("warm-up finished ready", readiness.report()["status"] == "ready"))
+    warmed = len(CountingYTMusic.searches)
+    checks.append(("popular queries searched", warmed == 2))
+
+    # The tools' searches for those queries are answered from the primed cache
+    import main
+    with main.session_scope("warmup-test") as session, session.active():
+        main.AVAILABLE_TOOLS["add_song_to_cart"](song_query="levitating")
+        main.AVAILABLE_TOOLS["get_song_recommendations"](seed_song="Blinding  Lights")
+    set_client_factory(None)
+    print(f"  searches after warm-up: {CountingYTMusic.searches[warmed:]}")
+    checks.append(("tool searches served from the warm-up cache", len(CountingYTMusic.searches) == warmed))
+
+    report(checks, "warm-up", "Warm-up primes the tools' searches.")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,83 @@
 from ytmusicapi import YTMusic
+import os
+import re
 import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from tools.cache import TTLCache
+from tools.client import get_guest_client
+from tools.deadline import current_deadline
+from tools.metadata_tool import track_metadata
+from tools.prefetch import prefetcher
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Concurrent album fetches per discography crawl
+DISCOGRAPHY_WORKERS = int(os.getenv("DISCOGRAPHY_WORKERS", "4"))
+# Songs a crawl stops at (and the most one cache entry holds)
+DISCOGRAPHY_MAX_SONGS = int(os.getenv("DISCOGRAPHY_MAX_SONGS", "500"))
+# Finished crawls, keyed by artist browseId: (songs, whether every release was read)
+_discography_cache = TTLCache(maxsize=32, ttl=6 * 3600)
+# Artist name -> (browseId, display name, artist page); shared by top songs, related artists and crawls
+_artist_pages = TTLCache(maxsize=64, ttl=3600)
+
+def _find_artist(yt: YTMusic, artist_name: str):
+    """
+    Resolves an artist name to (browseId, display name) using the top search result.
+    Returns (None, None) if not found.
+    """
+    logger.info(f"Searching for artist '{artist_name}'...")
+    search_results = yt.search(query=artist_name, filter="artists")
+
+    if not search_results:
+        logger.warning(f"Artist '{artist_name}' not found.")
+        return None, None
+
+    # Assume top result is the correct artist
+    artist_data = search_results[0]
+    artist_id = artist_data.get('browseId')
+
+    if not artist_id:
+        logger.warning(f"No browseId found for artist '{artist_name}'")
+        return None, None
+
+    logger.info(f"Found artist '{artist_data.get('artist')}' (ID: {artist_id})")
+    return artist_id, artist_data.get('artist')
+
+def _artist_key(artist_name: str) -> str:
+    return " ".join(artist_name.casefold().split())
+
+def _artist_page(yt: YTMusic, artist_name: str):
+    """(browseId, display name, artist page) for a name, cached. (None, None, None) if not found."""
+    key = _artist_key(artist_name)
+    prefetcher.used(("artist", key))
+
+    def load():
+        artist_id, display_name = _find_artist(yt, artist_name)
+        if not artist_id:
+            return None
+        return artist_id, display_name, yt.get_artist(artist_id)
+
+    return _artist_pages.get_or_load(key, load) or (None, None, None)
+
+def prefetch_artist(session_id: str, artist_name: str) -> bool:
+    """Loads an artist's page (top songs, related artists) in the background (see tools/prefetch.py)."""
+    key = _artist_key(artist_name)
+    return prefetcher.schedule(session_id, ("artist", key), _artist_page, get_guest_client(), artist_name,
+                               cached=lambda: key in _artist_pages)
+
+def get_related_artists(artist_name: str, limit: int = 3) -> list[str]:
+    """Names of the artists YouTube Music lists as related ("Fans might also like")."""
+    try:
+        _, _, page = _artist_page(get_guest_client(), artist_name)
+    except Exception as e:
+        logger.warning(f"Could not load related artists for '{artist_name}': {e}")
+        return []
+    related = ((page or {}).get('related') or {}).get('results', [])
+    return [r['title'] for r in related if r.get('title')][:limit]
+
 def get_artist_top_songs(artist_name: str, limit: int = 5) -> list[dict]:
     """
     Finds keywords for an artist and returns their top songs.
@@ -17,28 +91,12 @@ def get_artist_top_songs(artist_name: str, limit: int = 5) -> list[dict]:
     """
     try:
         # Use Guest Client
-        yt = YTMusic()
-        
-        # 1. Search for the artist to get Browse ID
-        logger.info(f"Searching for artist '{artist_name}'...")
-        search_results = yt.search(query=artist_name, filter="artists")
-        
-        if not search_results:
-            logger.warning(f"Artist '{artist_name}' not found.")
-            return []
-            
-        # Assume top result is the correct artist
-        artist_data = search_results[0]
-        artist_id = artist_data.get('browseId')
+        yt = get_guest_client()
         
+        # 1-2. Search for the artist to get Browse ID, then the Artist Page (cached)
+        artist_id, display_name, artist_page = _artist_page(yt, artist_name)
         if not artist_id:
-            logger.warning(f"No browseId found for artist '{artist_name}'")
             return []
-            
-        logger.info(f"Found artist '{artist_data.get('artist')}' (ID: {artist_id})")
-        
-        # 2. Get Artist Page
-        artist_page = yt.get_artist(artist_id)
         
         # 3. Find "Songs" section
         # The structure of artist_page varies, but usually has 'songs' key if using simple access,
@@ -88,9 +146,10 @@ def get_artist_top_songs(artist_name: str, limit: int = 5) -> list[dict]:
                 parsed_songs.append({
                     "videoId": video_id,
                     "title": title,
-                    "artist": artist_data.get('artist'), # Use name from search result
+                    "artist": display_name, # Use name from search result
                     "album": song.get('album', {}).get('name', 'Unknown Album'),
-                    "duration": song.get('duration', '')
+                    "duration": song.get('duration', ''),
+                    **track_metadata(song)
                 })
             except Exception as e:
                 logger.warning(f"Error parsing song: {e}")
@@ -101,3 +160,165 @@ def get_artist_top_songs(artist_name: str, limit: int = 5) -> list[dict]:
     except Exception as e:
         logger.error(f"Error fetching top songs for '{artist_name}': {e}")
         return []
+
+
+def _list_releases(yt: YTMusic, artist_page: dict) -> list[dict]:
+    """
+    All albums and singles of an artist. The artist page only shows the first
+    few of each; when there are more, it provides params for the full listing.
+    """
+    releases, seen = [], set()
+    for kind in ("albums", "singles"):
+        section = artist_page.get(kind) or {}
+        items = section.get('results', [])
+        if section.get('browseId') and section.get('params'):
+            try:
+                items = yt.get_artist_albums(section['browseId'], section['params'], limit=None)
+            except Exception as e:
+                logger.warning(f"Full {kind} listing failed, using artist page preview: {e}")
+        for item in items:
+            browse_id = item.get('browseId')
+            if browse_id and browse_id not in seen:
+                seen.add(browse_id)
+                releases.append({"browseId": browse_id, "title": item.get('title', 'Unknown Album'), "type": kind})
+    return releases
+
+def _track_key(title: str) -> str:
+    # "Song (Remastered 2011)" / "Song - Radio Edit" count as the same song as "Song".
+    # Letters of any script are kept ("Café", "夜に駆ける"); "" means no usable title.
+    base = re.split(r"\s[\(\[]|\s-\s", title or "", maxsplit=1)[0]
+    return re.sub(r"[\W_]+", "", base.casefold())
+
+def iter_artist_discography(artist_name: str, max_songs: int = DISCOGRAPHY_MAX_SONGS,
+                            max_workers: int = DISCOGRAPHY_WORKERS):
+    """
+    Streams the songs of an artist's albums, then singles (in listing order),
+    deduplicated across releases, yielding each album's tracks as soon as that
+    album is fetched. Stops after max_songs songs.
+
+    Album track lists are fetched concurrently, but at most 2 * max_workers
+    requests are in flight and raw album responses are dropped right after
+    parsing. What the crawl keeps (and caches per artist) is bounded by
+    max_songs. If the chat turn's deadline passes mid-crawl, the albums
+    fetched so far are returned and the rest cancelled.
+
+    Yields:
+        Dictionaries with keys: videoId, title, artist, album, duration.
+    """
+    try:
+        yt = get_guest_client()
+        artist_id, display_name, artist_page = _artist_page(yt, artist_name)
+        if not artist_id:
+            return
+
+        cached, finished = _discography_cache.get(artist_id) or (None, False)
+        if cached is not None and (finished or len(cached) >= max_songs):
+            logger.info(f"Discography for '{display_name}' served from cache ({len(cached)} songs)")
+            yield from cached[:max_songs]
+            return
+
+        releases = _list_releases(yt, artist_page)
+        logger.info(f"Crawling {len(releases)} releases for '{display_name}'...")
+    except Exception as e:
+        logger.error(f"Error starting discography crawl for '{artist_name}': {e}")
+        return
+
+    def fetch(release):
+        album = yt.get_album(release['browseId'])
+        tracks = []
+        for track in album.get('tracks', []):
+            try:
+                if not track.get('videoId'):
+                    continue
+                tracks.append({
+                    "videoId": track['videoId'],
+                    "title": track.get('title', 'Unknown Title'),
+                    "artist": display_name,
+                    "album": album.get('title', release['title']),
+                    "duration": track.get('duration', ''),
+                    **track_metadata(track, album_thumbnails=album.get('thumbnails'))
+                })
+            except Exception as e:
+                logger.warning(f"Error parsing album track: {e}")
+        return tracks
+
+    seen_ids, seen_titles = set(), set()
+    collected = []
+    complete = True  # no album failed or was skipped (so `collected` can be cached)
+    reached_cap = False
+    pending = iter(releases)
+    in_flight = set()
+    deadline = current_deadline()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="discography") as pool:
+        def submit(release):
+            # Workers run in the caller's context so their requests honor its deadline
+            in_flight.add(pool.submit(contextvars.copy_context().run, fetch, release))
+
+        try:
+            # Keep a bounded window of requests in flight instead of queueing every album
+            for release in pending:
+                submit(release)
+                if len(in_flight) >= 2 * max_workers:
+                    break
+
+            while in_flight:
+                timeout = deadline.remaining() if deadline else None
+                done, in_flight = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    deadline.missed = True
+                    complete = False
+                    logger.warning(f"Deadline hit crawling '{display_name}', returning {len(collected)} songs so far")
+                    break
+                for future in done:
+                    try:
+                        tracks = future.result()
+                    except Exception as e:
+                        complete = False
+                        logger.warning(f"Album fetch failed: {e}")
+                        tracks = []
+
+                    for track in tracks:
+                        key = _track_key(track['title'])
+                        if track['videoId'] in seen_ids or (key and key in seen_titles):
+                            continue
+                        seen_ids.add(track['videoId'])
+                        if key:
+                            seen_titles.add(key)
+                        collected.append(track)
+                        yield track
+                        if len(collected) >= max_songs:
+                            reached_cap = True
+                            break
+                    if reached_cap:
+                        break
+
+                    if deadline and deadline.expired():
+                        complete = False  # out of time: don't start more albums
+                        continue
+                    next_release = next(pending, None)
+                    if next_release:
+                        submit(next_release)
+                if reached_cap:
+                    logger.info(f"Stopped crawling '{display_name}' at {max_songs} songs")
+                    break
+        finally:
+            # Consumer stopped early (or errored): don't start the remaining albums
+            for future in in_flight:
+                future.cancel()
+
+    if complete:
+        _discography_cache.set(artist_id, (collected, not reached_cap))
+
+def get_artist_discography(artist_name: str, limit: int = DISCOGRAPHY_MAX_SONGS) -> list[dict]:
+    """
+    Deduplicated song list across an artist's albums and singles.
+
+    Args:
+        artist_name: Name of the artist.
+        limit: Stop after this many songs (albums first, then singles).
+
+    Returns:
+        List of dictionaries with song metadata.
+    """
+    return list(iter_artist_discography(artist_name, max_songs=limit))
@@ -0,0 +1,74 @@
+from ytmusicapi import YTMusic
+import hashlib
+import logging
+import threading
+
+from tools.deadline import DeadlineSession
+from tools.transport import make_adapter
+
+logger = logging.getLogger(__name__)
+
+# One connection pool for every client, so TLS connections opened by one tool
+# call (or by the startup warm-up) are reused by the next. The adapter can
+# also record or replay the traffic (YTM_TRANSPORT, see tools/transport.py).
+_POOL = {"pool_connections": 4, "pool_maxsize": 32}
+_session = DeadlineSession()
+_session.mount("https://", make_adapter(**_POOL))
+
+def _default_factory(auth: str = None) -> YTMusic:
+    # Every upstream request is bounded by the current chat turn's deadline
+    return YTMusic(auth=auth, requests_session=_session)
+
+# Builds YTMusic clients for every tool module. Swappable so load tests and
+# offline runs can substitute a fake client (see scripts/load_test.py).
+_client_factory = _default_factory
+
+# Clients are shared across calls and threads (the tools never use the
+# non-thread-safe `as_mobile`); the authenticated one is rebuilt whenever
+# the auth file's contents change.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def set_client_factory(factory):
+    """
+    Replaces the YTMusic constructor used by the tools.
+    `factory(auth=None)` must return an object with the YTMusic methods the tools call.
+    Pass None to restore the real client.
+    """
+    global _client_factory
+    with _clients_lock:
+        _client_factory = factory or _default_factory
+        _clients.clear()
+
+def set_transport(mode: str, path: str = None, latency=None):
+    """
+    Switches the shared session between passthrough/record/replay at runtime
+    (tests, benchmarks). Returns the new adapter.
+    """
+    kwargs = {k: v for k, v in (("path", path), ("latency", latency)) if v is not None}
+    adapter = make_adapter(mode, **kwargs, **_POOL)
+    previous = _session.get_adapter("https://")
+    _session.mount("https://", adapter)
+    previous.close()
+    return adapter
+
+def _cached_client(key, auth: str = None):
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = _client_factory(auth=auth) if auth else _client_factory()
+        return client
+
+def get_guest_client() -> YTMusic:
+    """Unauthenticated client (search, artist pages, radio, browse)."""
+    return _cached_client("guest")
+
+def make_authenticated_client(auth_path: str) -> YTMusic:
+    """Client authenticated with browser headers (library / playlist writes)."""
+    with open(auth_path, "rb") as f:
+        key = ("auth", auth_path, hashlib.sha1(f.read()).hexdigest())
+    with _clients_lock:
+        # Forget clients built from older headers
+        for stale in [k for k in _clients if k[0] == "auth" and k != key]:
+            del _clients[stale]
+    return _cached_client(key, auth=auth_path)
@@ -0,0 +1,86 @@
+import os
+import time
+import logging
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Budget for one chat turn (LLM calls + every tool call they trigger)
+TURN_DEADLINE_SECONDS = float(os.getenv("TURN_DEADLINE_SECONDS", "45"))
+# Upper bound for a single upstream request, even with plenty of budget left
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv("YTM_REQUEST_TIMEOUT", "30"))
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when work is attempted after the turn's deadline has passed."""
+
+class Deadline:
+    """
+    A point in time by which a chat turn must finish.
+
+    Attributes:
+        missed: Set once anything had to be cut short because of this deadline.
+        results: (tool name, output) of every tool that completed in time, so
+            the agent can answer with partial results when the budget runs out.
+    """
+    def __init__(self, seconds: float = TURN_DEADLINE_SECONDS):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.missed = False
+        self.results = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, what: str = "request"):
+        """Raises DeadlineExceeded (and marks the deadline missed) if time is up."""
+        if self.expired():
+            self.missed = True
+            raise DeadlineExceeded(f"Turn deadline of {self.seconds:g}s exceeded before {what}")
+
+    def timeout(self, default: float = DEFAULT_REQUEST_TIMEOUT, what: str = "request") -> float:
+        """Timeout for one blocking call: the smaller of `default` and the time left."""
+        self.check(what)
+        return min(default, self.remaining())
+
+    @contextmanager
+    def active(self):
+        """Makes this the current deadline for code running in this context."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+# Context-local so concurrent turns (server threadpool) each see their own deadline
+_current = contextvars.ContextVar("turn_deadline", default=None)
+
+def current_deadline() -> Optional[Deadline]:
+    """The deadline of the turn being served, or None outside a turn (CLI jobs, background refresh)."""
+    return _current.get()
+
+def request_timeout(default: float = DEFAULT_REQUEST_TIMEOUT, what: str = "request") -> float:
+    """Timeout to use for an upstream call made right now."""
+    deadline = current_deadline()
+    return deadline.timeout(default, what) if deadline else default
+
+class DeadlineSession(requests.Session):
+    """
+    requests.Session whose timeout never outlives the current turn's deadline.
+    Requests made after the deadline fail immediately with DeadlineExceeded.
+    """
+    def request(self, method, url, *args, **kwargs):
+        kwargs["timeout"] = request_timeout(kwargs.get("timeout") or DEFAULT_REQUEST_TIMEOUT, what=f"{method} {url}")
+        try:
+            return super().request(method, url, *args, **kwargs)
+        except requests.Timeout:
+            deadline = current_deadline()
+            if deadline and deadline.expired():
+                deadline.missed = True
+            raise
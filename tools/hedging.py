@@ -0,0 +1,148 @@
+import os
+import math
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from agent.metrics import metrics
+from tools.deadline import current_deadline
+from tools.prefetch import prefetching
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: duplicate slow upstream lookups (see Hedger)
+HEDGING_ENABLED = os.getenv("YTM_HEDGE", "").lower() in ("1", "true", "yes", "on")
+# Fire the duplicate once the first request is slower than this latency percentile
+HEDGE_PERCENTILE = float(os.getenv("YTM_HEDGE_PERCENTILE", "95"))
+# Extra load cap: at most this fraction of calls may be hedged
+HEDGE_BUDGET = float(os.getenv("YTM_HEDGE_BUDGET", "0.1"))
+# Hedge delay used until enough latencies have been observed for an operation
+DEFAULT_DELAY = float(os.getenv("YTM_HEDGE_DEFAULT_MS", "1000")) / 1000
+MIN_SAMPLES = 20
+WINDOW = 200
+
+class Hedger:
+    """
+    Hedged requests: the call is started on a worker thread; if it hasn't
+    answered after the operation's tracked latency percentile, an identical
+    second attempt is fired and whichever finishes first wins.
+
+    Hedges are paid for from a token bucket that earns `budget` tokens per
+    call, so at most ~budget of all calls are duplicated. The slower attempt's
+    result is discarded; it is cancelled if it hasn't started yet, otherwise
+    left to finish (its upstream timeout still bounds it).
+    """
+    def __init__(self, enabled: bool = HEDGING_ENABLED, percentile: float = HEDGE_PERCENTILE,
+                 budget: float = HEDGE_BUDGET, max_workers: int = 16):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._latencies = {}  # op -> recent first-attempt latencies (seconds)
+        self._tokens = 1.0
+        self._max_tokens = max(1.0, budget * 100)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def delay(self, op: str) -> float:
+        """Seconds to wait for the first attempt before hedging `op`."""
+        with self._lock:
+            samples = sorted(self._latencies.get(op, ()))
+        if len(samples) < MIN_SAMPLES:
+            return DEFAULT_DELAY
+        rank = math.ceil(self.percentile / 100 * len(samples))
+        return samples[max(0, rank - 1)]
+
+    def _record(self, op: str, seconds: float):
+        with self._lock:
+            self._latencies.setdefault(op, deque(maxlen=WINDOW)).append(seconds)
+
+    def _take_token(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    def _submit(self, op: str, fn, record: bool):
+        start = time.perf_counter()
+        # Each attempt gets its own copy of the caller's context (turn deadline)
+        future = self._pool.submit(contextvars.copy_context().run, fn)
+        if record:
+            # Recorded even when a hedge wins, so slow responses keep counting
+            future.add_done_callback(lambda f: self._record(op, time.perf_counter() - start))
+        return future
+
+    def call(self, op: str, fn):
+        """
+        Runs `fn()` (one upstream request, safe to repeat) with hedging.
+
+        Args:
+            op: Operation name; latencies and metrics are tracked per op.
+            fn: Zero-argument callable. It may be called twice concurrently,
+                so it must be thread-safe.
+
+        Returns:
+            The result of whichever attempt finished first (successfully, if either did).
+        """
+        if not self.enabled or prefetching():
+            return fn()  # speculative lookups never pay for a hedge
+
+        metrics.incr(f"hedge.{op}.calls")
+        with self._lock:
+            self._tokens = min(self._max_tokens, self._tokens + self.budget)
+
+        primary = self._submit(op, fn, record=True)
+        delay = self.delay(op)
+        deadline = current_deadline()
+        if deadline:
+            delay = min(delay, deadline.remaining())
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        if not self._take_token():
+            metrics.incr(f"hedge.{op}.budget_exhausted")
+            return primary.result()
+
+        metrics.incr(f"hedge.{op}.hedged")
+        logger.info(f"Hedging '{op}' after {delay * 1000:.0f}ms")
+        backup = self._submit(op, fn, record=False)
+
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if future is backup:
+                        metrics.incr(f"hedge.{op}.won")
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def stats(self) -> dict:
+        """Per-operation hedge rate, win rate and current hedge delay."""
+        with self._lock:
+            ops = list(self._latencies)
+        out = {}
+        for op in ops:
+            calls = metrics.get(f"hedge.{op}.calls")
+            hedged = metrics.get(f"hedge.{op}.hedged")
+            won = metrics.get(f"hedge.{op}.won")
+            out[op] = {
+                "calls": calls,
+                "hedged": hedged,
+                "won": won,
+                "hedge_rate": round(hedged / calls, 3) if calls else 0.0,
+                "win_rate": round(won / hedged, 3) if hedged else 0.0,
+                "delay_ms": round(self.delay(op) * 1000, 1)
+            }
+        return out
+
+# Process-wide hedger used by the tools
+hedger = Hedger()
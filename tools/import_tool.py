@@ -0,0 +1,121 @@
+from ytmusicapi import YTMusic
+import os
+import re
+import logging
+from typing import Iterator
+
+from tools.client import get_guest_client
+from tools.library_tool import find_playlist
+from tools.metadata_tool import track_metadata
+from tools.playlist_tool import get_authenticated_client
+
+logger = logging.getLogger(__name__)
+
+# Hard cap per import so a huge playlist can't grow the cart without bound
+MAX_IMPORT_SONGS = int(os.getenv("IMPORT_MAX_SONGS", "5000"))
+
+_LIKED = {"liked", "liked songs", "likes", "my likes", "my liked songs", "lm"}
+_URL_LIST = re.compile(r"[?&]list=([\w-]+)")
+_PLAYLIST_ID = re.compile(r"^(?:VL)?(?:PL|OLAK5uy_|RDCLAK|LM)[\w-]*$")
+
+def resolve_playlist(source: str) -> tuple[str, str]:
+    """
+    Turns what the user said into a playlist ID.
+    Accepts "liked songs", a playlist URL or ID, or the name of a library playlist.
+
+    Returns:
+        (playlistId, display title)
+
+    Raises:
+        LookupError if a name doesn't match any library playlist.
+    """
+    text = source.strip()
+    if text.casefold() in _LIKED:
+        return "LM", "Liked Songs"
+    url_match = _URL_LIST.search(text)
+    if url_match:
+        return url_match.group(1), url_match.group(1)
+    if _PLAYLIST_ID.match(text):
+        return text, text
+    playlist = find_playlist(text)
+    if not playlist:
+        raise LookupError(f"No playlist named '{source}' in your library.")
+    return playlist['playlistId'], playlist['title']
+
+def _parse_track(track: dict):
+    vid = track.get('videoId')
+    if not vid:
+        return None  # unavailable/deleted entries
+    artists = track.get('artists') or []
+    album = track.get('album')
+    return {
+        "videoId": vid,
+        "title": track.get('title', 'Unknown Title'),
+        "artist": artists[0]['name'] if artists else "Unknown Artist",
+        "album": album['name'] if album else "Unknown Album",
+        "duration": track.get('duration', ''),
+        **track_metadata(track)
+    }
+
+def _raw_pages(yt: YTMusic, playlist_id: str) -> Iterator[list[dict]]:
+    """
+    Playlist tracks one response page (~100 tracks) at a time, following the
+    continuation tokens ourselves: YTMusic.get_playlist would first collect
+    every page into one list.
+
+    Uses ytmusicapi internals, imported here so a release that moves them only
+    disables paging (see the fallback in iter_playlist_pages), not the app.
+    """
+    from ytmusicapi.navigation import nav, TWO_COLUMN_RENDERER, SECTION, CONTENT
+    from ytmusicapi.continuations import CONTINUATION_ITEMS, get_continuation_token
+    from ytmusicapi.parsers.playlists import parse_playlist_items
+
+    browse_id = playlist_id if playlist_id.startswith("VL") else "VL" + playlist_id
+    response = yt._send_request("browse", {"browseId": browse_id})
+    shelf = nav(response, [*TWO_COLUMN_RENDERER, "secondaryContents", *SECTION, *CONTENT, "musicPlaylistShelfRenderer"])
+    contents = shelf.get("contents", [])
+    while contents:
+        token = get_continuation_token(contents)
+        yield parse_playlist_items(contents)
+        if not token:
+            return
+        contents = nav(yt._send_request("browse", {"continuation": token}), CONTINUATION_ITEMS, True) or []
+
+def iter_playlist_pages(playlist_id: str, max_songs: int = MAX_IMPORT_SONGS, yt: YTMusic = None) -> Iterator[list[dict]]:
+    """
+    Streams a playlist (or "LM" = liked songs) as parsed pages of songs, so only
+    one page is held in memory at a time, however long the playlist is.
+
+    Args:
+        playlist_id: Playlist ID.
+        max_songs: Stop after this many songs.
+        yt: Optional client; the authenticated one is used when auth is set up
+            (needed for liked songs and private playlists).
+
+    Yields:
+        Lists of dictionaries with keys: videoId, title, artist, album, duration.
+    """
+    if yt is None:
+        has_auth = os.path.exists('browser.json') or os.path.exists('curl.txt')
+        yt = get_authenticated_client() if has_auth or playlist_id == "LM" else get_guest_client()
+
+    try:
+        pages = _raw_pages(yt, playlist_id)
+        first = next(pages, [])
+    except Exception as e:
+        # Response layout or ytmusicapi internals we don't know (e.g. album
+        # playlists, a newer release) or a non-YTMusic client: fall back to
+        # the library call, which loads everything at once.
+        logger.warning(f"Paged read of {playlist_id} unavailable ({e!r}); loading it in one request")
+        tracks = yt.get_playlist(playlist_id, limit=max_songs).get('tracks', [])
+        pages = iter([tracks[i:i + 100] for i in range(100, len(tracks), 100)])
+        first = tracks[:100]
+
+    remaining = max_songs
+    page = first
+    while page and remaining > 0:
+        songs = [s for s in map(_parse_track, page) if s][:remaining]
+        remaining -= len(songs)
+        if songs:
+            yield songs
+        page = next(pages, None)
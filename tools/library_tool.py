@@ -0,0 +1,223 @@
+from ytmusicapi import YTMusic
+import re
+import difflib
+import logging
+from typing import Optional
+
+from tools.cache import TTLCache
+from tools.playlist_tool import get_authenticated_client
+
+logger = logging.getLogger(__name__)
+
+# Library playlist index (name -> playlist) and per-playlist contents.
+# Both are invalidated whenever we write to the library ourselves, so the TTL
+# only has to cover edits made elsewhere (phone, web UI).
+_library_index = TTLCache(maxsize=1, ttl=600)
+_playlist_contents = TTLCache(maxsize=32, ttl=600)
+
+# YouTube Music rejects very large edit requests; keep each call moderate
+BATCH_SIZE = 50
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", name.casefold()).strip()
+
+def invalidate_library_cache(playlist_id: str = None):
+    """
+    Drops cached library data after a write.
+    With a playlist_id only that playlist's contents are dropped (plus the
+    index, since its track count changed).
+    """
+    _library_index.invalidate()
+    _playlist_contents.invalidate(playlist_id)
+
+def _load_index(yt: YTMusic) -> dict:
+    logger.info("Fetching library playlists...")
+    playlists = yt.get_library_playlists(limit=None)
+    index = {}
+    for p in playlists:
+        try:
+            # Only playlists we can edit are useful sync targets
+            if not p.get('playlistId') or p.get('owned') is False:
+                continue
+            index.setdefault(_normalize(p.get('title', '')), {
+                "playlistId": p['playlistId'],
+                "title": p.get('title', 'Untitled'),
+                "count": p.get('count')
+            })
+        except Exception as e:
+            logger.warning(f"Error parsing library playlist: {e}")
+    logger.info(f"Indexed {len(index)} library playlists")
+    return index
+
+def warm_library_cache(yt: YTMusic = None) -> int:
+    """Loads the library index ahead of the first sync. Returns the number of playlists."""
+    return len(_library_index.get_or_load("index", lambda: _load_index(yt or get_authenticated_client())) or {})
+
+def find_playlist(name: str, yt: YTMusic = None, exact: bool = False) -> Optional[dict]:
+    """
+    Resolves a playlist name from the user's library ("gym", "Chill Vibes").
+
+    Args:
+        name: Playlist name as the user said it.
+        yt: Optional authenticated client.
+        exact: Only accept the same name (ignoring case and punctuation),
+            no partial or fuzzy matches.
+
+    Returns:
+        {playlistId, title, count} or None if nothing is close enough.
+    """
+    index = _library_index.get_or_load("index", lambda: _load_index(yt or get_authenticated_client()))
+    if not index:
+        return None
+
+    key = _normalize(name)
+    if key in index or exact:
+        return index.get(key)
+
+    # Partial name ("gym" -> "gym bangers"), shortest title wins
+    partial = sorted((k for k in index if key and key in k), key=len)
+    if partial:
+        return index[partial[0]]
+
+    close = difflib.get_close_matches(key, list(index), n=1, cutoff=0.6)
+    return index[close[0]] if close else None
+
+def _load_tracks(yt: YTMusic, playlist_id: str) -> list[dict]:
+    logger.info(f"Fetching contents of playlist {playlist_id}...")
+    playlist = yt.get_playlist(playlist_id, limit=None)
+    tracks = []
+    for t in playlist.get('tracks', []):
+        if t.get('videoId'):
+            tracks.append({
+                "videoId": t['videoId'],
+                # setVideoId identifies the playlist entry; needed for removals
+                "setVideoId": t.get('setVideoId'),
+                "title": t.get('title', 'Unknown Title')
+            })
+    return tracks
+
+def get_playlist_tracks(playlist_id: str, yt: YTMusic = None) -> list[dict]:
+    """
+    Cached list of {videoId, setVideoId, title} in one of the user's playlists.
+    """
+    return _playlist_contents.get_or_load(
+        playlist_id, lambda: _load_tracks(yt or get_authenticated_client(), playlist_id)
+    ) or []
+
+def diff_playlist(current: list[dict], desired_ids: list[str], remove_missing: bool = False) -> tuple[list[str], list[dict]]:
+    """
+    Minimal edit to bring a playlist in line with `desired_ids`.
+
+    Returns:
+        (video_ids_to_add, playlist_items_to_remove). Order of desired_ids is kept
+        for additions; removals are only computed when remove_missing is True.
+    """
+    present = {t['videoId'] for t in current}
+    to_add, seen = [], set()
+    for vid in desired_ids:
+        if vid not in present and vid not in seen:
+            to_add.append(vid)
+            seen.add(vid)
+
+    to_remove = []
+    if remove_missing:
+        wanted = set(desired_ids)
+        to_remove = [t for t in current if t['videoId'] not in wanted and t.get('setVideoId')]
+    return to_add, to_remove
+
+def _batches(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _succeeded(response) -> bool:
+    """
+    add_playlist_items / remove_playlist_items report failures in their
+    response (a status other than STATUS_SUCCEEDED) instead of raising.
+    """
+    status = response.get('status') if isinstance(response, dict) else response
+    return "SUCCEEDED" in str(status or "")
+
+def _add_batch(yt: YTMusic, pid: str, batch: list[str]) -> tuple[list[str], list[str]]:
+    """Adds one batch. Returns (added, failed) videoIds; songs found already there are neither."""
+    try:
+        if _succeeded(yt.add_playlist_items(pid, batch)):
+            return batch, []
+    except Exception as e:
+        logger.warning(f"Adding {len(batch)} songs to {pid} failed: {e}")
+    # Our cached contents were probably stale (edited elsewhere) and the
+    # batch hit a duplicate; recompute this batch against fresh contents.
+    _playlist_contents.invalidate(pid)
+    fresh = {t['videoId'] for t in get_playlist_tracks(pid, yt)}
+    retry = [v for v in batch if v not in fresh]
+    if not retry:
+        return [], []
+    try:
+        if _succeeded(yt.add_playlist_items(pid, retry)):
+            return retry, []
+    except Exception as e:
+        logger.warning(f"Retrying {len(retry)} songs for {pid} failed: {e}")
+    return [], retry
+
+def sync_playlist(playlist_name: str, video_ids: list[str], remove_missing: bool = False, yt: YTMusic = None) -> dict:
+    """
+    Adds the given songs to an existing library playlist (found by name),
+    sending only the songs that aren't there yet.
+
+    Args:
+        playlist_name: Name of an existing playlist in the user's library.
+        video_ids: Songs that should be in the playlist.
+        remove_missing: Also remove playlist songs not in video_ids (mirror mode).
+            Since this deletes songs, the name must match exactly.
+        yt: Optional authenticated client.
+
+    Returns:
+        {playlistId, title, added, removed, synced, failed}: synced are the
+        video_ids now in the playlist, failed the ones YouTube Music rejected.
+
+    Raises:
+        LookupError if no playlist matches the name.
+    """
+    yt = yt or get_authenticated_client()
+    playlist = find_playlist(playlist_name, yt, exact=remove_missing)
+    if not playlist:
+        close = find_playlist(playlist_name, yt) if remove_missing else None
+        if close:
+            raise LookupError(f"No playlist named exactly '{playlist_name}' (did you mean '{close['title']}'?). "
+                              "Mirroring removes songs, so it needs the exact name.")
+        raise LookupError(f"No playlist named '{playlist_name}' in your library.")
+
+    pid = playlist['playlistId']
+    current = get_playlist_tracks(pid, yt)
+    to_add, to_remove = diff_playlist(current, video_ids, remove_missing)
+    logger.info(f"Syncing '{playlist['title']}': +{len(to_add)} / -{len(to_remove)}")
+
+    added, failed, removed = [], [], 0
+    try:
+        for batch in _batches(to_add, BATCH_SIZE):
+            ok, rejected = _add_batch(yt, pid, batch)
+            added += ok
+            failed += rejected
+
+        for batch in _batches(to_remove, BATCH_SIZE):
+            try:
+                if _succeeded(yt.remove_playlist_items(pid, batch)):
+                    removed += len(batch)
+                    continue
+            except Exception as e:
+                logger.warning(f"Removing {len(batch)} songs from {pid} failed: {e}")
+            logger.warning(f"YouTube Music did not remove {len(batch)} songs from '{playlist['title']}'")
+    finally:
+        if to_add or to_remove:
+            invalidate_library_cache(pid)
+
+    if failed:
+        logger.warning(f"YouTube Music rejected {len(failed)} songs for '{playlist['title']}'")
+    rejected = set(failed)
+    return {
+        "playlistId": pid,
+        "title": playlist['title'],
+        "added": len(added),
+        "removed": removed,
+        "synced": [v for v in video_ids if v not in rejected],
+        "failed": failed
+    }
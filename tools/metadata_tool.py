@@ -0,0 +1,176 @@
+from ytmusicapi import YTMusic
+import os
+import re
+import logging
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.cache import TTLCache
+from tools.client import get_guest_client
+
+logger = logging.getLogger(__name__)
+
+# Square sizes (px) every track's `thumbnails` list is normalized to: the cart row and its 2x version
+THUMBNAIL_SIZES = (60, 120)
+ALBUM_ART_SIZE = 544
+# Concurrent upstream requests per enrichment batch
+METADATA_WORKERS = int(os.getenv("METADATA_WORKERS", "4"))
+
+# Track/album metadata rarely changes; failed lookups are remembered briefly so they aren't retried in a loop
+_track_meta = TTLCache(maxsize=4096, ttl=24 * 3600)
+_album_art = TTLCache(maxsize=1024, ttl=24 * 3600)
+_NOT_FOUND = {}
+NOT_FOUND_TTL = 600
+
+# googleusercontent/ggpht images are resized by their URL suffix, e.g. "=w60-h60-l90-rj" or "=s120"
+_RESIZABLE = re.compile(r"=(?:w\d+-h\d+|s\d+)[^/=]*$")
+
+def parse_duration(text) -> Optional[int]:
+    """"3:45" / "1:02:03" -> seconds (None if it isn't a duration)."""
+    try:
+        seconds = 0
+        for part in str(text).strip().split(":"):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    except (TypeError, ValueError):
+        return None
+
+def _resize(url: str, size: int) -> Optional[str]:
+    if not _RESIZABLE.search(url):
+        return None
+    return _RESIZABLE.sub(f"=w{size}-h{size}-l90-rj", url)
+
+def normalize_thumbnails(thumbnails: list[dict], sizes: tuple = THUMBNAIL_SIZES) -> list[dict]:
+    """
+    Maps whatever thumbnails YouTube Music returned (any number, any size) to
+    one entry per requested square size, smallest first.
+    Resizable image URLs are rewritten to the exact size; fixed-size ones
+    (i.ytimg.com video stills) use the smallest that is at least that big.
+
+    Returns:
+        [{"url", "width", "height"}, ...], or [] if there is no usable thumbnail.
+    """
+    usable = sorted((t for t in thumbnails or [] if t.get('url')), key=lambda t: t.get('width') or 0)
+    if not usable:
+        return []
+    normalized = []
+    for size in sizes:
+        url = _resize(usable[-1]['url'], size)
+        if url:
+            normalized.append({"url": url, "width": size, "height": size})
+            continue
+        best = next((t for t in usable if (t.get('width') or 0) >= size), usable[-1])
+        normalized.append({"url": best['url'], "width": best.get('width'), "height": best.get('height')})
+    return normalized
+
+def album_art_url(thumbnails: list[dict]) -> Optional[str]:
+    """Square album art at ALBUM_ART_SIZE, if `thumbnails` are resizable album images."""
+    usable = [t for t in thumbnails or [] if t.get('url')]
+    return _resize(usable[-1]['url'], ALBUM_ART_SIZE) if usable else None
+
+def track_metadata(track: dict, album_thumbnails: list[dict] = None) -> dict:
+    """
+    Display metadata from a raw ytmusicapi track (search, playlist, album or
+    watch-playlist shape): normalized `thumbnails`, `album_art` and
+    `duration_seconds`. Keys that can't be determined are left out.
+    """
+    meta = {}
+    thumbnails = track.get('thumbnails') or track.get('thumbnail') or album_thumbnails
+    normalized = normalize_thumbnails(thumbnails)
+    if normalized:
+        meta["thumbnails"] = normalized
+    art = album_art_url(album_thumbnails or thumbnails)
+    if art:
+        meta["album_art"] = art
+    seconds = track.get('duration_seconds')
+    if seconds is None:
+        seconds = parse_duration(track.get('duration') or track.get('length'))
+    if seconds is not None:
+        meta["duration_seconds"] = seconds
+    album = track.get('album')
+    if isinstance(album, dict) and album.get('id'):
+        meta["albumId"] = album['id']
+    return meta
+
+def needs_metadata(song: dict) -> bool:
+    return not song.get('thumbnails') or song.get('duration_seconds') is None
+
+def _fetch_track(yt: YTMusic, video_id: str) -> dict:
+    """
+    One watch-next request: the track itself plus the queue YouTube Music
+    would play after it. Metadata for the whole queue is cached, so songs
+    added from the same radio/recommendations are usually already known.
+    """
+    tracks = yt.get_watch_playlist(videoId=video_id, limit=1).get('tracks', [])
+    found = {}
+    for track in tracks:
+        vid = track.get('videoId')
+        if vid:
+            meta = track_metadata(track)
+            found[vid] = meta
+            if vid != video_id and vid not in _track_meta:
+                _track_meta.set(vid, meta)
+    return found.get(video_id, {})
+
+def _fetch_album_art(yt: YTMusic, album_id: str) -> Optional[str]:
+    return album_art_url(yt.get_album(album_id).get('thumbnails'))
+
+def fetch_metadata(video_ids: list[str], yt: YTMusic = None, max_workers: int = METADATA_WORKERS) -> dict:
+    """
+    Metadata for a batch of tracks (see track_metadata). Cached ids are
+    answered from memory; the rest are fetched concurrently, then album art
+    is looked up once per distinct album for tracks whose thumbnail is a
+    video still rather than the album cover.
+
+    Returns:
+        {videoId: metadata} for every id that could be resolved.
+    """
+    result, missing = {}, []
+    for vid in dict.fromkeys(video_ids):
+        meta = _track_meta.get(vid)
+        if meta is None:
+            missing.append(vid)
+        elif meta:
+            result[vid] = meta
+    if not missing:
+        return result
+
+    yt = yt or get_guest_client()
+    logger.info(f"Fetching metadata for {len(missing)} tracks ({len(result)} cached)")
+
+    def fetch(vid):
+        try:
+            return vid, _fetch_track(yt, vid)
+        except Exception as e:
+            logger.warning(f"Metadata lookup failed for {vid}: {e}")
+            return vid, None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(missing)), thread_name_prefix="metadata") as pool:
+        fetched = dict(pool.map(fetch, missing))
+
+        # Album art for video-style entries, one request per album
+        albums = {m["albumId"] for m in fetched.values() if m and "albumId" in m and "album_art" not in m}
+        albums = [a for a in albums if _album_art.get(a) is None]
+        def fetch_art(album_id):
+            try:
+                return album_id, _fetch_album_art(yt, album_id)
+            except Exception as e:
+                logger.warning(f"Album art lookup failed for {album_id}: {e}")
+                return album_id, None
+        for album_id, art in pool.map(fetch_art, albums):
+            _album_art.set(album_id, art or "", ttl=None if art else NOT_FOUND_TTL)
+
+    for vid, meta in fetched.items():
+        if meta is None:
+            continue  # transient failure: retried next time
+        art = "albumId" in meta and "album_art" not in meta and _album_art.get(meta["albumId"])
+        if art:
+            # Square cover instead of the 16:9 video still, so every cart row looks the same
+            meta["album_art"] = art
+            meta["thumbnails"] = normalize_thumbnails([{"url": art, "width": ALBUM_ART_SIZE}])
+        if meta:
+            _track_meta.set(vid, meta)
+            result[vid] = meta
+        else:
+            _track_meta.set(vid, _NOT_FOUND, ttl=NOT_FOUND_TTL)
+    return result
@@ -0,0 +1,235 @@
+from ytmusicapi import YTMusic
+import os
+import re
+import time
+import difflib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.cache import TTLCache
+from tools.client import get_guest_client
+from tools.metadata_tool import track_metadata
+
+logger = logging.getLogger(__name__)
+
+# Moods & Genres barely change, so crawl rarely and serve from memory
+REFRESH_SECONDS = int(os.getenv("MOOD_REFRESH_SECONDS", str(6 * 3600)))
+# Max concurrent upstream requests while crawling / loading playlist contents
+MAX_CONCURRENT_FETCHES = int(os.getenv("MOOD_FETCH_CONCURRENCY", "4"))
+
+# Words that don't help pick a category ("some chill playlists please")
+_STOPWORDS = {"a", "an", "the", "some", "me", "my", "for", "music", "songs", "song",
+              "playlist", "playlists", "vibes", "mood", "genre", "please", "give", "find", "show"}
+
+def _tokens(text: str) -> list[str]:
+    return [t for t in re.findall(r"[a-z0-9]+", text.casefold()) if t not in _STOPWORDS]
+
+class MoodIndex:
+    """
+    Precomputed in-memory index of the Explore -> Moods & Genres tab:
+    every category with its playlists, plus token lookups over category and
+    playlist titles. Lookups are pure dict access; the crawl happens once and
+    is then refreshed by a background thread.
+    """
+    def __init__(self, refresh_seconds: int = REFRESH_SECONDS, max_workers: int = MAX_CONCURRENT_FETCHES):
+        self.refresh_seconds = refresh_seconds
+        self.max_workers = max_workers
+        self.built_at = None
+        self._last_attempt = None
+        # Swapped as one tuple so readers never see a half-built index
+        self._index = ({}, {}, {})  # (categories, category_tokens, playlist_tokens)
+        self._build_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def build(self, yt: YTMusic = None, force: bool = True):
+        """
+        Crawls all categories and their playlists (bounded concurrency).
+        With force=False it's a no-op if another thread already built the index.
+        """
+        with self._build_lock:
+            if not force and self.built_at is not None:
+                return
+            self._last_attempt = time.monotonic()
+            start = time.perf_counter()
+            yt = yt or get_guest_client()
+            logger.info("Crawling mood & genre categories...")
+            sections = yt.get_mood_categories()
+
+            entries = []
+            for section, cats in sections.items():
+                for cat in cats:
+                    if cat.get('params') and cat.get('title'):
+                        entries.append((section, cat['title'], cat['params']))
+
+            def fetch(entry):
+                section, title, params = entry
+                try:
+                    raw = yt.get_mood_playlists(params)
+                except Exception as e:
+                    logger.warning(f"Failed to fetch playlists for '{title}': {e}")
+                    raw = []
+                playlists = []
+                for p in raw:
+                    if p.get('playlistId'):
+                        playlists.append({
+                            "playlistId": p['playlistId'],
+                            "title": p.get('title', 'Untitled'),
+                            "description": p.get('description', '')
+                        })
+                return section, title, playlists
+
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mood") as pool:
+                crawled = list(pool.map(fetch, entries))
+
+            categories, cat_tokens, pl_tokens = {}, {}, {}
+            for section, title, playlists in crawled:
+                key = " ".join(_tokens(title)) or title.casefold()
+                if key in categories:
+                    # Same mood listed in several sections; merge playlists
+                    known = {p['playlistId'] for p in categories[key]['playlists']}
+                    categories[key]['playlists'] += [p for p in playlists if p['playlistId'] not in known]
+                    continue
+                categories[key] = {"title": title, "section": section, "playlists": playlists}
+                for tok in _tokens(title):
+                    cat_tokens.setdefault(tok, []).append(key)
+                for p in playlists:
+                    for tok in set(_tokens(p['title'])):
+                        pl_tokens.setdefault(tok, []).append(p)
+
+            if categories:
+                self._index = (categories, cat_tokens, pl_tokens)
+                self.built_at = time.time()
+            logger.info(f"Mood index: {len(categories)} categories built in {time.perf_counter() - start:.1f}s")
+
+    def ensure_loaded(self):
+        """Builds the index on first use and starts the background refresher."""
+        # Retry a failed first crawl at most once a minute, not on every request
+        recently_tried = self._last_attempt and time.monotonic() - self._last_attempt < 60
+        if self.built_at is None and not recently_tried:
+            try:
+                self.build(force=False)
+            except Exception as e:
+                logger.error(f"Failed to build mood index: {e}")
+        if self._thread is None or not self._thread.is_alive():
+            self.start_background_refresh()
+
+    def start_background_refresh(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(self.refresh_seconds if self.built_at else 60):
+                try:
+                    self.build()
+                except Exception as e:
+                    logger.warning(f"Background mood refresh failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name="mood-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def moods(self) -> list[str]:
+        return sorted(c['title'] for c in self._index[0].values())
+
+    def lookup(self, mood: str, limit: int = 5) -> tuple[str, list[dict]]:
+        """
+        Finds playlists for a mood/genre phrase.
+
+        Returns:
+            (matched category title or None, playlists)
+        """
+        categories, cat_tokens, pl_tokens = self._index
+        toks = _tokens(mood)
+        key = " ".join(toks)
+
+        if key in categories:
+            cat = categories[key]
+            return cat['title'], cat['playlists'][:limit]
+
+        # Category whose title contains all the query words ("hip hop" -> "Hip-Hop")
+        candidates = None
+        for tok in toks:
+            keys = set(cat_tokens.get(tok, ()))
+            candidates = keys if candidates is None else candidates & keys
+        if candidates:
+            cat = categories[min(candidates, key=len)]
+            return cat['title'], cat['playlists'][:limit]
+
+        close = difflib.get_close_matches(key, list(categories), n=1, cutoff=0.75)
+        if close:
+            cat = categories[close[0]]
+            return cat['title'], cat['playlists'][:limit]
+
+        # Fall back to playlist titles ("lofi" -> "Lofi Loft")
+        seen, found = set(), []
+        for tok in toks:
+            for p in pl_tokens.get(tok, ()):
+                if p['playlistId'] not in seen:
+                    seen.add(p['playlistId'])
+                    found.append(p)
+        return None, found[:limit]
+
+mood_index = MoodIndex()
+
+_playlist_songs = TTLCache(maxsize=128, ttl=3600)
+_fetch_slots = threading.BoundedSemaphore(MAX_CONCURRENT_FETCHES)
+
+def get_mood_playlists(mood: str, limit: int = 5) -> tuple[str, list[dict]]:
+    """
+    Playlists for a mood or genre ("chill", "workout", "k-pop"), served from the
+    in-memory index.
+
+    Args:
+        mood: Mood/genre phrase.
+        limit: Max playlists to return.
+
+    Returns:
+        (category title or None if matched by playlist title, list of {playlistId, title, description})
+    """
+    mood_index.ensure_loaded()
+    return mood_index.lookup(mood, limit)
+
+def get_playlist_songs(playlist_id: str, limit: int = 10) -> list[dict]:
+    """
+    Songs of a (public) playlist, loaded lazily on first request and cached.
+    Concurrent loads are capped by MOOD_FETCH_CONCURRENCY.
+
+    Returns:
+        List of dictionaries with keys: videoId, title, artist, album, duration.
+    """
+    def load():
+        with _fetch_slots:
+            try:
+                yt = get_guest_client()
+                logger.info(f"Loading playlist {playlist_id}...")
+                playlist = yt.get_playlist(playlist_id, limit=50)
+            except Exception as e:
+                logger.error(f"Failed to load playlist {playlist_id}: {e}")
+                return []
+
+        songs = []
+        for track in playlist.get('tracks', []):
+            try:
+                vid = track.get('videoId')
+                if not vid:
+                    continue
+                artists = track.get('artists') or []
+                album = track.get('album')
+                songs.append({
+                    "videoId": vid,
+                    "title": track.get('title', 'Unknown Title'),
+                    "artist": artists[0]['name'] if artists else "Unknown Artist",
+                    "album": album['name'] if album else "Unknown Album",
+                    "duration": track.get('duration', ''),
+                    **track_metadata(track)
+                })
+            except Exception as e:
+                logger.warning(f"Error parsing playlist track: {e}")
+        return songs
+
+    return _playlist_songs.get_or_load(playlist_id, load)[:limit]
@@ -5,6 +5,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 from scripts.setup_browser_auth import parse_curl_and_save
+from tools.client import make_authenticated_client
 
 def get_authenticated_client():
     """
@@ -22,12 +23,12 @@ def get_authenticated_client():
 
     try:
         # Simple init with headers file
-        return YTMusic(auth='browser.json')
+        return make_authenticated_client('browser.json')
     except Exception as e:
         logger.error(f"Failed to initialize authenticated client: {e}")
         raise
 
-def create_playlist_from_ids(title: str, video_ids: list[str], description: str = "Created by YT Music Agent") -> str:
+def create_playlist_from_ids(title: str, video_ids: list[str], description: str = "Created by YT Music Agent", yt: YTMusic = None) -> str:
     """
     Creates a private playlist with the given songs.
     
@@ -35,12 +36,13 @@ def create_playlist_from_ids(title: str, video_ids: list[str], description: str
         title: Title of the playlist.
         video_ids: List of videoIds to add.
         description: Description for the playlist.
+        yt: Optional already-authenticated client (one is created if omitted).
         
     Returns:
         The new Playlist ID.
     """
     try:
-        yt = get_authenticated_client()
+        yt = yt or get_authenticated_client()
         
         logger.info(f"Creating playlist '{title}' with {len(video_ids)} songs...")
         
@@ -52,6 +54,10 @@ def create_playlist_from_ids(title: str, video_ids: list[str], description: str
         )
         
         logger.info(f"Playlist created successfully. ID: {playlist_id}")
+
+        # New playlist => cached library index is stale
+        from tools.library_tool import invalidate_library_cache
+        invalidate_library_cache()
         return playlist_id
 
     except Exception as e:
@@ -0,0 +1,195 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from agent.metrics import metrics
+from tools.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Speculative lookups of likely follow-up requests (see Prefetcher); PREFETCH=0 turns them off
+PREFETCH_ENABLED = os.getenv("PREFETCH", "1").lower() not in ("0", "false", "no", "off")
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+# At most this many prefetches per minute across all sessions, and this many waiting to run
+PREFETCH_BUDGET = float(os.getenv("PREFETCH_BUDGET", "30"))
+PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", "8"))
+# A session with no chat activity for this long gets its queued prefetches cancelled
+PREFETCH_IDLE_SECONDS = float(os.getenv("PREFETCH_IDLE_SECONDS", "120"))
+# How long a prefetch waits for foreground tool calls to finish before giving up
+PREFETCH_MAX_WAIT = 5.0
+
+_prefetching = contextvars.ContextVar("prefetching", default=False)
+
+def prefetching() -> bool:
+    """True while running a speculative lookup (so it isn't hedged or counted as a hit)."""
+    return _prefetching.get()
+
+class Prefetcher:
+    """
+    Runs cheap guesses at the user's next request (radio for the song just
+    added, top songs of related artists) in the background, so the tool
+    caches already hold the answer when the LLM asks.
+
+    Prefetches are low priority: they only start while no foreground tool
+    call is running (see foreground()), on a small pool, within a per-minute
+    budget. Those of a session that went idle are cancelled. A prefetch
+    "hits" when a foreground call later uses the key it loaded (see used()).
+    """
+    def __init__(self, enabled: bool = PREFETCH_ENABLED, max_workers: int = PREFETCH_WORKERS,
+                 budget: float = PREFETCH_BUDGET, max_pending: int = PREFETCH_MAX_PENDING,
+                 idle_seconds: float = PREFETCH_IDLE_SECONDS):
+        self.enabled = enabled
+        self.budget = budget
+        self.max_pending = max_pending
+        self.idle_seconds = idle_seconds
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._pending = {}  # key -> (session id, future)
+        self._last_active = {}  # session id -> monotonic time of last activity
+        self._foreground = 0
+        self._tokens = budget
+        self._refilled_at = time.monotonic()
+        # Keys loaded by a prefetch and not used yet
+        self._loaded = TTLCache(maxsize=1024, ttl=600)
+
+    def touch(self, session_id: str):
+        """Marks the session active (called on every chat turn)."""
+        with self._cond:
+            self._last_active[session_id] = time.monotonic()
+
+    def _idle(self, session_id: str) -> bool:
+        return time.monotonic() - self._last_active.get(session_id, 0) > self.idle_seconds
+
+    @contextmanager
+    def foreground(self):
+        """Wraps user-facing tool calls; prefetches wait until none are running."""
+        with self._cond:
+            self._foreground += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._foreground -= 1
+                self._cond.notify_all()
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.budget, self._tokens + (now - self._refilled_at) * self.budget / 60)
+        self._refilled_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def schedule(self, session_id: str, key: tuple, fn, *args, cached=None) -> bool:
+        """
+        Queues fn(*args) to warm the cache entry `key`.
+
+        Args:
+            session_id: Session the guess was made for (idle sessions are cancelled).
+            key: Identifies the cache entry; the tool reports foreground use via used(key).
+            fn: The tool lookup to run; its result is discarded (it fills the cache).
+            cached: Optional zero-argument callable; when it returns True the
+                entry is already cached and nothing is scheduled.
+
+        Returns:
+            True if the prefetch was queued.
+        """
+        if not self.enabled:
+            return False
+        if cached is not None and cached():
+            return False
+        with self._cond:
+            self._cancel_idle()
+            if key in self._pending:
+                return False
+            if len(self._pending) >= self.max_pending:
+                metrics.incr("prefetch.dropped_full")
+                return False
+            if not self._take_token():
+                metrics.incr("prefetch.dropped_budget")
+                return False
+            self._last_active.setdefault(session_id, time.monotonic())
+            future = self._pool.submit(self._run, session_id, key, fn, args)
+            self._pending[key] = (session_id, future)
+        metrics.incr("prefetch.scheduled")
+        return True
+
+    def _cancel_idle(self):
+        """Cancels queued prefetches of idle sessions (caller holds the lock)."""
+        for key, (session_id, future) in list(self._pending.items()):
+            if self._idle(session_id) and future.cancel():
+                del self._pending[key]
+                metrics.incr("prefetch.cancelled")
+
+    def _run(self, session_id: str, key: tuple, fn, args):
+        try:
+            with self._cond:
+                if not self._cond.wait_for(lambda: self._foreground == 0, timeout=PREFETCH_MAX_WAIT):
+                    metrics.incr("prefetch.dropped_busy")
+                    return
+                if self._idle(session_id):
+                    metrics.incr("prefetch.cancelled")
+                    return
+            token = _prefetching.set(True)
+            start = time.perf_counter()
+            try:
+                result = fn(*args)
+            except Exception as e:
+                logger.warning(f"Prefetch {key} failed: {e}")
+                return
+            finally:
+                _prefetching.reset(token)
+            metrics.observe("prefetch.lookup", time.perf_counter() - start)
+            if result:
+                self._loaded.set(key, True)
+                metrics.incr("prefetch.completed")
+        finally:
+            with self._cond:
+                self._pending.pop(key, None)
+
+    def used(self, key: tuple):
+        """Called by a tool on each foreground lookup of `key`: counts prefetch hits."""
+        if not self.enabled or prefetching():
+            return
+        if key in self._loaded:
+            self._loaded.invalidate(key)
+            metrics.incr("prefetch.hit")
+
+    def cancel(self, session_id: str = None) -> int:
+        """Cancels queued prefetches (of one session, or all). Returns how many."""
+        cancelled = 0
+        with self._cond:
+            for key, (owner, future) in list(self._pending.items()):
+                if (session_id is None or owner == session_id) and future.cancel():
+                    del self._pending[key]
+                    cancelled += 1
+        metrics.incr("prefetch.cancelled", cancelled)
+        return cancelled
+
+    def stats(self) -> dict:
+        completed = metrics.get("prefetch.completed")
+        hits = metrics.get("prefetch.hit")
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "scheduled": metrics.get("prefetch.scheduled"),
+            "completed": completed,
+            "hits": hits,
+            "hit_rate": round(hits / completed, 3) if completed else 0.0,
+            "pending": pending,
+            "cancelled": metrics.get("prefetch.cancelled"),
+            "dropped": {
+                "budget": metrics.get("prefetch.dropped_budget"),
+                "full": metrics.get("prefetch.dropped_full"),
+                "busy": metrics.get("prefetch.dropped_busy"),
+            },
+            "avg_lookup_ms": round(metrics.mean("prefetch.lookup") * 1000, 1)
+        }
+
+# Process-wide prefetcher used by the tools
+prefetcher = Prefetcher()
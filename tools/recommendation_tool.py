@@ -1,11 +1,21 @@
-from ytmusicapi import YTMusic
+import os
 import logging
 
+from tools.cache import TTLCache
+from tools.client import get_guest_client
+from tools.hedging import hedger
+from tools.metadata_tool import track_metadata
+from tools.prefetch import prefetcher
+
 logger = logging.getLogger(__name__)
 
+# Radio per (seed, limit), so a prefetched radio is there when the user asks
+_radio_cache = TTLCache(maxsize=256, ttl=int(os.getenv("RADIO_CACHE_TTL", "900")))
+
 def get_recommendations(video_id: str, limit: int = 20) -> list[dict]:
     """
     Get song recommendations based on a seed video ID (YouTube Music 'Radio' logic).
+    Results are cached for RADIO_CACHE_TTL seconds.
     
     Args:
         video_id: The videoId of the seed song.
@@ -14,14 +24,23 @@ def get_recommendations(video_id: str, limit: int = 20) -> list[dict]:
     Returns:
         List of song dictionaries (videoId, title, artist, album, duration).
     """
+    prefetcher.used(("radio", video_id, limit))
+    return list(_radio_cache.get_or_load((video_id, limit), lambda: _recommendations(video_id, limit)))
+
+def prefetch_recommendations(session_id: str, video_id: str, limit: int = 5) -> bool:
+    """Loads the radio for `video_id` in the background (see tools/prefetch.py)."""
+    return prefetcher.schedule(session_id, ("radio", video_id, limit), get_recommendations, video_id, limit,
+                               cached=lambda: (video_id, limit) in _radio_cache)
+
+def _recommendations(video_id: str, limit: int) -> list[dict]:
     try:
-        # Recommendations work fine with Guest Client
-        yt = YTMusic()
-        
         logger.info(f"Getting recommendations for seed video: {video_id}...")
         
-        # get_watch_playlist simulates "Start Radio"
-        watch_playlist = yt.get_watch_playlist(videoId=video_id, limit=limit)
+        # get_watch_playlist simulates "Start Radio" (works fine with Guest Client).
+        # Slow responses may be hedged (tools/hedging.py).
+        watch_playlist = hedger.call(
+            "get_watch_playlist", lambda: get_guest_client().get_watch_playlist(videoId=video_id, limit=limit)
+        )
         
         if not watch_playlist or 'tracks' not in watch_playlist:
             logger.warning("No tracks returned in watch playlist.")
@@ -54,7 +73,8 @@ def get_recommendations(video_id: str, limit: int = 20) -> list[dict]:
                     "title": title,
                     "artist": artist_name,
                     "album": album_name,
-                    "duration": track.get('length', '') # Watch playlist uses 'length' not 'duration'
+                    "duration": track.get('length', ''), # Watch playlist uses 'length' not 'duration'
+                    **track_metadata(track)
                 })
             except Exception as e:
                 logger.warning(f"Error parsing rec track: {e}")
@@ -1,28 +1,45 @@
-from ytmusicapi import YTMusic
+import os
 import logging
 
+from tools.cache import TTLCache
+from tools.client import get_guest_client
+from tools.hedging import hedger
+from tools.metadata_tool import track_metadata
+
 # Configure logging (module level)
 logger = logging.getLogger(__name__)
 
+# Recent searches; primed at startup from WARMUP_QUERIES (see agent/warmup.py)
+_search_cache = TTLCache(maxsize=256, ttl=int(os.getenv("SEARCH_CACHE_TTL", "600")))
+# Results the agent's tools take from a search (the best match). Cache keys
+# include the limit, so warm-up searches with this one to be hit later.
+BEST_MATCH_LIMIT = 1
+
 def search_song(query: str, limit: int = 5) -> list[dict]:
     """
     Search for songs on YouTube Music using the Guest Client.
+    Results are cached for SEARCH_CACHE_TTL seconds.
     
     Args:
         query: The search string (e.g., "Bohemian Rhapsody Queen").
         limit: Number of results to return (default 5).
         
     Returns:
-        A list of dictionaries containing keys: videoId, title, artist, album, duration.
+        A list of dictionaries containing keys: videoId, title, artist, album, duration
+        (plus thumbnails, album_art and duration_seconds when available).
         Returns an empty list if no results found or on error.
     """
+    key = (" ".join(query.casefold().split()), limit)
+    return list(_search_cache.get_or_load(key, lambda: _search(query, limit)))
+
+def _search(query: str, limit: int) -> list[dict]:
     try:
-        # Initialize Guest Client (Unauthenticated - bypasses 400 Bad Request on Search)
-        yt_guest = YTMusic()
-        
-        # Perform search
+        # Guest Client (Unauthenticated - bypasses 400 Bad Request on Search).
+        # A slow search may be hedged (tools/hedging.py); the shared client is thread-safe.
         logger.info(f"Searching for '{query}'...")
-        raw_results = yt_guest.search(query=query, filter="songs", limit=limit)
+        raw_results = hedger.call(
+            "search", lambda: get_guest_client().search(query=query, filter="songs", limit=limit)
+        )
         
         parsed_results = []
         for res in raw_results:
@@ -49,7 +66,8 @@ def search_song(query: str, limit: int = 5) -> list[dict]:
                     "title": title,
                     "artist": artist,
                     "album": album,
-                    "duration": duration
+                    "duration": duration,
+                    **track_metadata(res)
                 })
                 
             except Exception as e:
@@ -0,0 +1,233 @@
+import io
+import os
+import json
+import time
+import zlib
+import atexit
+import hashlib
+import logging
+import threading
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+logger = logging.getLogger(__name__)
+
+PASSTHROUGH, RECORD, REPLAY = "passthrough", "record", "replay"
+# How the YTMusic clients reach YouTube Music (see make_adapter)
+TRANSPORT_MODE = os.getenv("YTM_TRANSPORT", PASSTHROUGH).lower()
+CASSETTE_PATH = os.getenv("YTM_CASSETTE", "cassettes/ytmusic")
+# Replay delay per request: milliseconds, or "recorded" to reproduce the original timing
+REPLAY_LATENCY = os.getenv("YTM_REPLAY_LATENCY", "0")
+
+# Request body fields that change between runs without changing the answer
+# (client version/date, visitor id, locale)
+_VOLATILE_BODY_FIELDS = ("context",)
+# The only response headers kept (bodies are stored decoded)
+_KEPT_HEADERS = ("content-type",)
+
+class CassetteMiss(requests.ConnectionError):
+    """Replay mode got a request that isn't in the cassette."""
+
+def request_key(method: str, url: str, body) -> tuple[str, str]:
+    """
+    (key, label) identifying a request independently of the run that made it.
+    JSON bodies are compared without their volatile fields and in canonical key order.
+    """
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    if body:
+        try:
+            data = json.loads(body)
+            if isinstance(data, dict):
+                for field in _VOLATILE_BODY_FIELDS:
+                    data.pop(field, None)
+            body = json.dumps(data, sort_keys=True, separators=(",", ":"))
+        except ValueError:
+            pass
+    parts = urlsplit(url)
+    label = f"{method} {parts.path}"
+    digest = hashlib.sha1(f"{method} {url}\n{body or ''}".encode("utf-8")).hexdigest()[:24]
+    return digest, label
+
+class Cassette:
+    """
+    Recorded responses in two files:
+
+    - `<path>.ytc`: one zlib-compressed record per response (a JSON header
+      line with status/headers/elapsed, then the raw body), appended in order.
+    - `<path>.index.json`: request key -> [[offset, length], ...] into the
+      data file, so replay reads only the records it needs.
+
+    Identical requests are recorded once per occurrence and replayed in the
+    same order (the last one repeats), so paging and retries replay as they happened.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.data_path = path + ".ytc"
+        self.index_path = path + ".index.json"
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> [[offset, length], ...]
+        self._labels = {}  # key -> "POST /youtubei/v1/search"
+        self._cursors = {}  # key -> next occurrence to replay
+        self._decoded = {}  # (offset, length) -> (header, body)
+        self._file = None
+        self._dirty = False
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+            self._entries = index.get("entries", {})
+            self._labels = index.get("labels", {})
+
+    def __len__(self) -> int:
+        return sum(len(spans) for spans in self._entries.values())
+
+    def append(self, key: str, label: str, response: requests.Response, elapsed: float):
+        header = {
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() in _KEPT_HEADERS},
+            "elapsed_ms": round(elapsed * 1000, 1)
+        }
+        record = zlib.compress(json.dumps(header).encode("utf-8") + b"\n" + response.content)
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.data_path) or ".", exist_ok=True)
+                self._file = open(self.data_path, "ab")
+            offset = self._file.seek(0, os.SEEK_END)
+            self._file.write(record)
+            self._entries.setdefault(key, []).append([offset, len(record)])
+            self._labels[key] = label
+            self._dirty = True
+
+    def lookup(self, key: str) -> Optional[tuple[dict, bytes]]:
+        """The next recorded (header, body) for `key`, or None if it was never recorded."""
+        with self._lock:
+            spans = self._entries.get(key)
+            if not spans:
+                return None
+            i = self._cursors.get(key, 0)
+            self._cursors[key] = i + 1
+            span = tuple(spans[min(i, len(spans) - 1)])
+            cached = self._decoded.get(span)
+            if cached is None:
+                if self._file is None:
+                    self._file = open(self.data_path, "rb")
+                self._file.seek(span[0])
+                raw = zlib.decompress(self._file.read(span[1]))
+                head, _, body = raw.partition(b"\n")
+                cached = self._decoded[span] = (json.loads(head), body)
+            return cached
+
+    def rewind(self):
+        """Replays every key from its first occurrence again."""
+        with self._lock:
+            self._cursors.clear()
+
+    def flush(self):
+        """Writes the index (atomically) after recording."""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            if not self._dirty:
+                return
+            tmp = self.index_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "entries": self._entries, "labels": self._labels}, f, separators=(",", ":"))
+            os.replace(tmp, self.index_path)
+            self._dirty = False
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def _read_timeout(timeout) -> Optional[float]:
+    if isinstance(timeout, tuple):
+        return timeout[1]
+    return timeout
+
+class CassetteAdapter(HTTPAdapter):
+    """
+    requests transport adapter that records responses into a Cassette, or
+    answers from one without touching the network.
+
+    Args:
+        cassette: Where responses are stored / read from.
+        mode: RECORD or REPLAY.
+        latency: Replay delay in seconds, or "recorded" to sleep for each
+            response's original duration. 0 replays at full speed.
+    """
+    def __init__(self, cassette: Cassette, mode: str = REPLAY, latency=0.0, **kwargs):
+        super().__init__(**kwargs)
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode '{mode}'")
+        self.cassette = cassette
+        self.mode = mode
+        self.latency = latency
+        self.hits = 0
+        self.misses = 0
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        key, label = request_key(request.method, request.url, request.body)
+        if self.mode == RECORD:
+            start = time.perf_counter()
+            response = super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+            self.cassette.append(key, label, response, time.perf_counter() - start)
+            return response
+
+        recorded = self.cassette.lookup(key)
+        if recorded is None:
+            self.misses += 1
+            raise CassetteMiss(f"No recorded response for {label} (key {key}) in {self.cassette.path}", request=request)
+        self.hits += 1
+        header, body = recorded
+
+        delay = header.get("elapsed_ms", 0) / 1000 if self.latency == "recorded" else float(self.latency)
+        limit = _read_timeout(timeout)
+        if limit is not None and delay > limit:
+            time.sleep(limit)
+            raise requests.ReadTimeout(f"Replayed response for {label} slower than the {limit:g}s timeout", request=request)
+        if delay > 0:
+            time.sleep(delay)
+
+        raw = HTTPResponse(
+            body=io.BytesIO(body), headers=header.get("headers", {}), status=header["status"],
+            reason=header.get("reason"), preload_content=False, decode_content=False
+        )
+        return self.build_response(request, raw)
+
+    def close(self):
+        super().close()
+        self.cassette.close()
+
+def parse_latency(value: str):
+    """YTM_REPLAY_LATENCY value -> seconds or "recorded"."""
+    value = str(value).strip().lower()
+    return "recorded" if value == "recorded" else float(value or 0) / 1000
+
+def make_adapter(mode: str = TRANSPORT_MODE, path: str = CASSETTE_PATH, latency=REPLAY_LATENCY, **pool_kwargs) -> HTTPAdapter:
+    """
+    The transport for the shared YTMusic session.
+
+    Args:
+        mode: "passthrough" (plain HTTPAdapter), "record" or "replay".
+        path: Cassette path (without extension).
+        latency: Replay delay, as for YTM_REPLAY_LATENCY (ms or "recorded").
+        **pool_kwargs: Connection pool settings passed to HTTPAdapter.
+    """
+    if mode == PASSTHROUGH:
+        return HTTPAdapter(**pool_kwargs)
+    cassette = Cassette(path)
+    if mode == REPLAY and not len(cassette):
+        logger.warning(f"Replaying from an empty cassette ({path}); every request will fail")
+    adapter = CassetteAdapter(cassette, mode=mode, latency=parse_latency(latency), **pool_kwargs)
+    if mode == RECORD:
+        atexit.register(cassette.close)
+    logger.info(f"YouTube Music transport: {mode} ({path}, {len(cassette)} recorded responses)")
+    return adapter